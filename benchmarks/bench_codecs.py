@@ -0,0 +1,79 @@
+"""Compares package compression codecs.
+
+For each codec, reports the time needed to build a package, the size of
+the package to upload and the time needed by the server to read it.
+
+The sample post references text resources (compressible) and random
+binary resources, standing for already compressed images.
+
+    $ python benchmarks/bench_codecs.py --images 20 --image-size 2000000
+"""
+
+import argparse
+import os
+import pathlib
+import tempfile
+import time
+
+from pblog.package import CODECS, build_package, read_package
+
+
+POST_HEADER = """---
+title: A benchmark post
+topic: Benchmarks
+---
+
+"""
+
+
+def build_sample_post(root_path, images, image_size, texts, text_size):
+    lines = [POST_HEADER]
+    for index in range(images):
+        name = 'img-{}.jpg'.format(index)
+        with (root_path / name).open('wb') as f:
+            f.write(os.urandom(image_size))
+        lines.append('![image]({})\n'.format(name))
+    for index in range(texts):
+        name = 'code-{}.py'.format(index)
+        with (root_path / name).open('w') as f:
+            f.write(('print("some source code %d")\n' % index) * (text_size // 30))
+        lines.append('[source]({})\n'.format(name))
+
+    post_path = root_path / 'post.md'
+    with post_path.open('w') as f:
+        f.write('\n'.join(lines))
+    return post_path
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=10)
+    parser.add_argument('--image-size', type=int, default=1000000)
+    parser.add_argument('--texts', type=int, default=10)
+    parser.add_argument('--text-size', type=int, default=50000)
+    parser.add_argument('--level', type=int, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='pblog-bench-') as directory:
+        root_path = pathlib.Path(directory)
+        post_path = build_sample_post(
+            root_path, args.images, args.image_size, args.texts, args.text_size)
+
+        print('{:<6} {:>12} {:>14} {:>12}'.format('codec', 'build (s)', 'size (bytes)', 'read (s)'))
+        for codec in sorted(CODECS):
+            package_path = root_path / ('package' + CODECS[codec])
+            _, build_time = timed(
+                build_package, post_path, package_path, codec=codec, level=args.level)
+            package, read_time = timed(read_package, package_path)
+            print('{:<6} {:>12.3f} {:>14} {:>12.3f}'.format(
+                codec, build_time, package_path.stat().st_size, read_time))
+
+
+if __name__ == '__main__':
+    main()
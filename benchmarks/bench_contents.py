@@ -0,0 +1,81 @@
+"""Compares inline and compressed storage of post contents.
+
+For each storage mode, reports the size of the posts table, the size of the
+whole database and the time needed to list posts.
+
+    $ python benchmarks/bench_contents.py --posts 2000 --paragraphs 200
+"""
+
+import argparse
+from datetime import date, timedelta
+import pathlib
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from flask_pblog.models import Base, Post, Topic
+from flask_pblog.storage import Storage
+
+
+PARAGRAPH = """Some *markdown* paragraph with [a link](http://example.org), `code`
+and **emphasis**, standing for a long post content.
+
+"""
+
+
+def fill(storage, posts, paragraphs):
+    topic = Topic(name='Topic', slug='topic')
+    for index in range(posts):
+        post = Post(
+            title='Post %d' % index, slug='post-%d' % index, summary='A summary',
+            published_date=date(2010, 1, 1) + timedelta(days=index), topic=topic)
+        md_content = '# Post %d\n\n' % index + PARAGRAPH * paragraphs
+        storage.set_post_contents(post, md_content, '<p>%s</p>' % md_content)
+        storage.session.add(post)
+    storage.session.commit()
+
+
+def table_size(engine, table):
+    # requires SQLite to be built with the dbstat virtual table
+    return engine.execute(
+        'SELECT SUM(pgsize) FROM dbstat WHERE name = ?', (table,)).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1000)
+    parser.add_argument('--paragraphs', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='pblog-bench-') as directory:
+        for compress_contents in (False, True):
+            db_path = pathlib.Path(directory) / ('%s.sqlite' % compress_contents)
+            engine = create_engine('sqlite:///%s' % db_path)
+            Base.metadata.create_all(engine)
+            storage = Storage(sessionmaker(bind=engine)(), compress_contents)
+            fill(storage, args.posts, args.paragraphs)
+
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                storage.session.expunge_all()
+                storage.get_posts_page(20)
+                storage.session.expunge_all()
+                storage.get_all_posts()
+            listing_time = (time.perf_counter() - start) / args.repeat
+
+            try:
+                posts_size = table_size(engine, 'pblog_posts')
+            except Exception:
+                posts_size = None
+            print('{:<10} posts table: {} bytes, database: {} bytes, listing: {:.1f}ms'.format(
+                'compressed' if compress_contents else 'inline',
+                posts_size if posts_size is not None else 'n/a',
+                db_path.stat().st_size,
+                listing_time * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Measures full and incremental static exports of a blog.
+
+    $ python benchmarks/bench_export.py --posts 10000 --workers 4
+"""
+
+import argparse
+from datetime import date, timedelta
+import os
+import pathlib
+import tempfile
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+
+from flask_pblog import PBlog
+from flask_pblog.export import export_site
+from flask_pblog.models import Base
+from flask_pblog.storage import Storage
+from pblog.package import Package
+
+
+PARAGRAPH = """Some *markdown* paragraph with [a link](http://example.org), `code`
+and **emphasis**, standing for a post content.
+
+"""
+
+
+def create_app(directory):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///%s' % (
+        pathlib.Path(directory) / 'db.sqlite')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['PBLOG_RESOURCES_PATH'] = str(pathlib.Path(directory) / 'resources')
+    db = SQLAlchemy(app)
+    PBlog(app, storage=Storage(db.session))
+    return app
+
+
+# application imported by export workers
+app = None
+if 'PBLOG_BENCH_DIR' in os.environ:
+    app = create_app(os.environ['PBLOG_BENCH_DIR'])
+
+
+def build_packages(posts, paragraphs):
+    for index in range(posts):
+        content = PARAGRAPH * paragraphs
+        post_package = Package(
+            post_title='Post %d' % index, post_slug='post-%d' % index,
+            summary='A summary', published_date=date(2010, 1, 1) + timedelta(days=index),
+            topic_name='Topic %d' % (index % 20), markdown_content=content)
+        post_package._html_content = '<p>%s</p>' % content
+        yield post_package
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--paragraphs', type=int, default=20)
+    parser.add_argument('-w', '--workers', type=int)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='pblog-bench-') as directory:
+        os.environ['PBLOG_BENCH_DIR'] = directory
+        app = create_app(directory)
+        storage = app.extensions['pblog'].storage
+        with app.app_context():
+            Base.metadata.create_all(storage.session.get_bind())
+            storage.bulk_create_posts(build_packages(args.posts, args.paragraphs))
+        output = pathlib.Path(directory) / 'output'
+
+        def export(name, **kwargs):
+            report = export_site(
+                app, output, app_module='bench_export.app', workers=args.workers,
+                **kwargs)
+            print('{:<12} {} pages rendered, {} unchanged in {:.2f}s'.format(
+                name, len(report.rendered), report.skipped, report.elapsed))
+
+        export('full', full=True)
+        export('unchanged')
+
+        with app.app_context():
+            post = storage.get_post(1, primary=True)
+            post_package = next(build_packages(1, args.paragraphs))
+            post_package.markdown_content = 'updated'
+            storage.update_post(post, post_package)
+        export('incremental')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Compares metadata-only post and package reading to full reading.
+
+    $ python benchmarks/bench_meta.py --posts 50 --paragraphs 2000
+"""
+
+import argparse
+import pathlib
+import tempfile
+import time
+
+from pblog.package import build_package, normalize_post_meta, parser_pool, \
+    read_package, read_package_meta, read_post_meta
+
+
+POST_HEADER = """---
+title: Post {index}
+topic: Benchmarks
+---
+
+"""
+PARAGRAPH = """Some *markdown* paragraph with [a link](http://example.org), `code`
+and **emphasis**, long enough to take some time to render.
+
+"""
+
+
+def build_corpus(root_path, posts, paragraphs):
+    post_paths = []
+    for index in range(posts):
+        post_path = root_path / 'post-{}.md'.format(index)
+        with post_path.open('w') as f:
+            f.write(POST_HEADER.format(index=index))
+            f.write(PARAGRAPH * paragraphs)
+        post_paths.append(post_path)
+    return post_paths
+
+
+def full_post_meta(post_path):
+    with post_path.open() as f:
+        content = f.read()
+    with parser_pool.parser() as parser:
+        parser.convert(content)
+        return normalize_post_meta(parser.meta)
+
+
+def timed(func, paths):
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=20)
+    parser.add_argument('--paragraphs', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='pblog-bench-') as directory:
+        root_path = pathlib.Path(directory)
+        post_paths = build_corpus(root_path, args.posts, args.paragraphs)
+        package_paths = []
+        for post_path in post_paths:
+            package_path = post_path.with_suffix('.tar.gz')
+            build_package(post_path, package_path)
+            package_paths.append(package_path)
+
+        for name, full, fast, paths in (
+                ('post', full_post_meta, read_post_meta, post_paths),
+                ('package', read_package, read_package_meta, package_paths)):
+            full_time = timed(full, paths)
+            fast_time = timed(fast, paths)
+            print('{:<8} full: {:.3f}s  meta only: {:.3f}s  speedup: x{:.1f}'.format(
+                name, full_time, fast_time, full_time / fast_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Measures post search latency with the SQLite FTS5 index, compared to a
+LIKE scan of post contents.
+
+    $ python benchmarks/bench_search.py --posts 100000
+"""
+
+import argparse
+from datetime import date, timedelta
+from itertools import accumulate
+import pathlib
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import sessionmaker
+
+from flask_pblog.models import Base, Post
+from flask_pblog.search import SQLiteSearchIndex
+from flask_pblog.storage import Storage
+from pblog.package import Package
+
+
+def build_vocabulary(size, seed=0):
+    """Builds random words with Zipf-like frequencies, like natural text."""
+    rand = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = [''.join(rand.choices(letters, k=rand.randint(3, 10))) for _ in range(size)]
+    return words, list(accumulate(1 / (rank + 1) for rank in range(size)))
+
+
+def build_packages(posts, words, vocabulary, seed=0):
+    rand = random.Random(seed)
+    vocabulary, cum_weights = vocabulary
+
+    def text(k):
+        return ' '.join(rand.choices(vocabulary, cum_weights=cum_weights, k=k))
+
+    for index in range(posts):
+        post_package = Package(
+            post_title=text(5),
+            post_slug='post-%d' % index,
+            summary=text(20),
+            published_date=date(2010, 1, 1) + timedelta(days=index % 3000),
+            topic_name='Topic %d' % (index % 20),
+            markdown_content=text(words))
+        post_package._html_content = post_package.markdown_content
+        yield post_package
+
+
+def measure(search, queries, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            search(query)
+    return (time.perf_counter() - start) / (repeat * len(queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--words', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    vocabulary = build_vocabulary(20000)
+    # common, uncommon and rare words, and a missing word
+    words = vocabulary[0]
+    queries = [words[10], words[1000], words[15000], '%s %s' % (words[100], words[2000]),
+               'missingword']
+
+    with tempfile.TemporaryDirectory(prefix='pblog-bench-') as directory:
+        engine = create_engine('sqlite:///%s' % (pathlib.Path(directory) / 'db.sqlite'))
+        Base.metadata.create_all(engine)
+        storage = Storage(sessionmaker(bind=engine)(), search_index=SQLiteSearchIndex())
+        storage.search_index.create(engine)
+
+        start = time.perf_counter()
+        storage.bulk_create_posts(
+            build_packages(args.posts, args.words, vocabulary), batch_size=1000)
+        print('indexed {} posts in {:.1f}s'.format(
+            args.posts, time.perf_counter() - start))
+
+        def search_index(query):
+            storage.session.expunge_all()
+            storage.search_posts(query, 20)
+
+        def search_like(query):
+            storage.session.expunge_all()
+            words = query.split()
+            storage.session.query(Post).filter(*[
+                or_(Post.title.like('%{}%'.format(word)),
+                    Post.summary.like('%{}%'.format(word)),
+                    Post.inline_md_content.like('%{}%'.format(word)))
+                for word in words]).limit(20).all()
+
+        for name, search in (('fts5', search_index), ('like', search_like)):
+            print('{:<5} search: {:.2f}ms'.format(
+                name, measure(search, queries, args.repeat) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Compares shared validation schemas to per-call validator construction.
+
+    $ python benchmarks/bench_validation.py --number 10000
+"""
+
+import argparse
+import datetime
+import timeit
+
+import cerberus
+
+from pblog.validation import post_meta_schema, post_response_schema
+
+
+POST_META = {
+    'id': {'prod': 12},
+    'title': 'A title',
+    'slug': 'a-title',
+    'topic': 'A topic',
+    'published_date': datetime.date(2017, 3, 30),
+}
+POST_RESPONSE = {
+    'id': 12,
+    'title': 'A title',
+    'slug': 'a-title',
+    'topic': {'id': 1, 'name': 'A topic'},
+    'published_date': '2017-03-30',
+}
+
+
+def per_call(schema, document):
+    # former implementation: a new validator for each call, then a second
+    # normalization pass
+    validator = cerberus.Validator(schema.schema)
+    if validator.validate(document):
+        return validator.normalized(document)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=5000)
+    args = parser.parse_args()
+
+    for name, schema, document in (
+            ('post meta', post_meta_schema, POST_META),
+            ('post response', post_response_schema, POST_RESPONSE)):
+        per_call_time = timeit.timeit(
+            lambda: per_call(schema, document), number=args.number)
+        shared_time = timeit.timeit(
+            lambda: schema.validate(document), number=args.number)
+        print('{:<14} per call: {:.1f}us  shared: {:.1f}us  speedup: x{:.1f}'.format(
+            name,
+            per_call_time / args.number * 1e6,
+            shared_time / args.number * 1e6,
+            per_call_time / shared_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,15 @@ blog.
 
 import pathlib
 
+from flask_pblog import precompress
+from flask_pblog.readmodel import ReadModel
+from pblog.blobstore import BlobStore
+from pblog.package import DEFAULT_BUFFER_SIZE
+
+
+# ways to have the front server send resource files
+RESOURCE_OFFLOAD_MODES = (None, 'x-sendfile', 'x-accel-redirect')
+
 
 class PBlog:
     """Entry point for the Flask PBlog extension.
@@ -38,6 +47,31 @@ class PBlog:
         self.markdown = markdown or self.markdown
         self.post_resource_path = pathlib.Path(
             app.config['PBLOG_RESOURCES_PATH'])
+        self.resource_buffer_size = app.config.get(
+            'PBLOG_RESOURCES_BUFFER_SIZE', DEFAULT_BUFFER_SIZE)
+        self.posts_per_page = app.config.get('PBLOG_POSTS_PER_PAGE', 20)
+        link_mode = app.config.get('PBLOG_RESOURCES_DEDUPLICATION')
+        if link_mode:
+            self.resource_store = BlobStore(
+                self.post_resource_path / '.blobs', link_mode)
+        else:
+            self.resource_store = None
+        self.versioned_resource_urls = app.config.get(
+            'PBLOG_RESOURCES_VERSIONED_URLS', False)
+        self.resource_offload = app.config.get('PBLOG_RESOURCES_OFFLOAD')
+        if self.resource_offload not in RESOURCE_OFFLOAD_MODES:
+            raise ValueError(
+                "Unknown resource offload mode '{}'".format(self.resource_offload))
+        self.resource_accel_prefix = app.config.get(
+            'PBLOG_RESOURCES_ACCEL_PREFIX', '/pblog-resources/')
+        self.precompressed_encodings = list(
+            app.config.get('PBLOG_PRECOMPRESSED_ENCODINGS', []))
+        precompress.check_encodings(self.precompressed_encodings)
+        if app.config.get('PBLOG_READ_MODEL'):
+            self.read_model = ReadModel(
+                self.storage, app.config.get('PBLOG_READ_MODEL_CHECK_INTERVAL', 1.0))
+        else:
+            self.read_model = None
         from flask_pblog.views import blueprint as blog_bp
         from flask_pblog.resources import blueprint as resource_bp
         blog_bp.template_folder = app.config.get('PBLOG_TEMPLATE_FOLDER', 'templates')
@@ -48,3 +82,12 @@ class PBlog:
         if not hasattr(app, 'extensions'):
             app.extensions = {}
         app.extensions['pblog'] = self
+
+    @property
+    def reader(self):
+        """The object to read posts metadata with in public views: the read
+        model if enabled, the storage otherwise.
+        """
+        if self.read_model is not None:
+            return self.read_model
+        return self.storage
@@ -0,0 +1,156 @@
+"""Asyncio wrapper of the storage.
+
+This module needs Python 3.5 or later, and is not imported by the rest of
+the package.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from sqlalchemy.orm import scoped_session
+
+from flask_pblog.storage import WROTE_POSTS_KEY
+
+
+# number of worker threads of the default executors
+DEFAULT_WORKERS = 4
+
+
+class AsyncStorage:
+    """Asyncio wrapper of a :class:`flask_pblog.storage.Storage`.
+
+    Storage calls are run in a thread pool, so that they do not block the
+    event loop. After each call, storage sessions are released: scoped
+    sessions are removed, other sessions are closed. Returned posts are
+    detached, with the fields needed to render them loaded.
+
+    Calls are run concurrently by several threads if the storage sessions
+    are scoped sessions. Plain sessions can only be used by a single
+    thread, so calls are then run one at a time.
+
+    Resource files are written by a distinct thread pool, so that file
+    writes do not hold back database calls.
+    """
+    def __init__(self, storage, executor=None, io_executor=None,
+                 workers=DEFAULT_WORKERS):
+        """
+        Args:
+            storage (flask_pblog.storage.Storage): the wrapped storage
+            executor (concurrent.futures.Executor): executor to run storage
+                calls in. Defaults to a thread pool of ``workers`` threads,
+                or of a single one if the storage sessions are not scoped.
+            io_executor (concurrent.futures.Executor): executor to write
+                resource files in. Defaults to a thread pool of ``workers``
+                threads.
+            workers (int): number of threads of the default executors
+        """
+        self.storage = storage
+        if executor is None:
+            sessions = [storage.session, storage._read_session or storage.session]
+            scoped = all(isinstance(session, scoped_session) for session in sessions)
+            executor = ThreadPoolExecutor(max_workers=workers if scoped else 1)
+        self.executor = executor
+        self.io_executor = io_executor or ThreadPoolExecutor(max_workers=workers)
+
+    def shutdown(self, wait=True):
+        """Shuts the executors down.
+
+        Args:
+            wait (bool): if True, waits for pending calls to complete
+        """
+        self.executor.shutdown(wait)
+        self.io_executor.shutdown(wait)
+
+    def _call(self, method, args, kwargs, load=None):
+        sessions = {self.storage.session, self.storage.read_session}
+        try:
+            result = method(*args, **kwargs)
+            if load is not None:
+                load(result)
+            return result
+        finally:
+            # writes of this call must not route later reads to the
+            # primary session
+            self.storage.session.info.pop(WROTE_POSTS_KEY, None)
+            for session in sessions:
+                getattr(session, 'remove', session.close)()
+
+    async def _run(self, method, *args, load=None, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self.executor, partial(self._call, method, args, kwargs, load))
+
+    @staticmethod
+    def _load_post(post):
+        if post is not None:
+            post.topic, post.md_content, post.html_content
+
+    @staticmethod
+    def _load_listing(posts):
+        for post in posts:
+            post.topic
+
+    async def get_post(self, post_id, primary=False):
+        """See :meth:`flask_pblog.storage.Storage.get_post`.
+
+        Post contents are loaded.
+        """
+        return await self._run(
+            self.storage.get_post, post_id, primary=primary, load=self._load_post)
+
+    async def get_all_posts(self):
+        """See :meth:`flask_pblog.storage.Storage.get_all_posts`."""
+        return await self._run(self.storage.get_all_posts, load=self._load_listing)
+
+    async def get_posts_page(self, limit, before=None, topic_id=None):
+        """See :meth:`flask_pblog.storage.Storage.get_posts_page`."""
+        return await self._run(
+            self.storage.get_posts_page, limit, before, topic_id,
+            load=self._load_listing)
+
+    async def get_posts_in_topic(self, topic_id):
+        """See :meth:`flask_pblog.storage.Storage.get_posts_in_topic`."""
+        return await self._run(
+            self.storage.get_posts_in_topic, topic_id, load=self._load_listing)
+
+    async def search_posts(self, query, limit, offset=0):
+        """See :meth:`flask_pblog.storage.Storage.search_posts`."""
+        return await self._run(
+            self.storage.search_posts, query, limit, offset, load=self._load_listing)
+
+    async def get_topic(self, topic_id):
+        """See :meth:`flask_pblog.storage.Storage.get_topic`."""
+        return await self._run(self.storage.get_topic, topic_id)
+
+    async def get_all_topics(self):
+        """See :meth:`flask_pblog.storage.Storage.get_all_topics`."""
+        return await self._run(self.storage.get_all_topics)
+
+    async def get_topics_summary(self):
+        """See :meth:`flask_pblog.storage.Storage.get_topics_summary`."""
+        return await self._run(self.storage.get_topics_summary)
+
+    async def create_post(self, post_package):
+        """See :meth:`flask_pblog.storage.Storage.create_post`."""
+        return await self._run(
+            self.storage.create_post, post_package, load=self._load_post)
+
+    async def update_post(self, post, post_package):
+        """See :meth:`flask_pblog.storage.Storage.update_post`.
+
+        The given post is updated in place.
+        """
+        await self._run(
+            self.storage.update_post, post, post_package,
+            load=lambda result: self._load_post(post))
+
+    async def save_resources(self, root_path, post_package, blob_store=None):
+        """See :meth:`flask_pblog.storage.Storage.save_resources`.
+
+        Files are written by the resource files executor.
+        """
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(
+            self.io_executor, partial(
+                self.storage.save_resources, root_path, post_package, blob_store))
@@ -0,0 +1,264 @@
+"""Static export of a blog.
+
+Pages are rendered by the blog views themselves, through a Flask test
+client, and written as files so that they can be served by any static file
+server:
+
+    + ``/`` and ``/topic/<id>/<slug>`` are written to ``index.html`` files in
+      directories named after their URL,
+    + ``/post/<id>/<slug>`` likewise, and ``/post/<id>/<slug>.md`` as is,
+    + post resources and static files are copied.
+
+Static file servers ignore query strings, so list pages are exported with
+all their posts rather than paginated.
+
+A manifest written in the output directory records what was exported, so
+that later exports only render the pages whose content changed, and only
+copy the static files that were modified.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import importlib
+import json
+import os
+import pathlib
+import shutil
+import sys
+import time
+
+
+MANIFEST_NAME = '.pblog-export.json'
+MANIFEST_VERSION = 1
+
+
+class ExportReport:
+    """Results of an export.
+
+    Attributes:
+        rendered (list of str): URLs of the rendered pages
+        skipped (int): number of unchanged pages that were not rendered
+        errors (dict): status codes of pages that could not be rendered, by
+            URL
+        elapsed (float): duration of the export in seconds
+    """
+    def __init__(self, rendered, skipped, errors, elapsed):
+        self.rendered = rendered
+        self.skipped = skipped
+        self.errors = errors
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self):
+        return not self.errors
+
+
+def url_to_path(url):
+    """Gives the path of the file a page is exported to.
+
+    Args:
+        url (str): path of the page, such as ``/post/1/slug``
+
+    Returns:
+        pathlib.PurePosixPath: a path relative to the output directory
+    """
+    path = pathlib.PurePosixPath(url.lstrip('/'))
+    if not path.suffix:
+        path = path / 'index.html'
+    return path
+
+
+def fingerprint(*values):
+    """Hashes some JSON serializable values."""
+    return hashlib.sha1(
+        json.dumps(values, default=str, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_app(app_module):
+    """Imports an application given as ``module.attribute``."""
+    module_name, attr_name = app_module.rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), attr_name)
+
+
+def make_dirs(path):
+    """Creates a directory and its parents, if they do not exist."""
+    try:
+        path.mkdir(parents=True)
+    except FileExistsError:
+        pass
+
+
+# application of worker processes, imported by their first task
+_app = None
+
+
+def render_pages(app, urls, output_dir):
+    """Renders some pages with the application views and writes them.
+
+    List pages are rendered with all their posts.
+
+    Args:
+        app (flask.Flask): the blog application
+        urls (list of str): paths of the pages
+        output_dir (pathlib.Path):
+
+    Returns:
+        dict: status codes of the pages that could not be rendered, by URL
+    """
+    pblog = app.extensions['pblog']
+    errors = {}
+    posts_per_page = pblog.posts_per_page
+    # views fetch one more post than a page holds
+    pblog.posts_per_page = sys.maxsize - 1
+    try:
+        with app.test_client() as client:
+            for url in urls:
+                response = client.get(url)
+                if response.status_code != 200:
+                    errors[url] = response.status_code
+                    continue
+                path = output_dir / url_to_path(url)
+                make_dirs(path.parent)
+                with path.open('wb') as f:
+                    f.write(response.get_data())
+    finally:
+        pblog.posts_per_page = posts_per_page
+    return errors
+
+
+def _render_task(args):
+    global _app
+    app_module, urls, output_dir = args
+    if _app is None:
+        _app = load_app(app_module)
+    return render_pages(_app, urls, output_dir)
+
+
+def copy_tree(source, destination, copied=None):
+    """Copies a directory over another one, following links.
+
+    Args:
+        source (pathlib.Path):
+        destination (pathlib.Path):
+        copied (dict): ``[modification time, size]`` of the files of a
+            previous copy, by path relative to the source directory. If
+            given, files which were not modified since are not copied.
+
+    Returns:
+        dict: ``[modification time, size]`` of the source files, by path
+            relative to the source directory
+    """
+    files = {}
+    for directory, _, file_names in os.walk(str(source), followlinks=True):
+        relative_dir = pathlib.Path(directory).relative_to(source)
+        target = destination / relative_dir
+        make_dirs(target)
+        for file_name in file_names:
+            file_path = os.path.join(directory, file_name)
+            stat = os.stat(file_path)
+            key = str(relative_dir / file_name)
+            files[key] = [stat.st_mtime_ns, stat.st_size]
+            target_path = target / file_name
+            if copied is None or copied.get(key) != files[key] \
+                    or not target_path.is_file():
+                shutil.copyfile(file_path, str(target_path))
+    return files
+
+
+def export_site(app, output_dir, app_module=None, workers=None, full=False, chunk_size=50):
+    """Exports a blog as static files.
+
+    Args:
+        app (flask.Flask): the blog application
+        output_dir (pathlib.Path): directory to write files to
+        app_module (str): the application as ``module.attribute``. If
+            given, pages are rendered by a pool of processes importing it.
+            Otherwise, pages are rendered in the current process.
+        workers (int): number of worker processes. Defaults to the number
+            of CPUs.
+        full (bool): if True, all pages are rendered, even unchanged ones
+        chunk_size (int): number of pages rendered by a worker task
+
+    Returns:
+        flask_pblog.export.ExportReport:
+    """
+    start = time.perf_counter()
+    output_dir = pathlib.Path(output_dir)
+    make_dirs(output_dir)
+    pblog = app.extensions['pblog']
+
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest = {}
+    if not full and manifest_path.is_file():
+        with manifest_path.open() as f:
+            manifest = json.load(f)
+        if manifest.get('version') != MANIFEST_VERSION:
+            manifest = {}
+    old_pages = manifest.get('pages', {})
+
+    with app.app_context():
+        posts = pblog.storage.get_all_posts()
+        topics = pblog.storage.get_topics_summary()
+        engines = {session.get_bind()
+                   for session in (pblog.storage.session, pblog.storage.read_session)}
+
+    # every page shows the topics sidebar
+    topics_fingerprint = fingerprint([(t.id, t.name, t.slug) for t in topics])
+    pages = {}
+    topic_posts = {}
+    for post in posts:
+        post_fingerprint = fingerprint(
+            topics_fingerprint, post.id, post.slug, post.title, post.summary,
+            post.published_date, post.updated_at, post.topic_id)
+        topic_posts.setdefault(post.topic_id, []).append(post_fingerprint)
+        url = '/post/{}/{}'.format(post.id, post.slug)
+        pages[url] = pages[url + '.md'] = post_fingerprint
+    for topic in topics:
+        url = '/topic/{}/{}'.format(topic.id, topic.slug)
+        pages[url] = fingerprint(topics_fingerprint, sorted(topic_posts[topic.id]))
+    pages['/'] = fingerprint(topics_fingerprint, sorted(pages.values()))
+
+    urls = [url for url, value in pages.items() if old_pages.get(url) != value]
+    skipped = len(pages) - len(urls)
+
+    if app_module is not None and len(urls) > chunk_size:
+        chunks = [(app_module, urls[i:i + chunk_size], output_dir)
+                  for i in range(0, len(urls), chunk_size)]
+        errors = {}
+        # forked workers must not share the pooled connections of this
+        # process, so that concurrent queries do not mix on one socket
+        for engine in engines:
+            engine.dispose()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_errors in executor.map(_render_task, chunks):
+                errors.update(chunk_errors)
+    else:
+        errors = render_pages(app, urls, output_dir)
+
+    # resources of rendered posts
+    rendered = set(urls) - errors.keys()
+    for post in posts:
+        resource_dir = pblog.post_resource_path / post.slug
+        if '/post/{}/{}'.format(post.id, post.slug) in rendered and resource_dir.is_dir():
+            copy_tree(resource_dir, output_dir / 'resources' / post.slug)
+    static_files = {}
+    if app.static_folder is not None and os.path.isdir(app.static_folder):
+        static_files = copy_tree(
+            pathlib.Path(app.static_folder), output_dir / 'static',
+            manifest.get('static', {}))
+
+    # pages that are gone, such as posts whose slug changed
+    for url in old_pages.keys() - pages.keys():
+        path = output_dir / url_to_path(url)
+        if path.is_file():
+            path.unlink()
+
+    for url in errors:
+        # render again on next export
+        pages.pop(url, None)
+    with manifest_path.open('w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'pages': pages, 'static': static_files}, f)
+
+    return ExportReport(
+        [url for url in urls if url in rendered], skipped, errors,
+        time.perf_counter() - start)
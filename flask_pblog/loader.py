@@ -0,0 +1,156 @@
+"""Request scoped loading of blog data.
+
+A page often needs the same data in several places: the posts stamp gives
+the entity tag and the topics summary version, the topics summary fills
+the sidebar and tells whether a topic exists, and a 404 page raised by a
+view shows the sidebar again. The loader of a request memoizes what it
+fetched from the reader of the blog, so that each is fetched once per
+request.
+
+Loaders are dropped when the request ends, so they never serve data written
+by other requests. They are meant for the public views, which do not
+write.
+"""
+
+from flask import current_app, g
+from sqlalchemy.orm.exc import NoResultFound
+
+
+# attribute of flask.g holding the loader of the request
+LOADER_ATTR = 'pblog_loader'
+
+
+class LazySequence:
+    """A sequence which is fetched when first used.
+
+    Templates can be given one where they expect a list, so that the data
+    is fetched only if the template is rendered.
+
+    Args:
+        load (callable): returns the sequence
+    """
+    def __init__(self, load):
+        self._load = load
+        self._items = None
+
+    @property
+    def items(self):
+        if self._items is None:
+            self._items = self._load()
+        return self._items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+
+class Loader:
+    """Memoizes the data fetched by a request.
+
+    Its read methods mirror the ones of :class:`flask_pblog.storage.Storage`.
+
+    Args:
+        reader: the storage, or the read model
+    """
+    def __init__(self, reader):
+        self.reader = reader
+        self._stamp = None
+        self._topics_summary = None
+        self._posts = {}
+        self._pages = {}
+
+    def get_posts_stamp(self):
+        """See :meth:`flask_pblog.storage.Storage.get_posts_stamp`."""
+        if self._stamp is None:
+            self._stamp = self.reader.get_posts_stamp()
+        return self._stamp
+
+    def get_topics_summary(self):
+        """See :meth:`flask_pblog.storage.Storage.get_topics_summary`.
+
+        The posts version is taken from the posts stamp.
+        """
+        if self._topics_summary is None:
+            self._topics_summary = self.reader.get_topics_summary(
+                version=self.get_posts_stamp().version)
+        return self._topics_summary
+
+    def topics(self):
+        """Gives the topics summary, fetched only when it is used.
+
+        Returns:
+            flask_pblog.loader.LazySequence:
+        """
+        return LazySequence(self.get_topics_summary)
+
+    def get_topic(self, topic_id):
+        """Get a topic by its id that have at least one associated post.
+
+        The topic is looked up in the topics summary.
+
+        Raises:
+            sqlalchemy.orm.exc.NoResultFound: If no topic with posts exists
+                with this id
+
+        Returns:
+            flask_pblog.storage.TopicSummary:
+        """
+        try:
+            topic_id = int(topic_id)
+        except (TypeError, ValueError):
+            raise NoResultFound()
+        for topic in self.get_topics_summary():
+            if topic.id == topic_id:
+                return topic
+        raise NoResultFound()
+
+    def get_post(self, post_id):
+        """See :meth:`flask_pblog.storage.Storage.get_post`."""
+        key = str(post_id)
+        if key not in self._posts:
+            try:
+                self._posts[key] = self.reader.get_post(post_id)
+            except NoResultFound:
+                self._posts[key] = None
+        post = self._posts[key]
+        if post is None:
+            raise NoResultFound()
+        return post
+
+    def get_posts_page(self, limit, before=None, topic_id=None):
+        """See :meth:`flask_pblog.storage.Storage.get_posts_page`."""
+        key = (limit, before, topic_id)
+        if key not in self._pages:
+            self._pages[key] = self.reader.get_posts_page(limit, before, topic_id)
+        return self._pages[key]
+
+
+def get_loader():
+    """Gives the loader of the current request, creating it if needed.
+
+    Returns:
+        flask_pblog.loader.Loader:
+    """
+    loader = g.get(LOADER_ATTR)
+    if loader is None:
+        loader = Loader(current_app.extensions['pblog'].reader)
+        setattr(g, LOADER_ATTR, loader)
+    return loader
+
+
+def drop_loader(exc=None):
+    """Drops the loader of the current request.
+
+    The application context, and :data:`flask.g` along with it, may outlive
+    a request, for instance when requests are made by a test client within
+    an application context.
+    """
+    g.pop(LOADER_ATTR, None)
@@ -1,5 +1,9 @@
 # from pblog.core import db
-from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey
+import datetime
+import zlib
+
+from sqlalchemy import Boolean, Column, Integer, String, Text, Date, DateTime, \
+    ForeignKey, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import backref, relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -29,14 +33,144 @@ class Post(Base):
     slug = Column(String(255), nullable=False)
     summary = Column(Text(), default='', nullable=False)
     published_date = Column(Date(), nullable=False)
-    md_content = Column(Text(), nullable=False)
-    html_content = Column(Text(), nullable=False)
+    # last time the post was written, in UTC
+    updated_at = Column(DateTime(), nullable=False, default=datetime.datetime.utcnow)
+    # contents are stored inline, unless a PostContent is associated to the
+    # post. The md_content and html_content properties hide where they are.
+    inline_md_content = Column('md_content', Text(), nullable=False, default='')
+    inline_html_content = Column('html_content', Text(), nullable=False, default='')
     topic_id = Column(Integer, ForeignKey('pblog_topics.id'), nullable=False)
     topic = relationship(
         'Topic', backref=backref('posts', lazy='dynamic'))
+    content = relationship(
+        'PostContent', uselist=False, cascade='all, delete-orphan')
+
+    __table_args__ = (
+        # post listings are ordered by publication date, then id
+        Index('ix_pblog_posts_published', 'published_date', 'id'),
+        Index('ix_pblog_posts_topic_published', 'topic_id', 'published_date', 'id'),
+    )
 
     def __str__(self):
         return self.title
 
     def __repr__(self):
         return '<{} {}:{}>'.format(self.__class__.__name__, self.id, self.title)
+
+    @property
+    def md_content(self):
+        if self.content is not None:
+            return self.content.md_content
+        return self.inline_md_content
+
+    @md_content.setter
+    def md_content(self, value):
+        if self.content is not None:
+            self.content.md_content = value
+        else:
+            self.inline_md_content = value
+
+    @property
+    def html_content(self):
+        if self.content is not None:
+            return self.content.html_content
+        return self.inline_html_content
+
+    @html_content.setter
+    def html_content(self, value):
+        if self.content is not None:
+            self.content.html_content = value
+        else:
+            self.inline_html_content = value
+
+
+class PostContent(Base):
+    """Compressed contents of a post, stored apart from the post so that
+    they are loaded only when displaying it.
+    """
+    __tablename__ = 'pblog_post_contents'
+
+    post_id = Column(Integer, ForeignKey('pblog_posts.id'), primary_key=True)
+    compressed_md_content = Column('md_content', LargeBinary(), nullable=False)
+    compressed_html_content = Column('html_content', LargeBinary(), nullable=False)
+
+    @property
+    def md_content(self):
+        return zlib.decompress(self.compressed_md_content).decode('utf-8')
+
+    @md_content.setter
+    def md_content(self, value):
+        self.compressed_md_content = zlib.compress(value.encode('utf-8'))
+
+    @property
+    def html_content(self):
+        return zlib.decompress(self.compressed_html_content).decode('utf-8')
+
+    @html_content.setter
+    def html_content(self, value):
+        self.compressed_html_content = zlib.compress(value.encode('utf-8'))
+
+    def __repr__(self):
+        return '<{} {}>'.format(self.__class__.__name__, self.post_id)
+
+
+class PostRevision(Base):
+    """A previous version of a post markdown content.
+
+    Revisions are numbered from 1 for each post. The content is stored as a
+    delta against the following version, or in full for snapshots. See
+    :mod:`flask_pblog.revisions`.
+    """
+    __tablename__ = 'pblog_post_revisions'
+
+    id = Column(Integer, primary_key=True)
+    post_id = Column(Integer, ForeignKey('pblog_posts.id'), nullable=False)
+    number = Column(Integer, nullable=False)
+    title = Column(String(255), nullable=False)
+    # date the revision was replaced by the following version
+    replaced_date = Column(DateTime(), nullable=False)
+    is_snapshot = Column(Boolean(), nullable=False, default=False)
+    data = Column(LargeBinary(), nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('post_id', 'number'),
+    )
+
+    def __repr__(self):
+        return '<{} {}:{}>'.format(self.__class__.__name__, self.post_id, self.number)
+
+
+class PostVariant(Base):
+    """A precompressed variant of a post page or markdown content, served
+    as is to clients accepting its encoding. See
+    :mod:`flask_pblog.precompress`.
+    """
+    __tablename__ = 'pblog_post_variants'
+
+    post_id = Column(Integer, ForeignKey('pblog_posts.id'), primary_key=True)
+    name = Column(String(20), primary_key=True)
+    encoding = Column(String(20), primary_key=True)
+    # what the compressed content depends on, when it was compressed
+    key = Column(String(64), nullable=False)
+    data = Column(LargeBinary(), nullable=False)
+
+    def __repr__(self):
+        return '<{} {}:{}:{}>'.format(
+            self.__class__.__name__, self.post_id, self.name, self.encoding)
+
+
+class Stamp(Base):
+    """A version number shared by all processes using the database.
+
+    Stamps are bumped whenever the data they stand for is written, so that
+    processes can tell whether data they cached is outdated.
+    """
+    __tablename__ = 'pblog_stamps'
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    # last time the stamp was bumped, in UTC
+    updated_at = Column(DateTime(), nullable=True)
+
+    def __repr__(self):
+        return '<{} {}:{}>'.format(self.__class__.__name__, self.name, self.version)
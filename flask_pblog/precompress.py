@@ -0,0 +1,89 @@
+"""Precompressed variants of post pages.
+
+Post pages only change when posts are published, so they are compressed
+once at publish time and served as is to clients accepting the encoding.
+
+A variant is stored along with a key standing for what the page depends
+on. A variant whose key does not match the current one is outdated and is
+not served.
+
+Brotli compression needs the ``brotli`` package.
+"""
+
+import gzip
+import hashlib
+from operator import attrgetter
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+# variant names
+PAGE = 'page'
+MARKDOWN = 'md'
+
+
+def gzip_compress(content):
+    return gzip.compress(content, compresslevel=9)
+
+
+def brotli_compress(content):
+    return brotli.compress(content)
+
+
+COMPRESSORS = {
+    'gzip': gzip_compress,
+    'br': brotli_compress,
+}
+
+
+def check_encodings(encodings):
+    """Checks that some encodings are supported.
+
+    Raises:
+        ValueError: if an encoding is unknown or needs a missing package
+    """
+    for encoding in encodings:
+        if encoding not in COMPRESSORS:
+            raise ValueError("Unknown encoding '{}'".format(encoding))
+        if encoding == 'br' and brotli is None:
+            raise ValueError("The brotli package is needed for 'br' encoding")
+
+
+def compress(content, encodings):
+    """Compresses a content with some encodings.
+
+    Args:
+        content (bytes):
+        encodings (iterable of str): ``gzip`` or ``br``
+
+    Returns:
+        dict: compressed contents by encoding
+    """
+    return {encoding: COMPRESSORS[encoding](content) for encoding in encodings}
+
+
+def variant_key(post, topics=None):
+    """Builds the key of a post variant.
+
+    The key does not depend on the order topics are listed in, which
+    differs between the database and the read model on some collations,
+    nor on the fraction of a second the post was updated at, which some
+    databases do not store.
+
+    Args:
+        post: the post, or its read model record
+        topics (list of flask_pblog.storage.TopicSummary): topics listed in
+            the page, for page variants
+
+    Returns:
+        str:
+    """
+    parts = [str(post.id), post.updated_at.replace(microsecond=0).isoformat()]
+    if topics is not None:
+        parts.extend(
+            '{}:{}:{}'.format(t.id, t.name, t.slug)
+            for t in sorted(topics, key=attrgetter('id')))
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()
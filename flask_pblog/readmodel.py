@@ -0,0 +1,218 @@
+"""In-memory read model of post metadata.
+
+The public views mostly need the same few fields of every post: id, slug,
+title, summary, publication date and topic. The read model keeps those
+fields of all posts in memory, so that post lists, topic lists and the
+sidebar are served without querying the database.
+
+The read model is refreshed when posts are written with its storage, and
+reloaded when the posts version shows that another process wrote posts.
+"""
+
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+from operator import attrgetter
+import threading
+import time
+
+from sqlalchemy.orm.exc import NoResultFound
+
+from flask_pblog.models import Post, Topic
+from flask_pblog.storage import TopicSummary
+
+
+class TopicRecord(namedtuple('TopicRecord', 'id name slug')):
+    """Metadata of a topic."""
+    __slots__ = ()
+
+    def __str__(self):
+        return self.name
+
+
+class PostRecord(namedtuple(
+        'PostRecord', 'id slug title summary published_date updated_at topic')):
+    """Metadata of a post, with its :class:`TopicRecord`."""
+    __slots__ = ()
+
+    def __str__(self):
+        return self.title
+
+    @property
+    def sort_key(self):
+        """Key of the post in post lists, latest first."""
+        return (self.published_date, self.id)
+
+
+class Snapshot:
+    """Immutable indexes of post records for a given posts version."""
+    __slots__ = ('stamp', 'posts', 'keys', 'by_id', 'by_topic', 'topics_summary')
+
+    def __init__(self, stamp, posts):
+        """
+        Args:
+            stamp (flask_pblog.storage.PostsStamp): posts stamp the records
+                were loaded at
+            posts (iterable of PostRecord):
+        """
+        self.stamp = stamp
+        # latest first
+        self.posts = sorted(posts, key=attrgetter('sort_key'), reverse=True)
+        self.by_id = {post.id: post for post in self.posts}
+        by_topic = defaultdict(list)
+        for post in self.posts:
+            by_topic[post.topic.id].append(post)
+        self.by_topic = dict(by_topic)
+        # negated keys, so that they are sorted in ascending order
+        self.keys = {
+            topic_id: [negate_key(post.sort_key) for post in posts]
+            for topic_id, posts in self.by_topic.items()}
+        self.keys[None] = [negate_key(post.sort_key) for post in self.posts]
+        self.topics_summary = sorted(
+            (TopicSummary(posts[0].topic.id, posts[0].topic.name, posts[0].topic.slug,
+                          len(posts))
+             for posts in self.by_topic.values()),
+            key=attrgetter('name'))
+
+    @property
+    def version(self):
+        return self.stamp.version
+
+
+def negate_key(key):
+    published_date, post_id = key
+    return (-published_date.toordinal(), -post_id)
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise NoResultFound()
+
+
+class ReadModel:
+    """In-memory read model of post metadata.
+
+    Its read methods mirror the ones of :class:`flask_pblog.storage.Storage`
+    but return :class:`PostRecord` and :class:`TopicRecord` instances.
+
+    Records are loaded on first use. The read model subscribes to the
+    storage writes to update written posts in place. Writes made by other
+    processes are detected by checking the posts version, at most once per
+    ``check_interval`` seconds; the read model is then reloaded.
+    """
+    def __init__(self, storage, check_interval=1.0):
+        """
+        Args:
+            storage (flask_pblog.storage.Storage): storage to load posts from
+            check_interval (float): minimum number of seconds between two
+                checks of the posts version. With 0, it is checked on each
+                read.
+        """
+        self.storage = storage
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        storage.write_listeners.append(self.posts_written)
+
+    def load(self):
+        """Loads the records of all posts."""
+        stamp = self.storage.get_posts_stamp()
+        rows = self.storage.read_session.query(
+            Post.id, Post.slug, Post.title, Post.summary, Post.published_date,
+            Post.updated_at, Topic.id, Topic.name, Topic.slug) \
+            .join(Topic, Post.topic_id == Topic.id)
+        topics = {}
+        posts = []
+        for row in rows:
+            topic = topics.get(row[6])
+            if topic is None:
+                topic = topics[row[6]] = TopicRecord(*row[6:])
+            posts.append(PostRecord(*row[:6], topic=topic))
+        self._snapshot = Snapshot(stamp, posts)
+        self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Discards the loaded records, which are reloaded on next use."""
+        self._snapshot = None
+
+    def posts_written(self, posts):
+        """Updates the records of written posts. Called by the storage once
+        posts are committed.
+
+        Args:
+            posts (list of flask_pblog.models.Post): the written posts, None
+                if unknown.
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return
+            stamp = self.storage.get_posts_stamp()
+            if posts is None or stamp.version != snapshot.version + 1:
+                # other posts were written meanwhile
+                self.invalidate()
+                return
+            records = dict(snapshot.by_id)
+            for post in posts:
+                topic = post.topic
+                records[post.id] = PostRecord(
+                    post.id, post.slug, post.title, post.summary, post.published_date,
+                    post.updated_at, TopicRecord(topic.id, topic.name, topic.slug))
+            self._snapshot = Snapshot(stamp, records.values())
+
+    @property
+    def snapshot(self):
+        """The current records, loaded or reloaded if needed."""
+        with self._lock:
+            if self._snapshot is None:
+                self.load()
+            elif time.monotonic() - self._checked_at >= self.check_interval:
+                self._checked_at = time.monotonic()
+                if self.storage.get_posts_version() != self._snapshot.version:
+                    self.load()
+            return self._snapshot
+
+    def get_posts_stamp(self):
+        """See :meth:`flask_pblog.storage.Storage.get_posts_stamp`."""
+        return self.snapshot.stamp
+
+    def get_posts_page(self, limit, before=None, topic_id=None):
+        """See :meth:`flask_pblog.storage.Storage.get_posts_page`."""
+        snapshot = self.snapshot
+        topic_id = None if topic_id is None else int(topic_id)
+        posts = snapshot.posts if topic_id is None else snapshot.by_topic.get(topic_id, [])
+        start = 0
+        if before is not None:
+            start = bisect_right(snapshot.keys.get(topic_id, []), negate_key(before))
+        return posts[start:start + limit]
+
+    def get_all_posts(self):
+        """See :meth:`flask_pblog.storage.Storage.get_all_posts`."""
+        return list(self.snapshot.posts)
+
+    def get_posts_in_topic(self, topic_id):
+        """See :meth:`flask_pblog.storage.Storage.get_posts_in_topic`."""
+        return list(self.snapshot.by_topic.get(to_int(topic_id), []))
+
+    def get_post(self, post_id):
+        """See :meth:`flask_pblog.storage.Storage.get_post`.
+
+        The post content is not part of the record.
+        """
+        try:
+            return self.snapshot.by_id[to_int(post_id)]
+        except KeyError:
+            raise NoResultFound()
+
+    def get_topic(self, topic_id):
+        """See :meth:`flask_pblog.storage.Storage.get_topic`."""
+        posts = self.snapshot.by_topic.get(to_int(topic_id))
+        if not posts:
+            raise NoResultFound()
+        return posts[0].topic
+
+    def get_topics_summary(self, version=None):
+        """See :meth:`flask_pblog.storage.Storage.get_topics_summary`."""
+        return self.snapshot.topics_summary
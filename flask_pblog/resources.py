@@ -35,13 +35,15 @@ from flask import Blueprint
 from flask import current_app
 from flask_restful import Api
 from flask_restful import Resource
+from flask_restful import inputs
 from flask_restful import reqparse
 import itsdangerous
 from sqlalchemy.orm.exc import NoResultFound
 from werkzeug.datastructures import FileStorage
 
 from flask_pblog import security
-from flask_pblog.schemas import PostSchema
+from flask_pblog.schemas import PostRevisionSchema, PostSchema
+from flask_pblog.views import store_post_variants
 from pblog.package import read_package, PackageException, PackageValidationError
 
 
@@ -153,20 +155,24 @@ class PostListResource(Resource):
         md = current_app.extensions['pblog'].markdown
         resource_path = current_app.extensions['pblog'].post_resource_path
         resource_url = current_app.extensions['pblog'].post_resource_url
+        buffer_size = current_app.extensions['pblog'].resource_buffer_size
         args = parser.parse_args()
 
         try:
-            post_package = read_package(args.post.stream)
+            post_package = read_package(args.post.stream, buffer_size)
         except PackageValidationError as e:
             return dict(errors=e.errors), 400
         except PackageException as e:
             return dict(errors={'__all__': [str(e)]})
 
-        post_package.set_default_values()
-        post_package.build_html_content(md, resource_url)
-        md.reset()
-        post = storage.create_post(post_package)
-        storage.save_resources(resource_path, post_package)
+        with post_package:
+            post_package.set_default_values()
+            post_package.build_html_content(
+                md, resource_url, current_app.extensions['pblog'].versioned_resource_urls)
+            md.reset()
+            post = storage.create_post(post_package, before_commit=store_post_variants)
+            storage.save_resources(
+                resource_path, post_package, current_app.extensions['pblog'].resource_store)
 
         post_schema = PostSchema()
         return post_schema.dump(post).data, 201
@@ -189,9 +195,10 @@ class PostResource(Resource):
         md = current_app.extensions['pblog'].markdown
         resource_path = current_app.extensions['pblog'].post_resource_path
         resource_url = current_app.extensions['pblog'].post_resource_url
+        buffer_size = current_app.extensions['pblog'].resource_buffer_size
 
         try:
-            post = storage.get_post(post_id)
+            post = storage.get_post(post_id, primary=True)
         except NoResultFound:
             return {'post': ["The post with id {} does not exist".format(post_id)]}, 404
 
@@ -199,22 +206,102 @@ class PostResource(Resource):
         args = parser.parse_args()
 
         try:
-            post_package = read_package(args.post.stream)
+            post_package = read_package(args.post.stream, buffer_size)
         except PackageValidationError as e:
             return dict(errors=e.errors), 400
         except PackageException as e:
             return dict(errors={'__all__': [str(e)]})
 
-        post_package.set_default_values()
-        post_package.build_html_content(md, resource_url)
-        md.reset()
-        storage.update_post(post, post_package)
-        storage.save_resources(resource_path, post_package)
+        with post_package:
+            post_package.set_default_values()
+            post_package.build_html_content(
+                md, resource_url, current_app.extensions['pblog'].versioned_resource_urls)
+            md.reset()
+            storage.update_post(post, post_package, before_commit=store_post_variants)
+            storage.save_resources(
+                resource_path, post_package, current_app.extensions['pblog'].resource_store)
 
         post_schema = PostSchema()
         return post_schema.dump(post).data
 
 
+@api.resource('/posts/<int:post_id>/revisions')
+class PostRevisionListResource(Resource):
+    @auth_required
+    def get(self, post_id):
+        """List the revisions of a post, latest first
+
+        Returns a 200 response with the revisions, without their content.
+
+        A 404 will be returned if the post does not exist.
+        """
+        storage = current_app.extensions['pblog'].storage
+
+        try:
+            storage.get_post(post_id, primary=True)
+        except NoResultFound:
+            return {'post': ["The post with id {} does not exist".format(post_id)]}, 404
+
+        revision_schema = PostRevisionSchema(many=True)
+        return revision_schema.dump(storage.get_post_revisions(post_id)).data
+
+
+@api.resource('/posts/<int:post_id>/revisions/<int:number>')
+class PostRevisionResource(Resource):
+    @auth_required
+    def get(self, post_id, number):
+        """Fetch a revision of a post
+
+        Returns a 200 response with the revision and its markdown content in
+        a "md_content" field.
+
+        A 404 will be returned if the revision does not exist.
+        """
+        storage = current_app.extensions['pblog'].storage
+
+        try:
+            revision, md_content = storage.get_post_revision(post_id, number)
+        except NoResultFound:
+            return {'revision': [
+                "The revision {} of post {} does not exist".format(number, post_id)]}, 404
+
+        revision_schema = PostRevisionSchema()
+        return dict(revision_schema.dump(revision).data, md_content=md_content)
+
+
+@api.resource('/search')
+class SearchResource(Resource):
+    def get(self):
+        """Search posts by words of their title, summary or content.
+
+        The request must have the following parameters:
+            + q: words to search
+            + page: optional page of results, starting at 1
+
+        Returns a 200 response with the found posts, most relevant first,
+        in a "posts" list, and the number of the next page in "next_page",
+        null if this is the last page.
+
+        A 404 will be returned if posts are not indexed.
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument('q', required=True, location='args')
+        parser.add_argument('page', type=inputs.positive, default=1, location='args')
+        args = parser.parse_args()
+        storage = current_app.extensions['pblog'].storage
+        per_page = current_app.extensions['pblog'].posts_per_page
+
+        if storage.search_index is None:
+            return dict(message='not found'), 404
+
+        # fetch one more post to know if there is a next page
+        posts = storage.search_posts(args.q, per_page + 1, (args.page - 1) * per_page)
+        next_page = args.page + 1 if len(posts) > per_page else None
+
+        post_schema = PostSchema(many=True)
+        return dict(posts=post_schema.dump(posts[:per_page]).data, next_page=next_page)
+
+
 @api.resource('/', '/<path:path>')
 class NotFound(Resource):
     def dispatch_request(self, *args, **kwargs):
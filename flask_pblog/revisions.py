@@ -0,0 +1,88 @@
+"""Line based deltas between markdown contents, used to store post revisions.
+
+A revision is stored as a delta against the version following it. A delta is
+a list of operations rebuilding the revision lines from the lines of the
+following version:
+
+    + ``[start, end]`` copies lines ``start`` to ``end`` of the following
+      version,
+    + ``"text"`` inserts some lines.
+
+Deltas are serialized to JSON and compressed.
+"""
+
+from difflib import SequenceMatcher
+import json
+import zlib
+
+
+# every revision numbered by a multiple of this is stored in full, so that
+# rebuilding a revision never applies more deltas than this
+SNAPSHOT_INTERVAL = 16
+
+
+def compress(content):
+    """Compresses a content stored in full.
+
+    Args:
+        content (str):
+
+    Returns:
+        bytes:
+    """
+    return zlib.compress(content.encode('utf-8'))
+
+
+def decompress(data):
+    """Decompresses a content stored in full.
+
+    Args:
+        data (bytes):
+
+    Returns:
+        str:
+    """
+    return zlib.decompress(data).decode('utf-8')
+
+
+def make_delta(base, content):
+    """Computes the delta rebuilding a content from a base content.
+
+    Args:
+        base (str): the base content
+        content (str): the content to rebuild
+
+    Returns:
+        bytes: the compressed delta
+    """
+    base_lines = base.splitlines(keepends=True)
+    lines = content.splitlines(keepends=True)
+    operations = []
+    matcher = SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            operations.append([i1, i2])
+        elif j1 < j2:
+            operations.append(''.join(lines[j1:j2]))
+    return zlib.compress(json.dumps(operations, separators=(',', ':')).encode('utf-8'))
+
+
+def apply_delta(base, delta):
+    """Rebuilds a content from a base content and a delta.
+
+    Args:
+        base (str): the base content the delta was computed against
+        delta (bytes): a delta computed by :func:`make_delta`
+
+    Returns:
+        str: the rebuilt content
+    """
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for operation in json.loads(zlib.decompress(delta).decode('utf-8')):
+        if isinstance(operation, str):
+            parts.append(operation)
+        else:
+            start, end = operation
+            parts.extend(base_lines[start:end])
+    return ''.join(parts)
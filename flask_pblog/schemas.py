@@ -15,3 +15,9 @@ class PostSchema(Schema):
     slug = fields.String()
     topic = fields.Nested(TopicSchema)
     published_date = fields.Date()
+
+
+class PostRevisionSchema(Schema):
+    number = fields.Integer()
+    title = fields.String()
+    replaced_date = fields.DateTime()
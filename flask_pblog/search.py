@@ -0,0 +1,109 @@
+"""Full-text search over posts.
+
+A search index is maintained by :class:`flask_pblog.storage.Storage`
+whenever posts are written, in the same transaction as the posts. Search
+backends implement the :class:`SearchIndex` interface.
+"""
+
+import abc
+
+from sqlalchemy import text
+
+
+class SearchIndex(abc.ABC):
+    """Interface of post search indexes.
+
+    Indexes are stored in the database and accessed through the storage
+    sessions, so that they follow the posts transactions.
+    """
+    @abc.abstractmethod
+    def create(self, bind):
+        """Creates the index structures in the database if missing.
+
+        Args:
+            bind (sqlalchemy.engine.Connectable):
+        """
+
+    @abc.abstractmethod
+    def index_posts(self, session, documents):
+        """Adds posts to the index, replacing their existing entries.
+
+        Args:
+            session (sqlalchemy.orm.session.Session):
+            documents (list of tuple): ``(post id, title, summary, content)``
+                tuples of the posts to index.
+        """
+
+    @abc.abstractmethod
+    def search(self, session, query, limit, offset=0):
+        """Searches posts.
+
+        Args:
+            session (sqlalchemy.orm.session.Session):
+            query (str): words to search, as typed by a reader
+            limit (int): maximum number of results
+            offset (int): number of results to skip
+
+        Returns:
+            list: ids of the found posts, most relevant first
+        """
+
+
+def fts5_query(query):
+    """Builds a FTS5 query matching posts that contain all words of a query.
+
+    Each word is quoted, so that FTS5 operators typed by readers are searched
+    as plain words rather than failing as syntax errors.
+
+    Args:
+        query (str):
+
+    Returns:
+        str: a FTS5 query, empty if the query has no word
+    """
+    return ' '.join('"%s"' % word.replace('"', '""') for word in query.split())
+
+
+class SQLiteSearchIndex(SearchIndex):
+    """Search index using a SQLite FTS5 table.
+
+    Results are ranked with BM25, matches in titles weighting more than
+    matches in summaries, which weight more than matches in contents.
+    """
+    def __init__(self, table_name='pblog_posts_search', weights=(10.0, 5.0, 1.0)):
+        """
+        Args:
+            table_name (str): name of the FTS5 table
+            weights (tuple): BM25 weights of title, summary and content
+        """
+        self.table_name = table_name
+        self.weights = weights
+
+    def create(self, bind):
+        bind.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS {} '
+            'USING fts5(title, summary, content)'.format(self.table_name))
+
+    def index_posts(self, session, documents):
+        if not documents:
+            return
+        session.execute(
+            text('DELETE FROM {} WHERE rowid = :id'.format(self.table_name)),
+            [{'id': document[0]} for document in documents])
+        session.execute(
+            text('INSERT INTO {} (rowid, title, summary, content) '
+                 'VALUES (:id, :title, :summary, :content)'.format(self.table_name)),
+            [dict(zip(('id', 'title', 'summary', 'content'), document))
+             for document in documents])
+
+    def search(self, session, query, limit, offset=0):
+        query = fts5_query(query)
+        if not query:
+            return []
+        statement = text(
+            'SELECT rowid FROM {table} WHERE {table} MATCH :query '
+            'ORDER BY bm25({table}, {weights}) LIMIT :limit OFFSET :offset'.format(
+                table=self.table_name,
+                weights=', '.join(str(float(w)) for w in self.weights)))
+        return [row[0] for row in session.execute(
+            statement, {'query': query, 'limit': limit, 'offset': offset})]
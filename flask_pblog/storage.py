@@ -1,46 +1,377 @@
 """This module handles post generation
 """
 
+from collections import namedtuple
+import datetime
+from functools import partial
+from itertools import islice
+
+from sqlalchemy import and_, event, func, or_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer, joinedload
 from sqlalchemy.orm.exc import NoResultFound
 from slugify import slugify
 
-from flask_pblog.models import Topic, Post
+from flask_pblog.models import Topic, Post, PostContent, PostRevision, PostVariant, \
+    Stamp
+from flask_pblog import revisions
+
+
+# name of the stamp bumped on each post write
+POSTS_STAMP = 'posts'
+
+# key of the primary session info set once posts were written with it
+WROTE_POSTS_KEY = 'pblog_wrote_posts'
+
+# key of the session info holding the topic ids resolved in the current
+# transaction, which are cached only once committed
+PENDING_TOPIC_IDS_KEY = 'pblog_pending_topic_ids'
+
+
+@event.listens_for(Session, 'after_rollback')
+def drop_pending_topic_ids(session):
+    """Forgets the topic ids resolved in a transaction which is rolled back,
+    since the topics they stand for may not exist anymore.
+    """
+    session.info.pop(PENDING_TOPIC_IDS_KEY, None)
+
+
+def listing_options():
+    """Query options used to list posts.
+
+    Topics are loaded along with posts, and the content columns, which are
+    not needed in listings, are not loaded.
+    """
+    return (
+        joinedload(Post.topic),
+        defer(Post.inline_md_content),
+        defer(Post.inline_html_content),
+    )
+
+
+def _bind_hook(hook, post):
+    # before commit hooks of single post writes are given the post
+    if hook is None:
+        return None
+    return partial(hook, post)
+
+
+class PostsStamp(namedtuple('PostsStamp', 'version updated_at')):
+    """Version of stored posts, and the last time they were written."""
+    __slots__ = ()
+
+
+class TopicSummary(namedtuple('TopicSummary', 'id name slug post_count')):
+    """Summary of a topic, as listed in pages sidebar."""
+    __slots__ = ()
+
+    def __str__(self):
+        return self.name
 
 
 class Storage:
     """This class implements database access through SQLAlchemy
+
+    Reads may be routed to a read replica by giving a ``read_session``.
+    Once posts were written with the primary session, reads go to the
+    primary session as well, so that writes are visible to the reads that
+    follow them. This lasts as long as the primary session, that is, one
+    request with a Flask-SQLAlchemy session.
     """
-    def __init__(self, session):
+    def __init__(self, session, compress_contents=False, read_session=None,
+                 search_index=None):
         """
         Args:
             session (sqlalchemy.orm.session.Session): session to use to
                 access the database
+            compress_contents (bool): if True, post contents are compressed
+                and stored in their own table rather than inline in the
+                posts table.
+            read_session (sqlalchemy.orm.session.Session): if given,
+                session used for reads, usually bound to a read replica.
+            search_index (flask_pblog.search.SearchIndex): if given, posts
+                are indexed in it when written, and can be searched.
         """
         self.session = session
+        self.compress_contents = compress_contents
+        self._read_session = read_session
+        self.search_index = search_index
+        # callables notified with the written posts once committed, or None
+        # if unknown
+        self.write_listeners = []
+        # (posts version, topic summaries)
+        self._topics_summary_cache = None
+        # ids of committed topics by name. Topics are never deleted, so
+        # those never become outdated.
+        self._topic_ids = {}
+
+    @property
+    def read_session(self):
+        """The session to use for reads.
+
+        This is the read session if any, unless posts were already written
+        with the primary session.
+        """
+        if self._read_session is None or self.session.info.get(WROTE_POSTS_KEY):
+            return self.session
+        return self._read_session
 
-    def get_or_create_topic(self, name):
-        """Try to retrieve a topic by its name.
-        If it does not exist, a new topic instance will be returned.
+    def get_posts_stamp(self):
+        """Get the version of stored posts, and the last time they were
+        written. The version changes whenever a post is created or updated,
+        by any process.
+
+        Returns:
+            flask_pblog.storage.PostsStamp:
+        """
+        stamp = self.read_session.query(Stamp.version, Stamp.updated_at) \
+            .filter_by(name=POSTS_STAMP) \
+            .first()
+        if stamp is None:
+            return PostsStamp(0, None)
+        return PostsStamp(*stamp)
+
+    def get_posts_version(self):
+        """Get the version of stored posts. See :meth:`get_posts_stamp`.
+
+        Returns:
+            int:
+        """
+        return self.get_posts_stamp().version
+
+    def bump_posts_version(self):
+        """Changes the version of stored posts.
+
+        This must be called in the transaction writing the posts.
+        """
+        now = datetime.datetime.utcnow()
+        query = self.session.query(Stamp).filter_by(name=POSTS_STAMP)
+        values = {Stamp.version: Stamp.version + 1, Stamp.updated_at: now}
+        if not query.update(values, synchronize_session=False):
+            # first write: concurrent first writes may both create the stamp
+            self.insert_ignore(Stamp.__table__, ['name'], name=POSTS_STAMP, version=0)
+            query.update(values, synchronize_session=False)
+
+    def commit_posts(self, posts=None, before_commit=None):
+        """Commits written posts and invalidates caches depending on them.
+
+        Following reads are made with the primary session.
+
+        Args:
+            posts (list of flask_pblog.models.Post): the written posts, passed
+                to write listeners. None if unknown.
+            before_commit (callable): if given, called without arguments
+                once the posts are flushed, to write more in the same
+                transaction. Reads made by it see the written posts.
+        """
+        self.session.info[WROTE_POSTS_KEY] = True
+        self.bump_posts_version()
+        pending_topic_ids = self.session.info.get(PENDING_TOPIC_IDS_KEY, {})
+        try:
+            if before_commit is not None:
+                self.session.flush()
+                before_commit()
+            self.session.commit()
+        finally:
+            # summaries read within the transaction may never be committed
+            self._topics_summary_cache = None
+        self.session.info.pop(PENDING_TOPIC_IDS_KEY, None)
+        self._topic_ids.update(pending_topic_ids)
+        for listener in self.write_listeners:
+            listener(posts)
+
+    def insert_ignore(self, table, index_elements, **values):
+        """Inserts a row, unless a row with the same unique values already
+        exists.
+
+        This uses ``INSERT ... ON CONFLICT DO NOTHING`` on PostgreSQL,
+        ``INSERT OR IGNORE`` on SQLite, and a savepoint on other databases,
+        so that concurrent insertions of the same row never fail.
+
+        Args:
+            table (sqlalchemy.Table):
+            index_elements (list of str): columns of the unique constraint
+            values: values of the row
+        """
+        dialect = self.session.get_bind().dialect.name
+
+        if dialect == 'postgresql':
+            self.session.execute(
+                postgresql.insert(table).values(**values)
+                .on_conflict_do_nothing(index_elements=index_elements))
+        elif dialect == 'sqlite':
+            self.session.execute(
+                table.insert().values(**values).prefix_with('OR IGNORE'))
+        else:
+            try:
+                with self.session.begin_nested():
+                    self.session.execute(table.insert().values(**values))
+            except IntegrityError:
+                pass
+
+    def insert_topic(self, name):
+        """Inserts a topic, unless a topic with the same name already exists.
+        See :meth:`insert_ignore`.
+
+        Args:
+            name (str): name of the topic
+        """
+        self.insert_ignore(Topic.__table__, ['name'], name=name, slug=slugify(name))
+
+    def resolve_topics(self, names):
+        """Get the ids of topics given by their names. Missing topics are
+        created, but not committed.
 
-        The new topic will not be persisted in database if created.
+        Known topic ids are cached, so resolving topics that were already
+        seen costs no query. Ids resolved in the current transaction are
+        cached once it is committed by :meth:`commit_posts`, and forgotten
+        if it is rolled back.
+
+        Args:
+            names (iterable of str): names of the topics
+
+        Returns:
+            dict: a dictionary mapping topic names to their ids
+        """
+        pending_topic_ids = self.session.info.setdefault(PENDING_TOPIC_IDS_KEY, {})
+        topic_ids = {}
+        missing = set()
+        for name in names:
+            topic_id = self._topic_ids.get(name, pending_topic_ids.get(name))
+            if topic_id is None:
+                missing.add(name)
+            else:
+                topic_ids[name] = topic_id
+
+        if missing:
+            found = dict(
+                self.session.query(Topic.name, Topic.id).filter(Topic.name.in_(missing)))
+            for name in missing - found.keys():
+                self.insert_topic(name)
+            if len(found) < len(missing):
+                found = dict(
+                    self.session.query(Topic.name, Topic.id).filter(Topic.name.in_(missing)))
+            pending_topic_ids.update(found)
+            topic_ids.update(found)
+
+        return topic_ids
+
+    def resolve_topic_id(self, name):
+        """Get the id of a topic given by its name. The topic is created,
+        but not committed, if missing.
+
+        Args:
+            name (str): name of the topic
+
+        Returns:
+            int: the topic id
+        """
+        return self.resolve_topics([name])[name]
+
+    def get_or_create_topic(self, name):
+        """Retrieve a topic by its name.
+        If it does not exist, it is created, but not committed.
 
         Args:
             name (str): The name of the topic to fetch.
 
         Returns:
-            flask_pblog.models.Topic: The new topic
+            flask_pblog.models.Topic: The topic
         """
-        try:
-            return self.session.query(Topic).filter_by(name=name).one()
-        except NoResultFound:
-            return Topic(name=name, slug=slugify(name))
+        return self.session.query(Topic).get(self.resolve_topic_id(name))
+
+    def set_post_contents(self, post, md_content, html_content):
+        """Sets the contents of a post, storing them according to the
+        ``compress_contents`` setting.
+
+        Args:
+            post (flask_pblog.models.Post):
+            md_content (str):
+            html_content (str):
+        """
+        if self.compress_contents:
+            if post.content is None:
+                post.content = PostContent()
+            post.inline_md_content = ''
+            post.inline_html_content = ''
+        else:
+            post.content = None
+        post.md_content = md_content
+        post.html_content = html_content
+
+    def migrate_contents(self, batch_size=100):
+        """Moves the contents of existing posts to match the
+        ``compress_contents`` setting.
+
+        Posts are migrated and committed by batches.
+
+        Args:
+            batch_size (int): number of posts migrated in a transaction
+
+        Returns:
+            int: number of migrated posts
+        """
+        query = self.session.query(Post)
+        if self.compress_contents:
+            query = query.filter(~Post.content.has())
+        else:
+            query = query.filter(Post.content.has())
+
+        migrated = 0
+        while True:
+            posts = query.order_by(Post.id).limit(batch_size).all()
+            if not posts:
+                return migrated
+            for post in posts:
+                self.set_post_contents(post, post.md_content, post.html_content)
+            self.session.commit()
+            migrated += len(posts)
+
+    def index_posts(self, posts):
+        """Updates the search index entries of some posts, if posts are
+        indexed. This must be called in the transaction writing the posts.
+
+        Args:
+            posts (iterable): posts to index, as
+                ``(post id, title, summary, markdown content)`` tuples
+        """
+        if self.search_index is not None:
+            self.search_index.index_posts(self.session, list(posts))
+
+    def reindex_posts(self, batch_size=100):
+        """Rebuilds the search index entries of all posts, for instance to
+        index the posts written before the search index was set up.
 
-    def create_post(self, post_package):
+        Args:
+            batch_size (int): number of posts indexed in a transaction
+
+        Returns:
+            int: number of indexed posts
+        """
+        query = self.session.query(Post).order_by(Post.id)
+        indexed = 0
+        last_id = None
+        while True:
+            batch = query if last_id is None else query.filter(Post.id > last_id)
+            posts = batch.limit(batch_size).all()
+            if not posts:
+                return indexed
+            self.index_posts(
+                (post.id, post.title, post.summary, post.md_content) for post in posts)
+            self.session.commit()
+            indexed += len(posts)
+            last_id = posts[-1].id
+
+    def create_post(self, post_package, before_commit=None):
         """Creates a new post from a markdown file and saves it in the database.
 
         Args:
             post_package (pblog.package.Package): Post package definition
                 to build a new post from.
+            before_commit (callable): if given, called with the post before
+                it is committed, to write more in the same transaction. See
+                :meth:`commit_posts`.
 
         Returns:
             flask_pblog.models.Post: The created post.
@@ -50,47 +381,327 @@ class Storage:
             slug=post_package.post_slug,
             published_date=post_package.published_date,
             summary=post_package.summary,
-            topic=self.get_or_create_topic(post_package.topic_name),
-            md_content=post_package.markdown_content,
-            html_content=post_package.html_content)
+            updated_at=datetime.datetime.utcnow(),
+            topic_id=self.resolve_topic_id(post_package.topic_name))
+        self.set_post_contents(
+            post, post_package.markdown_content, post_package.html_content)
 
         self.session.add(post)
-        self.session.commit()
+        if self.search_index is not None:
+            self.session.flush()
+            self.index_posts([(
+                post.id, post.title, post.summary, post_package.markdown_content)])
+        self.commit_posts([post], _bind_hook(before_commit, post))
 
         return post
 
-    def update_post(self, post, post_package):
+    def bulk_create_posts(self, post_packages, batch_size=500, on_batch=None):
+        """Creates many posts at once.
+
+        Posts are inserted and committed by batches. For each batch, topics
+        are resolved in a single query and posts are inserted with a single
+        statement.
+
+        Args:
+            post_packages (iterable of pblog.package.Package): definitions
+                of the posts to create, with their HTML content built.
+            batch_size (int): number of posts inserted by transaction
+            on_batch (callable): if given, called with the list of
+                committed packages after each batch.
+
+        Returns:
+            int: number of created posts
+        """
+        post_packages = iter(post_packages)
+        created = 0
+
+        while True:
+            batch = list(islice(post_packages, batch_size))
+            if not batch:
+                return created
+
+            topic_ids = self.resolve_topics({p.topic_name for p in batch})
+            now = datetime.datetime.utcnow()
+
+            rows = [{
+                'title': post_package.post_title,
+                'slug': post_package.post_slug,
+                'published_date': post_package.published_date,
+                'summary': post_package.summary,
+                'updated_at': now,
+                'topic_id': topic_ids[post_package.topic_name],
+                'inline_md_content': post_package.markdown_content,
+                'inline_html_content': post_package.html_content,
+            } for post_package in batch]
+
+            if self.compress_contents:
+                # contents rows need the ids of the inserted posts
+                for row in rows:
+                    row['inline_md_content'] = row['inline_html_content'] = ''
+                self.session.bulk_insert_mappings(Post, rows, return_defaults=True)
+                contents = []
+                for row, post_package in zip(rows, batch):
+                    content = PostContent(post_id=row['id'])
+                    content.md_content = post_package.markdown_content
+                    content.html_content = post_package.html_content
+                    contents.append(content)
+                self.session.bulk_save_objects(contents)
+            else:
+                # inserted posts ids are only needed to index them
+                self.session.bulk_insert_mappings(
+                    Post, rows, return_defaults=self.search_index is not None)
+
+            self.index_posts(
+                (row['id'], post_package.post_title, post_package.summary,
+                 post_package.markdown_content)
+                for row, post_package in zip(rows, batch))
+            self.commit_posts()
+            created += len(batch)
+            if on_batch is not None:
+                on_batch(batch)
+
+    def update_post(self, post, post_package, before_commit=None):
         """Updates a post from a markdown file and saves it in the database.
 
+        The previous markdown content is kept as a revision if it changes.
+
         Args:
             post (flask_pblog.models.Post): The post to update
             md_package (pblog.package.Package): Post package definition to
                 update post from.
+            before_commit (callable): if given, called with the post before
+                it is committed, to write more in the same transaction. See
+                :meth:`commit_posts`.
         """
+        if post.md_content != post_package.markdown_content:
+            self.add_revision(post, post_package.markdown_content)
         post.title = post_package.post_title
         post.slug = post_package.post_slug
         post.published_date = post_package.published_date
         post.summary = post_package.summary
-        post.topic = self.get_or_create_topic(post_package.topic_name)
-        post.md_content = post_package.markdown_content
-        post.html_content = post_package.html_content
+        post.updated_at = datetime.datetime.utcnow()
+        post.topic_id = self.resolve_topic_id(post_package.topic_name)
+        self.set_post_contents(
+            post, post_package.markdown_content, post_package.html_content)
 
         self.session.add(post)
-        self.session.commit()
+        self.index_posts([(
+            post.id, post.title, post.summary, post_package.markdown_content)])
+        self.commit_posts([post], _bind_hook(before_commit, post))
+
+    def add_revision(self, post, md_content):
+        """Keeps the current version of a post as a revision, before its
+        markdown content is replaced. The revision is not committed.
+
+        The revision is stored as a delta against the new content, except
+        every ``flask_pblog.revisions.SNAPSHOT_INTERVAL`` revisions, which
+        are stored in full.
+
+        Args:
+            post (flask_pblog.models.Post): the post, not updated yet
+            md_content (str): the new markdown content of the post
+        """
+        number = (self.session.query(func.max(PostRevision.number))
+                  .filter_by(post_id=post.id)
+                  .scalar() or 0) + 1
+        is_snapshot = number % revisions.SNAPSHOT_INTERVAL == 0
+        if is_snapshot:
+            data = revisions.compress(post.md_content)
+        else:
+            data = revisions.make_delta(md_content, post.md_content)
+
+        self.session.add(PostRevision(
+            post_id=post.id, number=number, title=post.title,
+            replaced_date=datetime.datetime.utcnow(),
+            is_snapshot=is_snapshot, data=data))
+
+    def get_post_revisions(self, post_id):
+        """Get the revisions of a post, latest first, without their content.
+
+        Args:
+            post_id: Unique identifier of the post
+
+        Returns:
+            list of flask_pblog.models.PostRevision:
+        """
+        return self.session.query(PostRevision) \
+            .options(defer(PostRevision.data)) \
+            .filter_by(post_id=post_id) \
+            .order_by(PostRevision.number.desc()) \
+            .all()
+
+    def get_post_revision(self, post_id, number):
+        """Get a revision of a post along with its markdown content.
+
+        The content is rebuilt from the closest following snapshot, or from
+        the current post content, applying at most
+        ``flask_pblog.revisions.SNAPSHOT_INTERVAL`` deltas.
+
+        Args:
+            post_id: Unique identifier of the post
+            number (int): number of the revision
+
+        Raises:
+            sqlalchemy.orm.exc.NoResultFound: If the revision does not exist
+
+        Returns:
+            tuple: the ``flask_pblog.models.PostRevision`` and its markdown
+                content
+        """
+        query = self.session.query(PostRevision).filter(
+            PostRevision.post_id == post_id, PostRevision.number >= number)
+        snapshot_number = self.session.query(func.min(PostRevision.number)) \
+            .filter(PostRevision.post_id == post_id,
+                    PostRevision.number >= number,
+                    PostRevision.is_snapshot) \
+            .scalar()
+        if snapshot_number is not None:
+            query = query.filter(PostRevision.number <= snapshot_number)
+        chain = query.order_by(PostRevision.number.desc()).all()
+        if not chain or chain[-1].number != number:
+            raise NoResultFound()
+        target = chain[-1]
+
+        if snapshot_number is not None:
+            content = revisions.decompress(chain[0].data)
+            chain = chain[1:]
+        else:
+            content = self.session.query(Post).filter_by(id=post_id).one().md_content
+        for revision in chain:
+            content = revisions.apply_delta(content, revision.data)
+
+        return target, content
+
+    def set_post_variants(self, post_id, name, key, variants):
+        """Replaces the precompressed variants of a post page or content. The
+        variants are not committed, so that they are written in the
+        transaction of the post.
+
+        Args:
+            post_id: Unique identifier of the post
+            name (str): name of the variants, such as
+                ``flask_pblog.precompress.PAGE``
+            key (str): key of what the compressed content depends on
+            variants (dict): compressed contents by encoding
+        """
+        self.session.query(PostVariant) \
+            .filter_by(post_id=post_id, name=name) \
+            .delete(synchronize_session=False)
+        self.session.add_all(
+            PostVariant(post_id=post_id, name=name, encoding=encoding, key=key, data=data)
+            for encoding, data in variants.items())
+
+    def get_post_variant(self, post_id, name, key, encodings):
+        """Get an up to date precompressed variant of a post page or content.
+
+        Args:
+            post_id: Unique identifier of the post
+            name (str): name of the variant
+            key (str): current key of what the content depends on. Variants
+                with another key are outdated.
+            encodings (list of str): acceptable encodings, preferred first
+
+        Returns:
+            flask_pblog.models.PostVariant: the variant with the most
+                preferred encoding, None if there is none. Its compressed
+                content is loaded only when accessed, so that conditional
+                requests answered with a 304 do not read it.
+        """
+        variants = {
+            variant.encoding: variant
+            for variant in self.read_session.query(PostVariant).options(
+                defer(PostVariant.data)).filter(
+                PostVariant.post_id == post_id,
+                PostVariant.name == name,
+                PostVariant.key == key,
+                PostVariant.encoding.in_(encodings))}
+        for encoding in encodings:
+            if encoding in variants:
+                return variants[encoding]
+        return None
 
     def get_all_posts(self):
         """Get all stored posts.
 
+        Post topics are loaded in the same query. Post contents are loaded
+        only when accessed.
+
         Returns:
             list of flask_pblog.models.Post:
         """
-        return self.session.query(Post).all()
+        return self.read_session.query(Post).options(*listing_options()).all()
+
+    def get_posts_page(self, limit, before=None, topic_id=None):
+        """Get a page of posts, latest first.
+
+        Posts are ordered by publication date, then by id. Pages are
+        fetched with a cursor (the publication date and id of the last post
+        of the previous page) rather than an offset, so that fetching a page
+        costs the same wherever it is in the list.
+
+        Args:
+            limit (int): maximum number of posts to fetch
+            before (tuple): a ``(published_date, id)`` cursor. If given,
+                only posts placed after this cursor are fetched.
+            topic_id: if given, only posts of this topic are fetched
+
+        Returns:
+            list of flask_pblog.models.Post:
+        """
+        query = self.read_session.query(Post).options(*listing_options())
+
+        if topic_id is not None:
+            query = query.filter(Post.topic_id == topic_id)
+
+        if before is not None:
+            published_date, post_id = before
+            query = query.filter(or_(
+                Post.published_date < published_date,
+                and_(Post.published_date == published_date, Post.id < post_id)))
+
+        return query \
+            .order_by(Post.published_date.desc(), Post.id.desc()) \
+            .limit(limit) \
+            .all()
+
+    def search_posts(self, query, limit, offset=0):
+        """Search posts by words of their title, summary or content.
 
-    def get_post(self, post_id):
+        Post topics are loaded in the same query. Post contents are loaded
+        only when accessed.
+
+        Args:
+            query (str): words to search
+            limit (int): maximum number of posts to fetch
+            offset (int): number of found posts to skip
+
+        Raises:
+            RuntimeError: if the storage has no search index
+
+        Returns:
+            list of flask_pblog.models.Post: found posts, most relevant first
+        """
+        if self.search_index is None:
+            raise RuntimeError("Posts are not indexed")
+
+        post_ids = self.search_index.search(self.read_session, query, limit, offset)
+        if not post_ids:
+            return []
+        posts = self.read_session.query(Post) \
+            .options(*listing_options()) \
+            .filter(Post.id.in_(post_ids))
+        posts_by_id = {post.id: post for post in posts}
+        return [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+
+    def get_post(self, post_id, primary=False):
         """Get a post by its id.
 
+        The post topic and contents are loaded in the same query.
+
         Args:
             post_id: Unique identifier of the post to fetch
+            primary (bool): if True, the post is fetched with the primary
+                session, which is needed to update it.
 
         Raises:
             sqlalchemy.orm.exc.NoResultFound: If no post exists with this id
@@ -98,7 +709,11 @@ class Storage:
         Returns:
             flask_pblog.models.Post: The fetched post
         """
-        return self.session.query(Post).filter_by(id=post_id).one()
+        session = self.session if primary else self.read_session
+        return session.query(Post) \
+            .options(joinedload(Post.topic), joinedload(Post.content)) \
+            .filter_by(id=post_id) \
+            .one()
 
     def get_topic(self, topic_id):
         """Get a topic by its id that have at least one associated post.
@@ -114,7 +729,7 @@ class Storage:
         Returns:
             flask_pblog.models.Topic: The fetched topic
         """
-        return self.session.query(Topic).filter_by(id=topic_id).join(Post).one()
+        return self.read_session.query(Topic).filter_by(id=topic_id).join(Post).one()
 
     def get_all_topics(self):
         """Returns all topics which have at least one associated post
@@ -122,25 +737,64 @@ class Storage:
         Returns:
             list of flask_pblog.models.Topic:
         """
-        return self.session.query(Topic).join(Post).all()
+        return self.read_session.query(Topic).join(Post).all()
+
+    def get_topics_summary(self, version=None):
+        """Get a summary of all topics which have at least one associated
+        post, ordered by name.
+
+        Summaries are cached until posts are written by any process.
+
+        Args:
+            version (int): the current posts version, if already known, to
+                save querying it
+
+        Returns:
+            list of flask_pblog.storage.TopicSummary:
+        """
+        if version is None:
+            version = self.get_posts_version()
+        cache = self._topics_summary_cache
+        if cache is not None and cache[0] == version:
+            return cache[1]
+
+        topics = [
+            TopicSummary(*row) for row in self.read_session.query(
+                Topic.id, Topic.name, Topic.slug, func.count(Post.id))
+            .join(Post)
+            .group_by(Topic.id, Topic.name, Topic.slug)
+            .order_by(Topic.name)
+        ]
+        self._topics_summary_cache = (version, topics)
+
+        return topics
 
     def get_posts_in_topic(self, topic_id):
         """Get all posts belonging to a given topic.
 
+        Post topics are loaded in the same query. Post contents are loaded
+        only when accessed.
+
         Args:
             topic_id: Unique identifier of the topic to filter by
 
         Returns:
             list of flask_pblgo.models.Post: Filtered posts
         """
-        return self.session.query(Post).filter_by(topic_id=topic_id).all()
+        return self.read_session.query(Post) \
+            .options(*listing_options()) \
+            .filter_by(topic_id=topic_id) \
+            .all()
 
-    def save_resources(self, root_path, post_package):
+    def save_resources(self, root_path, post_package, blob_store=None):
         """Save some resurces on disk
 
         Args:
             root_path: pathlib.Path: base path to store resources
             post_package (pblog.package.Package):
+            blob_store (pblog.blobstore.BlobStore): if given, resources
+                contents are deduplicated in this store
         """
         for resource in post_package.resources:
-            resource.save(root_path, post_package.post_slug)
+            resource.save(root_path, post_package.post_slug, blob_store)
+
@@ -1,32 +1,166 @@
+import datetime
+from functools import lru_cache
+import mimetypes
+import os
+import pathlib
+from urllib.parse import quote
+
 from flask import abort
 from flask import Blueprint
 from flask import current_app
+from flask import make_response
 from flask import redirect
 from flask import render_template
+from flask import request
+from flask import safe_join
 from flask import send_from_directory
 from flask import url_for
 from flask import Response
 from sqlalchemy.orm.exc import NoResultFound
 
+from flask_pblog import precompress
+from flask_pblog.loader import drop_loader, get_loader
+from pblog.package import FileResourceHandler, RESOURCE_VERSION_LENGTH
+
 
 blueprint = Blueprint('pblog', __name__, template_folder='templates')
+blueprint.teardown_app_request(drop_loader)
+
+
+def parse_cursor(cursor):
+    """Parses a page cursor.
+
+    Args:
+        cursor (str): a ``<published date>.<post id>`` cursor, for instance
+            ``2017-03-12.42``
+
+    Raises:
+        ValueError: if the cursor is not valid
+
+    Returns:
+        tuple: a ``(published_date, post_id)`` tuple
+    """
+    published_date, post_id = cursor.split('.')
+    return datetime.datetime.strptime(published_date, '%Y-%m-%d').date(), int(post_id)
+
+
+def get_posts_page(topic_id=None):
+    """Fetches the page of posts given by the ``before`` request argument.
+
+    A 400 response is triggered if the cursor is not valid.
+
+    Args:
+        topic_id: if given, only fetch posts of this topic
+
+    Returns:
+        tuple: the list of posts and the cursor of the next page, None if
+            this is the last page.
+    """
+    pblog = current_app.extensions['pblog']
+
+    before = request.args.get('before')
+    if before is not None:
+        try:
+            before = parse_cursor(before)
+        except ValueError:
+            abort(400)
+
+    # fetch one more post to know if there is a next page
+    posts = get_loader().get_posts_page(pblog.posts_per_page + 1, before, topic_id)
+    if len(posts) <= pblog.posts_per_page:
+        return posts, None
+
+    posts = posts[:pblog.posts_per_page]
+    last_post = posts[-1]
+    return posts, '{}.{}'.format(last_post.published_date.isoformat(), last_post.id)
+
+
+def is_not_modified(etag, last_modified):
+    """Tells whether the client has an up to date copy of a resource, from
+    the ``If-None-Match`` and ``If-Modified-Since`` request headers.
+
+    ``If-Modified-Since`` is ignored if ``If-None-Match`` is given.
+    ``If-None-Match`` uses the weak comparison, so that weak entity tags
+    sent back by clients, or by proxies which transformed the response,
+    still match.
+
+    Args:
+        etag (str): strong entity tag of the resource, unquoted
+        last_modified (datetime.datetime): last modification of the
+            resource, in UTC. May be None.
+
+    Returns:
+        bool:
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_response(etag, last_modified, render):
+    """Builds a response with ``ETag`` and ``Last-Modified`` headers.
+
+    A 304 response is returned if the client copy is up to date, in which
+    case the response is not rendered.
+
+    Args:
+        etag (str): strong entity tag of the resource, unquoted
+        last_modified (datetime.datetime): last modification of the
+            resource, in UTC. May be None.
+        render (callable): returns the response content, if needed
+
+    Returns:
+        flask.Response:
+    """
+    if is_not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    return response
+
+
+def posts_etag(stamp):
+    """Entity tag of pages showing posts, which change whenever posts are
+    written.
+
+    Args:
+        stamp (flask_pblog.storage.PostsStamp):
+    """
+    return 'posts-{}'.format(stamp.version)
 
 
 @blueprint.route('/')
 def posts_list():
-    """Show a list of all posts and topics.
+    """Show a page of posts and all topics.
+
+    The page is given by an optional ``before`` cursor argument.
+
+    The response is conditional, its entity tag changing whenever posts are
+    written.
 
     Displays the ``pblog/posts-list.html`` template with the following context:
-        posts: a list of ``pblog.models.Post`` instances
-        categories: a list of all ``pblog.models.Category`` that have posts linked to them.
+        posts: a list of ``pblog.models.Post`` instances, or of
+            ``flask_pblog.readmodel.PostRecord`` if the read model is enabled
+        next_cursor: cursor of the next page, None if this is the last page
+        topics: a sequence of ``flask_pblog.storage.TopicSummary`` of all topics that have posts linked to them, fetched when used.
     """
-    storage = current_app.extensions['pblog'].storage
-    posts = storage.get_all_posts()
-    topics = storage.get_all_topics()
-    return render_template(
-        'pblog/posts-list.html',
-        posts=posts,
-        topics=topics)
+    loader = get_loader()
+    stamp = loader.get_posts_stamp()
+
+    def render():
+        posts, next_cursor = get_posts_page()
+        return render_template(
+            'pblog/posts-list.html',
+            posts=posts,
+            next_cursor=next_cursor,
+            topics=loader.topics())
+
+    return conditional_response(posts_etag(stamp), stamp.updated_at, render)
 
 
 @blueprint.route('/topic/<topic_id>/<slug>')
@@ -39,18 +173,25 @@ def list_posts_in_topic(topic_id, slug):
     If the topic exists but the slug is not the one provided in the url,
     a permanent redirection will be triggered to the correct url.
 
-    Displays the ``pblog/post.html`` template with the following context:
-        post: a ``pblog.models.Post`` instance.
-        categories: a list of all ``pblog.models.Category`` that have posts linked to them.
+    The page is given by an optional ``before`` cursor argument.
+
+    The response is conditional, its entity tag changing whenever posts are
+    written.
+
+    Displays the ``pblog/posts-list.html`` template with the following context:
+        posts: a list of ``pblog.models.Post`` instances, or of
+            ``flask_pblog.readmodel.PostRecord`` if the read model is enabled
+        next_cursor: cursor of the next page, None if this is the last page
+        topics: a sequence of ``flask_pblog.storage.TopicSummary`` of all topics that have posts linked to them, fetched when used.
 
     Args:
         topic_id (int): id of the Category to fetch post for
         slug (string): slug of the topic
     """
-    storage = current_app.extensions['pblog'].storage
+    loader = get_loader()
 
     try:
-        topic = storage.get_topic(topic_id)
+        topic = loader.get_topic(topic_id)
     except NoResultFound:
         abort(404)
 
@@ -60,12 +201,129 @@ def list_posts_in_topic(topic_id, slug):
                     topic_id=topic.id,
                     slug=topic.slug),
             code=301)
-    posts = storage.get_posts_in_topic(topic_id)
+    stamp = loader.get_posts_stamp()
+
+    def render():
+        posts, next_cursor = get_posts_page(topic.id)
+        return render_template(
+            'pblog/posts-list.html',
+            posts=posts,
+            next_cursor=next_cursor,
+            topics=loader.topics())
+
+    return conditional_response(posts_etag(stamp), stamp.updated_at, render)
+
+
+def search_posts_page(query):
+    """Fetches the page of posts matching a search query given by the
+    ``page`` request argument, starting at 1.
+
+    A 400 response is triggered if the page is not valid, and a 404 response
+    if the storage has no search index.
+
+    Args:
+        query (str): words to search
+
+    Returns:
+        tuple: the list of posts and the number of the next page, None if
+            this is the last page.
+    """
+    pblog = current_app.extensions['pblog']
+    if pblog.storage.search_index is None:
+        abort(404)
+
+    try:
+        page = int(request.args.get('page', 1))
+    except ValueError:
+        abort(400)
+    if page < 1:
+        abort(400)
+
+    # fetch one more post to know if there is a next page
+    posts = pblog.storage.search_posts(
+        query, pblog.posts_per_page + 1, (page - 1) * pblog.posts_per_page)
+    if len(posts) <= pblog.posts_per_page:
+        return posts, None
+    return posts[:pblog.posts_per_page], page + 1
+
+
+@blueprint.route('/search')
+def search_posts():
+    """Shows a page of posts matching the words of the ``q`` argument, most
+    relevant first.
+
+    The page is given by an optional ``page`` argument.
+
+    If the blog posts are not indexed, a 404 response is returned.
+
+    Displays the ``pblog/search.html`` template with the following context:
+        query: the searched words
+        posts: a list of ``pblog.models.Post`` instances
+        next_page: number of the next page, None if this is the last page
+        topics: a sequence of ``flask_pblog.storage.TopicSummary`` of all topics that have posts linked to them, fetched when used.
+    """
+    query = request.args.get('q', '')
+    posts, next_page = search_posts_page(query)
 
     return render_template(
-        'pblog/posts-list.html',
+        'pblog/search.html',
+        query=query,
         posts=posts,
-        topics=storage.get_all_topics())
+        next_page=next_page,
+        topics=get_loader().topics())
+
+
+def accepted_encodings():
+    """Gives the precompressed encodings accepted by the client, preferred
+    first.
+
+    Returns:
+        list of str:
+    """
+    encodings = current_app.extensions['pblog'].precompressed_encodings
+    qualities = {encoding: request.accept_encodings[encoding] for encoding in encodings}
+    return sorted(
+        (encoding for encoding in encodings if qualities[encoding] > 0),
+        key=lambda encoding: -qualities[encoding])
+
+
+def render_post(post, topics):
+    """Renders the page of a post.
+
+    Args:
+        post (flask_pblog.models.Post):
+        topics (sequence of flask_pblog.storage.TopicSummary): topics listed
+            in the page
+    """
+    return render_template('pblog/post.html', post=post, topics=topics)
+
+
+def store_post_variants(post):
+    """Compresses the page and the markdown content of a post, and stores
+    them so that they are served without compressing them again.
+
+    This is meant to be given as the ``before_commit`` hook of
+    :meth:`flask_pblog.storage.Storage.create_post` and
+    :meth:`flask_pblog.storage.Storage.update_post`, within a request, so
+    that the variants are committed along with the post. The variants are
+    not committed otherwise.
+
+    Args:
+        post (flask_pblog.models.Post): the published post
+    """
+    pblog = current_app.extensions['pblog']
+    if not pblog.precompressed_encodings:
+        return
+
+    # the reader may not see the post before it is committed
+    topics = pblog.storage.get_topics_summary()
+    for name, key, content in [
+            (precompress.PAGE, precompress.variant_key(post, topics),
+             render_post(post, topics)),
+            (precompress.MARKDOWN, precompress.variant_key(post), post.md_content)]:
+        pblog.storage.set_post_variants(
+            post.id, name, key,
+            precompress.compress(content.encode('utf-8'), pblog.precompressed_encodings))
 
 
 @blueprint.route('/post/<post_id>/<slug>.md', defaults={'is_markdown': True})
@@ -78,9 +336,16 @@ def show_post(post_id, slug, is_markdown):
 
     If the post does not exists, a 404 response will be returned.
 
+    The response is conditional. The entity tag of the HTML version changes
+    whenever posts are written, since the page lists topics. The one of the
+    markdown version changes whenever the post is updated.
+
+    If the client accepts it, a variant compressed when the post was
+    published is sent as is.
+
     Displays the ``pblog/post.html`` template with the following context:
         post: a ``pblog.models.Post`` instance.
-        categories: a list of all ``pblog.models.Category`` that have posts linked to them.
+        topics: a sequence of ``flask_pblog.storage.TopicSummary`` of all topics that have posts linked to them, fetched when used.
 
     Args:
         post_id (str): unique identifier of the post
@@ -89,10 +354,10 @@ def show_post(post_id, slug, is_markdown):
         is_markdown (bool): If True, will display the markdown content of the
             post. If False, will display the HTML rendered version
     """
-    storage = current_app.extensions['pblog'].storage
-    topics = storage.get_all_topics()
+    pblog = current_app.extensions['pblog']
+    loader = get_loader()
     try:
-        post = storage.get_post(post_id)
+        post = loader.get_post(post_id)
     except NoResultFound:
         abort(404)
 
@@ -105,15 +370,142 @@ def show_post(post_id, slug, is_markdown):
                     is_markdown=is_markdown),
             code=301)
 
+    encodings = accepted_encodings()
     if is_markdown:
-        return Response(post.md_content, mimetype='text/plain')
-    return render_template('pblog/post.html', post=post, topics=topics)
+        etag = 'post-{}-{:%Y%m%d%H%M%S%f}'.format(post.id, post.updated_at)
+        last_modified = post.updated_at
+        name, key, mimetype = precompress.MARKDOWN, precompress.variant_key(post), 'text/plain'
+    else:
+        stamp = loader.get_posts_stamp()
+        etag = posts_etag(stamp)
+        last_modified = stamp.updated_at
+        name, mimetype = precompress.PAGE, 'text/html'
+        if encodings:
+            key = precompress.variant_key(post, loader.get_topics_summary())
+
+    variant = None
+    if encodings:
+        variant = pblog.storage.get_post_variant(post.id, name, key, encodings)
+    if variant is not None:
+        # each encoding is a distinct representation
+        etag = '{}-{}'.format(etag, variant.encoding)
+
+    def render():
+        if variant is not None:
+            return Response(
+                variant.data, mimetype=mimetype,
+                headers={'Content-Encoding': variant.encoding})
+        full_post = post
+        if pblog.reader is not pblog.storage:
+            # read model records have no content
+            try:
+                full_post = pblog.storage.get_post(post_id)
+            except NoResultFound:
+                abort(404)
+        if is_markdown:
+            return Response(full_post.md_content, mimetype=mimetype)
+        return render_post(full_post, loader.topics())
+
+    response = conditional_response(etag, last_modified, render)
+    if pblog.precompressed_encodings:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+# resources whose URL holds their version never change
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# maximum number of hashed resource file versions kept by a process
+RESOURCE_VERSIONS_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=RESOURCE_VERSIONS_CACHE_SIZE)
+def file_version(file_path, mtime_ns, size):
+    # the modification time and size make a modified file miss the cache
+    resource = FileResourceHandler(
+        pathlib.Path(file_path), pathlib.Path(os.path.basename(file_path)))
+    return resource.version()
+
+
+def resource_version(file_path, expected=''):
+    """Gives the version of a resource file, as appended to resource URLs.
+
+    The version of a resource linked to the blob store is read from the
+    name of its blob, hard linked blobs being looked for among the ones
+    matching the expected version. Other files are hashed, and their
+    versions are cached until they are modified.
+
+    Args:
+        file_path (str): path of the resource file
+        expected (str): version the file is expected to have, such as the
+            one of a resource URL
+
+    Returns:
+        str:
+    """
+    blob_store = current_app.extensions['pblog'].resource_store
+    if blob_store is not None:
+        digest = blob_store.linked_digest(pathlib.Path(file_path), expected)
+        if digest is not None:
+            return digest[:RESOURCE_VERSION_LENGTH]
+    stat = os.stat(file_path)
+    return file_version(file_path, stat.st_mtime_ns, stat.st_size)
+
+
+def offload_resource_file(path, file_path):
+    """Builds a response having the front server send a resource file.
+
+    Args:
+        path (str): path of the resource, relative to the resources path
+        file_path (str): path of the resource file
+    """
+    pblog = current_app.extensions['pblog']
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    response = Response(mimetype=mimetype)
+    if pblog.resource_offload == 'x-sendfile':
+        response.headers['X-Sendfile'] = os.path.abspath(file_path)
+    else:
+        response.headers['X-Accel-Redirect'] = (
+            pblog.resource_accel_prefix.rstrip('/') + '/' + quote(path))
+    return response
 
 
 @blueprint.route('/resources/<path:path>')
 def serve_resource_file(path):
-    post_resource_path = current_app.extensions['pblog'].post_resource_path
-    return send_from_directory(post_resource_path, path)
+    """Serves a resource file of a post.
+
+    If the ``PBLOG_RESOURCES_OFFLOAD`` setting is set, the file is not sent
+    by the application but by the front server, given the path of the file
+    in an ``X-Sendfile`` or ``X-Accel-Redirect`` header.
+
+    If the URL holds the current version of the resource, as a ``v``
+    argument, the response can be cached forever.
+
+    Hidden files and directories, such as the ``.blobs`` store of
+    deduplicated resources, are not served.
+    """
+    if any(part.startswith('.') for part in path.split('/')):
+        abort(404)
+
+    pblog = current_app.extensions['pblog']
+    post_resource_path = pblog.post_resource_path
+    version = request.args.get('v')
+    file_path = None
+    if pblog.resource_offload is not None or version is not None:
+        file_path = safe_join(str(post_resource_path), path)
+        if not os.path.isfile(file_path):
+            abort(404)
+
+    if pblog.resource_offload is not None:
+        response = offload_resource_file(path, file_path)
+    else:
+        response = send_from_directory(post_resource_path, path)
+
+    if version is not None and version == resource_version(file_path, version):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    return response
 
 
 @blueprint.app_errorhandler(404)
@@ -121,7 +513,6 @@ def show_404(err):
     """Displays the default 404 page.
 
     The template is ``pblog.404.html`` and have the following context:
-        categories: a list of all ``pblog.models.Category`` that have posts linked to them.
+        topics: a sequence of ``flask_pblog.storage.TopicSummary`` of all topics that have posts linked to them, fetched when used.
     """
-    topics = current_app.extensions['pblog'].storage.get_all_topics()
-    return render_template('pblog/404.html', topics=topics), err.code
+    return render_template('pblog/404.html', topics=get_loader().topics()), err.code
@@ -0,0 +1,194 @@
+"""This module implements a content-addressed store for post resources.
+
+Resource contents are stored once, in a file named after their SHA-256
+digest:
+
+.. code::
+
+   <store root>/3a/7bd3e2360a3d29eea436fcfb7e44c735d117c42d1c1835420b6b9942dd4f1b
+
+Resource paths of posts are then links (hard or symbolic) to those blobs.
+A resource shared by several posts is stored only once, and saving a
+resource that did not change since the last save writes nothing.
+"""
+
+import os
+import pathlib
+import shutil
+import tempfile
+import uuid
+
+
+__all__ = [
+    'BlobStore',
+]
+
+HEX_DIGITS = frozenset('0123456789abcdef')
+
+
+class BlobStore:
+    """A content-addressed blob store.
+
+    Hardlinks require the store and the linked resources to live on the
+    same filesystem. Symbolic links do not, but the store must then be
+    reachable by whatever serves the resources.
+    """
+    LINK_MODES = ('hardlink', 'symlink')
+
+    def __init__(self, root_path, link_mode='hardlink'):
+        """
+        Args:
+            root_path (pathlib.Path): directory of the store. It will be
+                created if needed.
+            link_mode (str): either ``'hardlink'`` or ``'symlink'``
+
+        Raises:
+            ValueError: if the link mode is unknown
+        """
+        if link_mode not in self.LINK_MODES:
+            raise ValueError("Unknown link mode {}".format(link_mode))
+        self.root_path = root_path
+        self.link_mode = link_mode
+
+    def blob_path(self, digest):
+        """
+        Args:
+            digest (str): hexadecimal SHA-256 digest of a content
+
+        Returns:
+            pathlib.Path: path of the blob holding this content
+        """
+        return self.root_path / digest[:2] / digest[2:]
+
+    def add(self, resource):
+        """Adds the content of a resource to the store. Nothing is written
+        if the store already holds this content.
+
+        Args:
+            resource (pblog.package.ResourceHandler):
+
+        Returns:
+            pathlib.Path: path of the blob holding the resource content
+        """
+        blob_path = self.blob_path(resource.digest())
+        if blob_path.exists():
+            return blob_path
+
+        try:
+            blob_path.parent.mkdir(mode=0o755, parents=True)
+        except FileExistsError:
+            pass
+
+        # write in a temporary file first so that a blob is never seen
+        # partially written
+        with tempfile.NamedTemporaryFile(
+                dir=str(blob_path.parent), prefix='.', delete=False) as f:
+            with resource.open() as src:
+                shutil.copyfileobj(src, f, resource.buffer_size)
+        os.chmod(f.name, 0o644)
+        os.replace(f.name, str(blob_path))
+
+        return blob_path
+
+    def link(self, blob_path, target_path):
+        """Makes a path point to a blob. Any existing file at this path is
+        replaced.
+
+        Args:
+            blob_path (pathlib.Path): path of the blob
+            target_path (pathlib.Path): path of the link
+
+        Returns:
+            bool: False if the target path already pointed to the blob,
+                True otherwise.
+        """
+        try:
+            if os.path.samefile(str(target_path), str(blob_path)):
+                return False
+        except FileNotFoundError:
+            pass
+
+        tmp_path = target_path.with_name(
+            '.{}.{}.tmp'.format(target_path.name, uuid.uuid4().hex))
+        if self.link_mode == 'symlink':
+            os.symlink(
+                os.path.relpath(str(blob_path), str(target_path.parent)),
+                str(tmp_path))
+        else:
+            os.link(str(blob_path), str(tmp_path))
+        os.replace(str(tmp_path), str(target_path))
+
+        return True
+
+    def linked_digest(self, path, prefix=''):
+        """Gives the digest of the blob a path is linked to, from the name
+        of the blob, without reading it.
+
+        Blobs hard linked to the path are only looked for among the ones
+        whose digest starts with a given prefix, of at least two characters.
+
+        Args:
+            path (pathlib.Path):
+            prefix (str): start of the expected digest
+
+        Returns:
+            str: hexadecimal SHA-256 digest of the content, None if the path
+                is not linked to a blob of this store, or for hardlinks, to
+                a blob matching the prefix
+        """
+        if path.is_symlink():
+            target = pathlib.Path(os.path.abspath(
+                os.path.join(str(path.parent), os.readlink(str(path)))))
+            if target.parent.parent != pathlib.Path(os.path.abspath(str(self.root_path))):
+                return None
+            return target.parent.name + target.name
+
+        if len(prefix) < 2 or not HEX_DIGITS.issuperset(prefix) \
+                or os.stat(str(path)).st_nlink < 2:
+            return None
+        directory = self.root_path / prefix[:2]
+        try:
+            names = os.listdir(str(directory))
+        except FileNotFoundError:
+            return None
+        for name in names:
+            if name.startswith(prefix[2:]) and not name.startswith('.') \
+                    and os.path.samefile(str(directory / name), str(path)):
+                return prefix[:2] + name
+        return None
+
+    def store(self, resource, target_path):
+        """Stores a resource content and links a path to it.
+
+        Args:
+            resource (pblog.package.ResourceHandler):
+            target_path (pathlib.Path): path the resource should be
+                available at
+
+        Returns:
+            bool: True if the target path was changed
+        """
+        return self.link(self.add(resource), target_path)
+
+    def collect_garbage(self):
+        """Removes blobs that are not linked anymore.
+
+        This only works with hardlinks since a blob does not know about
+        symbolic links pointing to it.
+
+        Returns:
+            list of pathlib.Path: paths of the removed blobs
+        """
+        if self.link_mode != 'hardlink':
+            raise ValueError("Garbage collection requires hardlinks")
+
+        removed = []
+        for blob_path in self.root_path.glob('*/*'):
+            # skip blobs being written
+            if blob_path.name.startswith('.'):
+                continue
+            if blob_path.is_file() and blob_path.stat().st_nlink == 1:
+                blob_path.unlink()
+                removed.append(blob_path)
+
+        return removed
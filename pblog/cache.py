@@ -0,0 +1,183 @@
+"""This module implements a local cache of built packages.
+
+Building a package parses the markdown post, reads every resource and
+compresses the whole archive. When neither the post, its resources nor the
+encoding changed since the last build, the existing package can be reused
+as is.
+
+For each post, the cache stores the post metadata, the digests of the post
+and of its resources, and the digest of the produced package in a JSON
+file of the cache directory.
+"""
+
+from datetime import date
+import hashlib
+import json
+
+from pblog.package import FileResourceHandler, Package, PackageException, \
+    get_resources
+
+
+__all__ = [
+    'BuildCache',
+]
+
+
+# bump this to invalidate all existing cache entries
+CACHE_VERSION = 2
+
+
+def file_digest(path, buffer_size=1024 * 1024):
+    """Computes the SHA-256 digest of a file content.
+
+    Args:
+        path (pathlib.Path):
+        buffer_size (int): size of the read chunks
+
+    Returns:
+        str: hexadecimal digest
+    """
+    sha = hashlib.sha256()
+    with path.open('rb') as f:
+        for chunk in iter(lambda: f.read(buffer_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+class BuildCache:
+    """A directory storing information about previously built packages.
+    """
+    def __init__(self, cache_dir):
+        """
+        Args:
+            cache_dir (pathlib.Path): directory of the cache. It will be
+                created if needed.
+        """
+        self.cache_dir = cache_dir
+
+    def entry_path(self, post_path):
+        """
+        Args:
+            post_path (pathlib.Path): path to a markdown post
+
+        Returns:
+            pathlib.Path: path of the cache entry of this post
+        """
+        name = hashlib.sha256(str(post_path).encode()).hexdigest()
+        return self.cache_dir / (name + '.json')
+
+    def get(self, post_path, package_path, encoding, codec, level):
+        """Fetches a previously built package.
+
+        The cache entry is valid only if the post, all of its resources,
+        the encoding, the compression and the package are unchanged since
+        the package was built.
+
+        Args:
+            post_path (pathlib.Path): path to the markdown post
+            package_path (pathlib.Path): path to the package
+            encoding (str): encoding of the markdown post file
+            codec (str): compression codec of the package
+            level (int): compression level of the package
+
+        Returns:
+            pblog.package.Package: information about the package, None if
+                the package needs to be built.
+        """
+        try:
+            with self.entry_path(post_path).open() as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('version') != CACHE_VERSION \
+                or entry['encoding'] != encoding \
+                or entry['codec'] != codec \
+                or entry['level'] != level \
+                or entry['post_name'] != post_path.name \
+                or entry['package_path'] != str(package_path):
+            return None
+
+        try:
+            with post_path.open(encoding=encoding) as post_file:
+                markdown_content = post_file.read()
+            post_digest = hashlib.sha256(markdown_content.encode(encoding)).hexdigest()
+            if post_digest != entry['post_digest']:
+                return None
+            if not package_path.is_file() \
+                    or file_digest(package_path) != entry['package_digest']:
+                return None
+            resources = get_resources(
+                post_path.parent, [(path, None) for path, _ in entry['resources']])
+            for (abs_res_path, _), (_, digest) in zip(resources, entry['resources']):
+                if file_digest(abs_res_path) != digest:
+                    return None
+        except (OSError, ValueError, PackageException):
+            return None
+
+        meta = entry['meta']
+        published_date = meta['published_date']
+        if published_date is not None:
+            published_date = date(*map(int, published_date.split('-')))
+
+        return Package(
+            post_title=meta['title'],
+            topic_name=meta['topic'],
+            markdown_content=markdown_content,
+            summary=entry['summary'],
+            post_encoding=encoding,
+            post_id=meta['id'],
+            post_slug=meta['slug'],
+            published_date=published_date,
+            resources=[
+                FileResourceHandler(abs_res_path, res_path)
+                for abs_res_path, res_path in resources],
+        )
+
+    def put(self, post_path, package_path, package, codec, level):
+        """Stores information about a freshly built package.
+
+        Args:
+            post_path (pathlib.Path): path to the markdown post
+            package_path (pathlib.Path): path to the built package
+            package (pblog.package.Package): the built package information
+            codec (str): compression codec of the package
+            level (int): compression level of the package
+        """
+        published_date = package.published_date
+        if published_date is not None:
+            published_date = published_date.isoformat()
+
+        entry = {
+            'version': CACHE_VERSION,
+            'encoding': package.post_encoding,
+            'codec': codec,
+            'level': level,
+            'post_name': post_path.name,
+            'post_digest': hashlib.sha256(
+                package.markdown_content.encode(package.post_encoding)).hexdigest(),
+            'package_path': str(package_path),
+            'package_digest': file_digest(package_path),
+            'summary': package.summary,
+            'meta': {
+                'id': package.post_id,
+                'title': package.post_title,
+                'slug': package.post_slug,
+                'topic': package.topic_name,
+                'published_date': published_date,
+            },
+            'resources': [
+                (str(resource.path), resource.digest())
+                for resource in package.resources],
+        }
+
+        try:
+            self.cache_dir.mkdir(mode=0o755, parents=True)
+        except FileExistsError:
+            pass
+
+        entry_path = self.entry_path(post_path)
+        tmp_path = entry_path.with_suffix('.tmp')
+        with tmp_path.open('w') as f:
+            json.dump(entry, f)
+        tmp_path.replace(entry_path)
@@ -3,12 +3,15 @@ import importlib
 import logging
 import pathlib
 import threading
+import time
 import os
 
 import click
 
+from pblog.cache import BuildCache
 from pblog.client import AuthenticationError, Client, UnexpectedResponse
-from pblog.package import build_package, PackageException, PackageValidationError
+from pblog.package import build_package, build_packages, read_post, \
+    PackageException, PackageValidationError, CODECS, DEFAULT_CODEC
 
 
 class Environment:
@@ -23,6 +26,7 @@ class Environment:
         self.name = name
         self.url = url
         self.username = username
+        self.local_app_module = local_app_module
         self.local_app = None
         self.local_app_thread = None
 
@@ -101,8 +105,9 @@ def parse_env(env_file, env=None):
 @click.option('-i', '--ini', default='pblog.ini', help='pblog.ini path')
 @click.option('-e', '--env', help='pblog environment')
 @click.option('-a', '--app', is_flag=True, help='run local app')
+@click.option('--cache/--no-cache', default=True, help='reuse unchanged packages')
 @click.pass_context
-def cli(ctx, ini, env, app=False):
+def cli(ctx, ini, env, app=False, cache=True):
     try:
         ini_path = pathlib.Path(ini).resolve()
     except FileNotFoundError:
@@ -120,6 +125,11 @@ def cli(ctx, ini, env, app=False):
     except (EnvError, configparser.Error) as e:
         raise click.ClickException(str(e))
 
+    if cache is True:
+        ctx.obj['cache'] = BuildCache(ini_path.parent / '.pblog-cache')
+    else:
+        ctx.obj['cache'] = None
+
     if app is True:
         if env.local_app is None:
             raise click.ClickException(
@@ -127,12 +137,165 @@ def cli(ctx, ini, env, app=False):
         env.run_local_app()
 
 
+def echo_package_errors(error):
+    """Reports a package error on stderr.
+
+    Args:
+        error (Exception): a :class:`pblog.package.PackageException`, or
+            an error reading the post
+    """
+    click.echo(str(error), err=True)
+    if isinstance(error, PackageValidationError):
+        for field, messages in error.errors.items():
+            for message in messages:
+                click.echo('%s: %s' % (field, message), err=True)
+
+
+@cli.command()
+@click.argument('paths', nargs=-1, required=True)
+@click.option('-o', '--output', default='.', help='packages output directory')
+@click.option('-w', '--workers', type=int, help='number of worker processes')
+@click.option('--encoding', default='utf-8', help='post files encoding')
+@click.option('--codec', type=click.Choice(sorted(CODECS)), default=DEFAULT_CODEC,
+              help='package compression')
+@click.option('--level', type=int, help='package compression level')
+@click.pass_context
+def build(ctx, paths, output, workers, encoding, codec, level):
+    """Build packages of several posts. Directories are searched for
+    markdown posts.
+    """
+    post_paths = []
+    for path in paths:
+        try:
+            path = pathlib.Path(path).resolve()
+        except FileNotFoundError:
+            raise click.ClickException('%s file not found' % path)
+        if path.is_dir():
+            post_paths.extend(sorted(path.glob('*.md')))
+        else:
+            post_paths.append(path)
+
+    out_dir = pathlib.Path(output)
+    if not out_dir.is_dir():
+        raise click.ClickException('%s is not a directory' % out_dir)
+
+    try:
+        report = build_packages(
+            post_paths, out_dir, workers=workers, encoding=encoding,
+            cache=ctx.obj['cache'], codec=codec, level=level)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    for result in report.failed:
+        click.echo('%s:' % result.post_path, err=True)
+        echo_package_errors(result.error)
+
+    click.echo('{} packages built, {} failed in {:.2f}s ({:.1f} posts/s, {:.1f} kB/s)'.format(
+        len(report.succeeded), len(report.failed), report.elapsed,
+        report.posts_per_second, report.bytes_per_second / 1024))
+    if report.failed:
+        raise click.ClickException('some packages could not be built')
+
+
+@cli.command(name='import')
+@click.argument('directory')
+@click.option('--encoding', default='utf-8', help='post files encoding')
+@click.option('--batch-size', default=500, help='number of posts committed at once')
+@click.pass_context
+def import_posts(ctx, directory, encoding, batch_size):
+    """Import the markdown posts of a directory straight into the database
+    of the environment local application.
+
+    Post files are not updated with the ids of the created posts.
+    """
+    env = ctx.obj['env']
+    if env.local_app is None:
+        raise click.ClickException(
+            "No local application defined for environment '%s'" % env.name)
+
+    directory = pathlib.Path(directory)
+    if not directory.is_dir():
+        raise click.ClickException('%s is not a directory' % directory)
+    post_paths = sorted(directory.glob('*.md'))
+    pblog = env.local_app.extensions['pblog']
+    failed = []
+
+    def read_posts():
+        for post_path in post_paths:
+            try:
+                package = read_post(post_path, encoding)
+            except PackageException as e:
+                click.echo('%s:' % post_path, err=True)
+                echo_package_errors(e)
+                failed.append(post_path)
+                continue
+            package.set_default_values()
+            package.build_html_content(
+                pblog.markdown, pblog.post_resource_url, pblog.versioned_resource_urls)
+            pblog.markdown.reset()
+            yield package
+
+    start = time.perf_counter()
+    imported = 0
+
+    def save_batch(batch):
+        nonlocal imported
+        for package in batch:
+            pblog.storage.save_resources(
+                pblog.post_resource_path, package, pblog.resource_store)
+        imported += len(batch)
+        click.echo('{}/{} posts imported ({:.1f} posts/s)'.format(
+            imported, len(post_paths), imported / (time.perf_counter() - start)))
+
+    with env.local_app.app_context():
+        pblog.storage.bulk_create_posts(
+            read_posts(), batch_size=batch_size, on_batch=save_batch)
+
+    click.echo('{} posts imported, {} failed in {:.2f}s'.format(
+        imported, len(failed), time.perf_counter() - start))
+    if failed:
+        raise click.ClickException('some posts could not be imported')
+
+
+@cli.command()
+@click.argument('output')
+@click.option('-w', '--workers', type=int, help='number of worker processes')
+@click.option('--full', is_flag=True, help='render unchanged pages as well')
+@click.pass_context
+def export(ctx, output, workers, full):
+    """Export the blog of the environment local application as static files.
+
+    Only pages that changed since the previous export to the same directory
+    are rendered, unless --full is given.
+    """
+    from flask_pblog.export import export_site
+
+    env = ctx.obj['env']
+    if env.local_app is None:
+        raise click.ClickException(
+            "No local application defined for environment '%s'" % env.name)
+
+    report = export_site(
+        env.local_app, pathlib.Path(output), app_module=env.local_app_module,
+        workers=workers, full=full)
+
+    for url, status_code in sorted(report.errors.items()):
+        click.echo('%s: %d response' % (url, status_code), err=True)
+    click.echo('{} pages exported, {} unchanged, {} failed in {:.2f}s'.format(
+        len(report.rendered), report.skipped, len(report.errors), report.elapsed))
+    if not report.succeeded:
+        raise click.ClickException('some pages could not be exported')
+
+
 @cli.command()
 @click.argument('post_path')
 @click.option('--encoding', default='utf-8', help='post file encoding')
+@click.option('--codec', type=click.Choice(sorted(CODECS)), default=DEFAULT_CODEC,
+              help='package compression')
+@click.option('--level', type=int, help='package compression level')
 @click.option('--password', prompt=True, hide_input=True)
 @click.pass_context
-def publish(ctx, post_path, encoding, password):
+def publish(ctx, post_path, encoding, codec, level, password):
     env = ctx.obj['env']
     try:
         post_path = pathlib.Path(post_path).resolve()
@@ -150,14 +313,13 @@ def publish(ctx, post_path, encoding, password):
         raise click.ClickException("unexpected server response: %s" % e.received_status)
 
     # parse post and report errors if any
-    package_path = post_path.parent / (post_path.stem + '.tar.gz')
+    package_path = post_path.parent / (post_path.stem + CODECS[codec])
     try:
-        package = build_package(post_path, package_path, encoding=encoding)
+        package = build_package(
+            post_path, package_path, encoding=encoding, cache=ctx.obj['cache'],
+            codec=codec, level=level)
     except PackageValidationError as e:
-        click.echo(str(e), err=True)
-        for field, errors in e.errors.items():
-            for error in errors:
-                click.echo('%s: %s' % (field, error), err=True)
+        echo_package_errors(e)
         raise click.ClickException('aborting')
     except PackageException as e:
         raise click.ClickException(str(e))
@@ -1,8 +1,7 @@
-import datetime
-
-from cerberus import Validator
 import requests
 
+from pblog.validation import post_response_schema
+
 
 AUTH_HEADER = 'X-Pblog-Token'
 
@@ -59,25 +58,13 @@ class Client:
         Returns:
             dict: A normalized dictionary.
         """
-        validator = Validator({
-            'id': {'type': 'integer'},
-            'title': {'type': 'string'},
-            'slug': {'type': 'string'},
-            'topic': {'type': 'dict', 'schema': {
-                'id': {'type': 'integer'},
-                'name': {'type': 'string'},
-            }},
-            'published_date': {
-                'type': 'date',
-                'coerce': lambda s: datetime.datetime.strptime(s, '%Y-%m-%d').date()},
-        })
-
-        if not validator.validate(post):
+        normalized_post, errors = post_response_schema.validate(post)
+        if errors:
             raise ResponseContentError(
                 "Response from server did not validate %s" % post,
-                errors=validator.errors)
+                errors=errors)
 
-        return validator.normalized(post)
+        return normalized_post
 
     def authenticate(self, username, password):
         """Authenticate on the web api.
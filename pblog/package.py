@@ -20,33 +20,74 @@ be extracted.
 Otherwise, they are simply ignored.
 """
 
-from io import BytesIO
+import codecs
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO, StringIO
 from datetime import date
+import hashlib
 import os
 import pathlib
+import shutil
 import tarfile
+import tempfile
+import threading
+import time
 from urllib.parse import urljoin
 import yaml
 
-import cerberus
 from markdown import Markdown
+from markdown.treeprocessors import Treeprocessor
 from markdown_extra.meta import MetaExtension, inject_meta
 from markdown_extra.summary import SummaryExtension
 from markdown_extra.resource_path import ResourcePathExtension
 from slugify import slugify
 
+from pblog.validation import package_meta_schema, post_meta_schema
+
 
 __all__ = [
     'PackageException',
     'PackageValidationError',
     'ResourcesNotFound',
     'ResourceHandler',
+    'FileResourceHandler',
+    'SpooledResourceHandler',
+    'MemoryBudget',
     'read_package',
+    'read_package_meta',
+    'read_post_meta',
+    'read_post',
     'build_package',
+    'build_packages',
+    'BuildResult',
+    'BuildReport',
     'Package',
+    'MarkdownParserPool',
+    'ResourceVersionTreeprocessor',
 ]
 
 
+# Package file extensions by compression codec. 'none' builds an
+# uncompressed tarfile, which is the fastest choice when most of the
+# package content is made of already compressed resources (images,
+# archives, ...).
+CODECS = {
+    'gz': '.tar.gz',
+    'bz2': '.tar.bz2',
+    'xz': '.tar.xz',
+    'none': '.tar',
+}
+DEFAULT_CODEC = 'gz'
+
+# Number of hexadecimal digest characters of resource versions.
+RESOURCE_VERSION_LENGTH = 16
+
+# Maximum amount of resource data held in memory at once. Resources bigger
+# than this are spooled to a temporary file and copied in chunks of this size.
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+
 def normalize_path(path):
     """Ensure that an absolute path is the direct one to a file
     (no .. or other thinks).
@@ -86,14 +127,123 @@ class PackageValidationError(PackageException):
         super().__init__(message)
         self.errors = errors
 
+    def __reduce__(self):
+        return self.__class__, (str(self), self.errors)
+
+
+def build_markdown_parser():
+    """Builds the markdown parser used to read posts.
+
+    Returns:
+        markdown.Markdown: A parser extracting post metadata, summary and
+            resource paths.
+    """
+    return Markdown(
+        extensions=[
+            MetaExtension(),
+            SummaryExtension(),
+            ResourcePathExtension(),
+        ],
+    )
+
+
+class ResourceVersionTreeprocessor(Treeprocessor):
+    """Appends the version of resources to their URLs, as a ``v`` query
+    argument, so that the URL of a resource changes along with its content.
+
+    It must run after the ``resource_path`` tree processor, whose resource
+    paths it reads. Nothing is done while :attr:`versions` is None.
+
+    Attributes:
+        versions (dict): resource versions by relative resource path
+            (``pathlib.Path``)
+    """
+    def __init__(self, md):
+        super().__init__(md)
+        self.versions = None
+
+    def run(self, root):
+        if not self.versions:
+            return
+
+        # resource URLs set by the resource_path processor
+        paths = {
+            url: pathlib.Path(path) for path, url in self.md.resource_path
+            if url is not None}
+        resource_tags = self.md.treeprocessors['resource_path'].resource_tags
+        for tag_name, attr_name in resource_tags:
+            for tag in root.iter(tag_name):
+                url = tag.get(attr_name)
+                version = self.versions.get(paths.get(url))
+                if version is not None:
+                    tag.set(attr_name, '{}{}v={}'.format(
+                        url, '&' if '?' in url else '?', version))
+
+
+class MarkdownParserPool:
+    """A thread-safe pool of markdown parsers.
+
+    A markdown parser stores the result of its last conversion (``meta``,
+    ``summary``, ``resource_path``) in its own attributes, so a parser
+    instance must not be shared by concurrent conversions.
+    Parsers are checked out of the pool for the duration of a conversion,
+    then reset and returned to it.
+
+        >>> pool = MarkdownParserPool()
+        >>> with pool.parser() as parser:
+        ...     html = parser.convert(md_content)
+        ...     meta = parser.meta
+    """
+    def __init__(self, factory=build_markdown_parser):
+        """
+        Args:
+            factory (callable): called without arguments to build a new
+                parser when none is available in the pool.
+        """
+        self.factory = factory
+        self._parsers = []
+        self._lock = threading.Lock()
+
+    def checkout(self):
+        """Takes a parser out of the pool. A new one is built if the pool
+        is empty.
+
+        Returns:
+            markdown.Markdown: a parser for exclusive use of the caller
+        """
+        with self._lock:
+            if self._parsers:
+                return self._parsers.pop()
+        return self.factory()
+
+    def checkin(self, parser):
+        """Resets a parser and returns it to the pool.
+
+        Args:
+            parser (markdown.Markdown): a parser previously checked out
+        """
+        parser.reset()
+        parser.meta = None
+        parser.summary = None
+        parser.resource_path = []
+        with self._lock:
+            self._parsers.append(parser)
+
+    @contextmanager
+    def parser(self):
+        """Checks out a parser for the duration of a ``with`` block.
+
+        Yields:
+            markdown.Markdown:
+        """
+        parser = self.checkout()
+        try:
+            yield parser
+        finally:
+            self.checkin(parser)
+
 
-markdown_parser = Markdown(
-    extensions=[
-        MetaExtension(),
-        SummaryExtension(),
-        ResourcePathExtension(),
-    ],
-)
+parser_pool = MarkdownParserPool()
 
 
 class ResourcesNotFound(PackageException):
@@ -108,31 +258,88 @@ class ResourcesNotFound(PackageException):
             ', '.join(resources)))
         self.resources = resources
 
+    def __reduce__(self):
+        return self.__class__, (self.resources,)
+
 
 class ResourceHandler:
     """Wrapper around external post resource for easy filesystem manipulation.
+
+    The base class holds the resource content in memory. Subclasses
+    provide resources backed by a file and will stream their content
+    when saved.
     """
-    def __init__(self, content, path):
+    def __init__(self, content, path, buffer_size=DEFAULT_BUFFER_SIZE):
         """
         Args:
             content (bytes): content of the resource file
             path (pathlib.Path): relative path of the resource
+            buffer_size (int): size of the chunks used to copy the resource
+                content
 
         Raises:
             ValueError: if the resource path is not a relative path
         """
-        self.content = content
+        self._content = content
         if path.is_absolute():
             raise ValueError("path {} must be relative".format(path))
         self.path = path
+        self.buffer_size = buffer_size
+
+    @contextmanager
+    def open(self):
+        """Gives access to the resource content.
+
+        Yields:
+            file object: a binary file object opened for reading and
+                positioned at the beginning of the resource content.
+        """
+        yield BytesIO(self._content)
+
+    def digest(self):
+        """Computes the SHA-256 digest of the resource content.
+
+        Returns:
+            str: hexadecimal digest
+        """
+        sha = hashlib.sha256()
+        with self.open() as f:
+            for chunk in iter(lambda: f.read(self.buffer_size), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    def version(self):
+        """Gives a short version of the resource content, which changes
+        whenever the content changes.
+
+        Returns:
+            str:
+        """
+        return self.digest()[:RESOURCE_VERSION_LENGTH]
 
-    def save(self, root_path, directory=None):
+    def close(self):
+        """Releases the resource content, which cannot be read afterwards."""
+
+    @property
+    def content(self):
+        """bytes: the whole resource content.
+
+        This loads the whole resource in memory, use :meth:`open` to
+        stream it instead.
+        """
+        with self.open() as f:
+            return f.read()
+
+    def save(self, root_path, directory=None, blob_store=None):
         """Write the resource in a given directory.
 
         Args:
             root_path (pathlib.Path): Where to save this resource
             directory (str): If not None, a specific directory will be
                 created to store this resource within the root path
+            blob_store (pblog.blobstore.BlobStore): If not None, the
+                resource content is stored in this content-addressed store
+                and the resource path is linked to it.
 
         Raises:
             FileNotFoundError: if the root_path does not exist
@@ -169,8 +376,162 @@ class ResourceHandler:
         except FileExistsError:
             pass
 
-        with resource_path.open('wb') as f:
-            f.write(self.content)
+        if blob_store is not None:
+            blob_store.store(self, resource_path)
+            return
+
+        with self.open() as src, resource_path.open('wb') as f:
+            shutil.copyfileobj(src, f, self.buffer_size)
+
+
+class FileResourceHandler(ResourceHandler):
+    """A resource whose content is read from a file of the local
+    filesystem when needed.
+    """
+    def __init__(self, file_path, path, buffer_size=DEFAULT_BUFFER_SIZE):
+        """
+        Args:
+            file_path (pathlib.Path): path of the file holding the resource
+                content
+            path (pathlib.Path): relative path of the resource
+            buffer_size (int): size of the chunks used to copy the resource
+                content
+        """
+        super().__init__(None, path, buffer_size)
+        self.file_path = file_path
+
+    @contextmanager
+    def open(self):
+        with self.file_path.open('rb') as f:
+            yield f
+
+
+class MemoryBudget:
+    """Amount of memory that several spooled contents may hold altogether.
+
+    Contents are held in memory until the budget is used up, and written
+    to temporary files afterwards. Memory is given back to the budget when
+    a content is released.
+    """
+    def __init__(self, size):
+        """
+        Args:
+            size (int): number of bytes of the budget
+        """
+        self.available = size
+
+    def spool(self, fileobj, buffer_size=DEFAULT_BUFFER_SIZE):
+        """Copies a file object, in memory if the budget allows it, in a
+        temporary file otherwise.
+
+        Args:
+            fileobj (file object): binary file object to copy
+            buffer_size (int): size of the chunks used to copy the content
+
+        Returns:
+            file object: the copy, positioned at its beginning. It must be
+                given to :meth:`release` once not needed anymore.
+        """
+        spooled = memory = BytesIO()
+        for chunk in iter(lambda: fileobj.read(buffer_size), b''):
+            if spooled is memory and memory.tell() + len(chunk) > self.available:
+                spooled = tempfile.TemporaryFile()
+                spooled.write(memory.getvalue())
+                memory.close()
+            spooled.write(chunk)
+        if spooled is memory:
+            self.available -= memory.tell()
+        spooled.seek(0)
+        return spooled
+
+    def release(self, spooled):
+        """Closes a spooled copy, giving the memory it held back.
+
+        Args:
+            spooled (file object): a copy made by :meth:`spool`
+        """
+        if isinstance(spooled, BytesIO) and not spooled.closed:
+            self.available += len(spooled.getbuffer())
+        spooled.close()
+
+
+def spool(fileobj, buffer_size=DEFAULT_BUFFER_SIZE, budget=None):
+    """Copies a file object into memory or into a temporary file.
+
+    Args:
+        fileobj (file object): binary file object to copy
+        buffer_size (int): maximum size of the content held in memory, if
+            no budget is given
+        budget (pblog.package.MemoryBudget): memory shared with other
+            spooled contents
+
+    Returns:
+        file object: the copy, positioned at its beginning
+    """
+    if budget is None:
+        budget = MemoryBudget(buffer_size)
+    return budget.spool(fileobj, buffer_size)
+
+
+class SpooledResourceHandler(ResourceHandler):
+    """A resource copied from a file object into memory or into a temporary
+    file.
+
+    Content is kept in memory as long as the memory budget allows it, and
+    written to disk otherwise. This allows the source file object (a
+    package member for instance) to be closed while the resource is still
+    in use.
+    """
+    def __init__(self, fileobj, path, buffer_size=DEFAULT_BUFFER_SIZE, budget=None):
+        """
+        Args:
+            fileobj (file object): binary file object to read the resource
+                content from
+            path (pathlib.Path): relative path of the resource
+            buffer_size (int): maximum size of the resource to be held in
+                memory, if no budget is given
+            budget (pblog.package.MemoryBudget): memory shared with other
+                resources
+        """
+        super().__init__(None, path, buffer_size)
+        self._budget = budget or MemoryBudget(buffer_size)
+        self._spool = self._budget.spool(fileobj, buffer_size)
+
+    @contextmanager
+    def open(self):
+        self._spool.seek(0)
+        yield self._spool
+
+    def close(self):
+        self._budget.release(self._spool)
+
+
+def load_package_meta(content):
+    """Parses and validate the content of a package.yml file.
+
+    Args:
+        content (bytes): content of the package.yml file
+
+    Raises:
+        pblog.package.PackageException: If the content is not valid YAML
+            or is empty.
+        pblog.package.PackageValidationError: If the metadata fails to validate.
+        UnicodeDecodeError: If the package encoding is not utf-8
+
+    Returns:
+        dict: parsed metadata
+    """
+    try:
+        meta = yaml.safe_load(content.decode())
+    except yaml.YAMLError:
+        raise PackageException(
+            "The package.yml file does not contain valid YAML")
+    if meta is None:
+        raise PackageException("package.yml file is empty")
+    meta, errors = package_meta_schema.validate(meta)
+    if errors:
+        raise PackageValidationError("Package metadata is not valid", errors)
+    return meta
 
 
 def extract_package_meta(tar):
@@ -188,30 +549,12 @@ def extract_package_meta(tar):
     Returns:
         dict: extracted metadata
     """
-    validator = cerberus.Validator({
-        'post': {
-            'type': 'string',
-            'required': True,
-        },
-        'encoding': {
-            'type': 'string',
-            'required': True,
-        },
-    })
     try:
-        meta = yaml.safe_load(tar.extractfile('package.yml').read().decode())
-    except yaml.YAMLError:
-        raise PackageException(
-            "The package.yml file does not contain valid YAML")
+        content = tar.extractfile('package.yml').read()
     except KeyError:
         raise PackageException(
             "The package does not contains a package.yml file")
-    if meta is None:
-        raise PackageException("package.yml file is empty")
-    if not validator.validate(meta):
-        raise PackageValidationError(
-            "Package metadata is not valid", validator.errors)
-    return meta
+    return load_package_meta(content)
 
 
 def normalize_post_meta(post_meta):
@@ -220,49 +563,21 @@ def normalize_post_meta(post_meta):
     Raises:
         pblog.package.PackageValidationError: If the metadata are not valid
     """
-    validator = cerberus.Validator({
-        'id': {
-            'type': 'dict',
-            'required': False,
-            'default': {},
-            'keyschema': {'type': 'string'},
-            'valueschema': {'type': 'integer', 'default': None, 'nullable': True},
-        },
-        'title': {
-            'type': 'string',
-            'required': True,
-        },
-        'slug': {
-            'type': 'string',
-            'nullable': True,
-            'required': False,
-            'default': None,
-            'regex': '^[A-Za-z0-9_-]+$',
-        },
-        'topic': {
-            'type': 'string',
-            'required': True,
-        },
-        'published_date': {
-            'type': 'date',
-            'nullable': True,
-            'default': None,
-        },
-    })
-
-    if not validator.validate(post_meta):
-        raise PackageValidationError(
-            "Post metadata did not validate", validator.errors)
-
-    return validator.normalized(post_meta)
-
-
-def extract_package_resources(tar, resource_paths):
+    post_meta, errors = post_meta_schema.validate(post_meta)
+    if errors:
+        raise PackageValidationError("Post metadata did not validate", errors)
+
+    return post_meta
+
+
+def extract_package_resources(tar, resource_paths, buffer_size=DEFAULT_BUFFER_SIZE):
     """Extract given resources from a package
 
     Args:
         tar (tarfile.TarFile): the package
         resource_paths (list of pathlib.Path): path of resources to extract
+        buffer_size (int): maximum amount of resource data held in memory
+            altogether. Once reached, resources are spooled to disk.
 
     Raises:
         pblog.package.ResourcesNotFound: if some resources did not exist
@@ -273,28 +588,45 @@ def extract_package_resources(tar, resource_paths):
     """
     resources = []
     not_found = []
+    budget = MemoryBudget(buffer_size)
 
     for path in resource_paths:
         try:
             res_content = tar.extractfile(str('resources/' / path))
         except KeyError:
             not_found.append(str(path))
+            continue
+        if res_content is None:
+            # the member is not a regular file
+            not_found.append(str(path))
+            continue
 
-        resources.append(ResourceHandler(res_content.read(), path))
+        resources.append(SpooledResourceHandler(res_content, path, buffer_size, budget))
 
     if not_found:
+        for resource in resources:
+            resource.close()
         raise ResourcesNotFound(not_found)
 
     return resources
 
 
-def read_package(package_path):
-    """
+def read_package(package_path, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Reads a package in a single forward pass.
+
+    Package members are handled in archive order, so the package can be
+    read from a non-seekable stream and a compressed package is
+    decompressed only once.
+    Packages built by :func:`build_package` store ``package.yml``, then the
+    post, then the resources. Members stored before they can be handled
+    (a post before ``package.yml`` for instance) are spooled until needed.
+    Resources that are not referenced by the post are skipped.
+
     Args:
         package_path (pathlib.Path or file oject): path to the package file
             to read
-        parser (markdown.Markdown): a markdown parser instance. If not
-            given, a minimalistic parser will be used.
+        buffer_size (int): maximum amount of resource data held in memory
+            altogether. Once reached, resources are spooled to disk.
 
     Raises:
         UnicodeDecodeError: if the encoding of some file is not valid
@@ -307,37 +639,217 @@ def read_package(package_path):
     Returns:
         pblog.package.Package: An instance containing extracted post data.
     """
-    tar_kwargs = dict(mode='r')
+    # the compression codec is detected by tarfile
+    tar_kwargs = dict(mode='r|*')
     if isinstance(package_path, pathlib.Path):
         tar_kwargs['name'] = str(package_path)
     else:
         tar_kwargs['fileobj'] = package_path
 
-    with tarfile.open(**tar_kwargs) as tar:
-        package_meta = extract_package_meta(tar)
-        post_member = package_meta['post']
-        post_encoding = package_meta['encoding']
-
-        post_md_content = tar.extractfile(post_member).read().decode(post_encoding)
-        markdown_parser.convert(post_md_content)
-        post_meta = normalize_post_meta(markdown_parser.meta)
-        resources = extract_package_resources(
-            tar,
-            (pathlib.Path(e[0]) for e in markdown_parser.resource_path))
-
-        package_info = Package(
-            post_encoding=post_encoding,
+    package_meta = None
+    post_md_content = None
+    post_meta = None
+    # members met before package.yml, which may hold the post
+    pending_members = {}
+    resources = {}
+    # memory shared by everything spooled
+    budget = MemoryBudget(buffer_size)
+    package = None
+
+    try:
+        with tarfile.open(**tar_kwargs) as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+
+                if member.name == 'package.yml':
+                    package_meta = load_package_meta(tar.extractfile(member).read())
+                    post_member = pending_members.get(package_meta['post'])
+                    if post_member is not None:
+                        post_md_content = post_member.read().decode(
+                            package_meta['encoding'])
+                    for pending_member in pending_members.values():
+                        budget.release(pending_member)
+                    pending_members.clear()
+                elif member.name.startswith('resources/'):
+                    path = pathlib.Path(member.name[len('resources/'):])
+                    if post_meta is not None and path not in referenced_paths:
+                        continue
+                    resources[path] = SpooledResourceHandler(
+                        tar.extractfile(member), path, buffer_size, budget)
+                elif package_meta is None:
+                    pending_members[member.name] = budget.spool(
+                        tar.extractfile(member), buffer_size)
+                elif member.name == package_meta['post']:
+                    post_md_content = tar.extractfile(member).read().decode(
+                        package_meta['encoding'])
+
+                if post_md_content is not None and post_meta is None:
+                    with parser_pool.parser() as parser:
+                        parser.convert(post_md_content)
+                        post_meta = normalize_post_meta(parser.meta)
+                        summary = parser.summary
+                        resource_paths = [
+                            pathlib.Path(e[0]) for e in parser.resource_path]
+                    referenced_paths = set(resource_paths)
+                    # release resources spooled before the post was parsed
+                    for path in list(resources):
+                        if path not in referenced_paths:
+                            resources.pop(path).close()
+
+        if package_meta is None:
+            raise PackageException(
+                "The package does not contains a package.yml file")
+        if post_meta is None:
+            raise PackageException(
+                "The package does not contains the {} post file".format(
+                    package_meta['post']))
+
+        not_found = [str(path) for path in resource_paths if path not in resources]
+        if not_found:
+            raise ResourcesNotFound(not_found)
+
+        package = Package(
+            post_encoding=package_meta['encoding'],
             post_id=post_meta['id'],
             post_title=post_meta['title'],
             post_slug=post_meta['slug'],
             topic_name=post_meta['topic'],
             published_date=post_meta['published_date'],
-            summary=markdown_parser.summary,
+            summary=summary,
             markdown_content=post_md_content,
-            resources=resources,
+            resources=[resources[path] for path in resource_paths],
         )
+        return package
+    finally:
+        for pending_member in pending_members.values():
+            budget.release(pending_member)
+        if package is None:
+            for resource in resources.values():
+                resource.close()
+
 
-        return package_info
+def read_meta_header(post_file):
+    """Reads the YAML metadata header of a markdown post.
+
+    Only the lines up to the end of the header are read.
+
+    Args:
+        post_file (file object): text file object of the markdown post
+
+    Raises:
+        pblog.package.PackageException: if the header is not valid YAML
+
+    Returns:
+        dict: the metadata, empty if the post has no header
+    """
+    # same rules as markdown_extra.meta: the first non empty line opens
+    # the header, which ends at the next '---' line.
+    for line in post_file:
+        line = line.rstrip('\r\n')
+        if line.strip():
+            break
+    else:
+        return {}
+    if line != '---':
+        return {}
+
+    meta_lines = []
+    for line in post_file:
+        line = line.rstrip('\r\n')
+        if line == '---':
+            break
+        meta_lines.append(line)
+
+    try:
+        meta = yaml.safe_load('\n'.join(meta_lines))
+    except yaml.YAMLError:
+        raise PackageException("The post metadata is not valid YAML")
+
+    return meta or {}
+
+
+def read_post_meta(post_path, encoding='utf-8'):
+    """Reads the metadata of a markdown post without rendering it.
+
+    Args:
+        post_path (pathlib.Path): path to the markdown post
+        encoding (str): encoding of the markdown post file
+
+    Raises:
+        pblog.package.PackageValidationError: if the metadata are not valid
+        pblog.package.PackageException: if the header is not valid YAML
+
+    Returns:
+        dict: normalized post metadata, see :func:`normalize_post_meta`
+    """
+    with post_path.open(encoding=encoding) as post_file:
+        return normalize_post_meta(read_meta_header(post_file))
+
+
+def read_package_meta(package_path):
+    """Reads the post metadata of a package without rendering the post nor
+    extracting its resources.
+
+    Args:
+        package_path (pathlib.Path or file oject): path to the package file
+            to read
+
+    Raises:
+        UnicodeDecodeError: if the encoding of some file is not valid
+        pblog.package.PackageValidationError: is the format of the package
+            is not valid
+        pblog.package.PackageException: if any other error occured
+
+    Returns:
+        dict: normalized post metadata, see :func:`normalize_post_meta`
+    """
+    tar_kwargs = dict(mode='r|*')
+    if isinstance(package_path, pathlib.Path):
+        tar_kwargs['name'] = str(package_path)
+    else:
+        tar_kwargs['fileobj'] = package_path
+
+    package_meta = None
+    # members met before package.yml, which may hold the post
+    pending_members = {}
+    budget = MemoryBudget(DEFAULT_BUFFER_SIZE)
+
+    try:
+        with tarfile.open(**tar_kwargs) as tar:
+            for member in tar:
+                if not member.isfile() or member.name.startswith('resources/'):
+                    continue
+
+                if member.name == 'package.yml':
+                    package_meta = load_package_meta(tar.extractfile(member).read())
+                    post_member = pending_members.get(package_meta['post'])
+                    if post_member is None:
+                        continue
+                    post_file = StringIO(
+                        post_member.read().decode(package_meta['encoding']))
+                elif package_meta is None:
+                    pending_members[member.name] = budget.spool(tar.extractfile(member))
+                    continue
+                elif member.name == package_meta['post']:
+                    # tarfile stream members are not seekable, which
+                    # TextIOWrapper requires
+                    post_file = codecs.getreader(package_meta['encoding'])(
+                        tar.extractfile(member))
+                else:
+                    continue
+
+                return normalize_post_meta(read_meta_header(post_file))
+    finally:
+        for pending_member in pending_members.values():
+            budget.release(pending_member)
+
+    if package_meta is None:
+        raise PackageException(
+            "The package does not contains a package.yml file")
+    raise PackageException(
+        "The package does not contains the {} post file".format(
+            package_meta['post']))
 
 
 def get_resources(root_path, res_list):
@@ -362,7 +874,75 @@ def get_resources(root_path, res_list):
     return resources
 
 
-def build_package(post_path, package_path, encoding='utf-8'):
+def package_tar_kwargs(codec, level):
+    """Gives the ``tarfile.open`` arguments needed to write a package.
+
+    Args:
+        codec (str): one of the :data:`CODECS` keys
+        level (int): compression level. None for the codec default.
+
+    Raises:
+        ValueError: if the codec is unknown
+
+    Returns:
+        dict:
+    """
+    if codec not in CODECS:
+        raise ValueError("Unknown compression codec {}".format(codec))
+
+    if codec == 'none':
+        return dict(mode='w:')
+
+    tar_kwargs = dict(mode='w:' + codec)
+    if level is not None:
+        tar_kwargs['preset' if codec == 'xz' else 'compresslevel'] = level
+    return tar_kwargs
+
+
+def read_post(post_path, encoding='utf-8'):
+    """Reads a markdown post and its resources from the filesystem.
+
+    Args:
+        post_path (pathlib.Path): path to the markdown post
+        encoding (str): encoding of the markdown post file
+
+    Raises:
+        pblog.package.PackageValidationError: if the post metadata are not
+            valid
+        pblog.package.ResourcesNotFound: if some resources referenced by
+            the post do not exist
+
+    Returns:
+        pblog.package.Package: the post information. Its resources are
+            instances of :class:`FileResourceHandler`.
+    """
+    with post_path.open(encoding=encoding) as post_file:
+        markdown_content = post_file.read()
+    with parser_pool.parser() as parser:
+        parser.convert(markdown_content)
+        post_meta = normalize_post_meta(parser.meta)
+        summary = parser.summary
+        resource_paths = parser.resource_path
+
+    resources = get_resources(post_path.parent, resource_paths)
+
+    return Package(
+        post_title=post_meta['title'],
+        topic_name=post_meta['topic'],
+        markdown_content=markdown_content,
+        summary=summary,
+        post_encoding=encoding,
+        post_id=post_meta['id'],
+        post_slug=post_meta['slug'],
+        published_date=post_meta['published_date'],
+        resources=[
+            FileResourceHandler(abs_res_path, res_path)
+            for abs_res_path, res_path in resources],
+    )
+
+
+def build_package(post_path, package_path, encoding='utf-8', cache=None,
+                  codec=DEFAULT_CODEC, level=None):
     """Build a package for a post.
 
     Args:
@@ -370,20 +950,32 @@ def build_package(post_path, package_path, encoding='utf-8'):
         package_path (pathlib.Path or file object): path to the package to
             create, or file-like object to write the package into.
         encoding (str): encoding of the markdown post file
+        cache (pblog.cache.BuildCache): if given and ``package_path`` is
+            a path, a package built from the same post, resources,
+            encoding and compression will be reused instead of being built
+            again.
+        codec (str): compression codec of the package, one of the
+            :data:`CODECS` keys
+        level (int): compression level, None for the codec default. Not
+            used if codec is ``'none'``.
+
+    Raises:
+        ValueError: if the codec is unknown
 
     Returns:
         package.Package: Information about the generated package
     """
-    with post_path.open(encoding=encoding) as post_file:
-        markdown_content = post_file.read()
-    markdown_parser.convert(markdown_content)
+    tar_kwargs = package_tar_kwargs(codec, level)
 
-    post_meta = normalize_post_meta(markdown_parser.meta)
+    use_cache = cache is not None and isinstance(package_path, pathlib.Path)
+    if use_cache:
+        package = cache.get(post_path, package_path, encoding, codec, level)
+        if package is not None:
+            return package
+
+    package = read_post(post_path, encoding)
     package_meta = yaml.dump(dict(post=post_path.name, encoding=encoding)).encode()
-    resources = get_resources(post_path.parent, markdown_parser.resource_path)
-    package_resources = []
 
-    tar_kwargs = dict(mode='w:gz')
     if isinstance(package_path, pathlib.Path):
         tar_kwargs['name'] = str(package_path)
     else:
@@ -400,23 +992,137 @@ def build_package(post_path, package_path, encoding='utf-8'):
         tar.add(str(post_path), arcname=post_path.name)
 
         # write resources
-        for abs_res_path, res_path in resources:
-            tar.add(str(abs_res_path), str('resources' / res_path))
-            with abs_res_path.open('rb') as res_file:
-                package_resources.append(
-                    ResourceHandler(res_file.read(), res_path))
+        for resource in package.resources:
+            tar.add(str(resource.file_path), str('resources' / resource.path))
 
-    return Package(
-        post_title=post_meta['title'],
-        topic_name=post_meta['topic'],
-        markdown_content=markdown_content,
-        summary=markdown_parser.summary,
-        post_encoding=encoding,
-        post_id=post_meta['id'],
-        post_slug=post_meta['slug'],
-        published_date=post_meta['published_date'],
-        resources=package_resources,
-    )
+    if use_cache:
+        cache.put(post_path, package_path, package, codec, level)
+
+    return package
+
+
+class BuildResult:
+    """Outcome of the build of a single post package.
+
+    Attributes:
+        post_path (pathlib.Path): path to the markdown post
+        package_path (pathlib.Path): path to the package
+        package (pblog.package.Package): information about the generated
+            package, None if the build failed
+        error (Exception): the error that prevented the package to be
+            built, None on success. Either a
+            :class:`pblog.package.PackageException`, a
+            :class:`UnicodeDecodeError` or an :class:`OSError`.
+        size (int): size in bytes of the generated package
+    """
+    def __init__(self, post_path, package_path, package=None, error=None, size=0):
+        self.post_path = post_path
+        self.package_path = package_path
+        self.package = package
+        self.error = error
+        self.size = size
+
+    @property
+    def succeeded(self):
+        return self.error is None
+
+
+class BuildReport:
+    """Results of a batch package build.
+
+    Attributes:
+        results (list of pblog.package.BuildResult): one result for each
+            built post, in the order the posts were given
+        elapsed (float): duration of the build in seconds
+    """
+    def __init__(self, results, elapsed):
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self):
+        """list of pblog.package.BuildResult: successful builds"""
+        return [r for r in self.results if r.succeeded]
+
+    @property
+    def failed(self):
+        """list of pblog.package.BuildResult: failed builds"""
+        return [r for r in self.results if not r.succeeded]
+
+    @property
+    def total_size(self):
+        """int: size in bytes of all generated packages"""
+        return sum(r.size for r in self.results)
+
+    @property
+    def posts_per_second(self):
+        if not self.elapsed:
+            return 0.
+        return len(self.results) / self.elapsed
+
+    @property
+    def bytes_per_second(self):
+        if not self.elapsed:
+            return 0.
+        return self.total_size / self.elapsed
+
+
+def _build_package_task(args):
+    post_path, package_path, build_kwargs = args
+    try:
+        package = build_package(post_path, package_path, **build_kwargs)
+        size = package_path.stat().st_size
+    except (PackageException, UnicodeDecodeError, OSError) as e:
+        return BuildResult(post_path, package_path, error=e)
+
+    return BuildResult(post_path, package_path, package=package, size=size)
+
+
+def build_packages(post_paths, out_dir, workers=None, encoding='utf-8', cache=None,
+                   codec=DEFAULT_CODEC, level=None):
+    """Build packages for several posts in parallel.
+
+    Each post is packaged in ``out_dir`` as ``<post stem>.tar.gz`` (or the
+    extension matching the compression codec).
+    A post that fails to build does not stop the others: its error is
+    stored in its result.
+
+    Args:
+        post_paths (iterable of pathlib.Path): paths to the markdown posts
+        out_dir (pathlib.Path): directory where packages are written
+        workers (int): number of worker processes. Defaults to the number
+            of CPUs of the machine.
+        encoding (str): encoding of the markdown post files
+        cache (pblog.cache.BuildCache): cache of previously built packages
+        codec (str): compression codec of the packages
+        level (int): compression level, None for the codec default
+
+    Raises:
+        ValueError: if several posts would be packaged in the same file, or
+            if the codec is unknown
+
+    Returns:
+        pblog.package.BuildReport: the build results
+    """
+    # fail early on unknown codecs
+    package_tar_kwargs(codec, level)
+    build_kwargs = dict(encoding=encoding, cache=cache, codec=codec, level=level)
+
+    tasks = []
+    package_paths = set()
+    for post_path in post_paths:
+        package_path = out_dir / (post_path.stem + CODECS[codec])
+        if package_path in package_paths:
+            raise ValueError(
+                "Several posts would be packaged in {}".format(package_path))
+        package_paths.add(package_path)
+        tasks.append((post_path, package_path, build_kwargs))
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_build_package_task, tasks))
+
+    return BuildReport(results, time.perf_counter() - start)
 
 
 class Package:
@@ -448,7 +1154,21 @@ class Package:
         self.resources = resources
         self._html_content = None
 
-    def build_html_content(self, parser, resource_path):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Releases the contents of the package resources.
+
+        Packages are context managers closing themselves on exit.
+        """
+        for resource in self.resources:
+            resource.close()
+
+    def build_html_content(self, parser, resource_path, versioned=False):
         """Build internal HTML content from markdown content
 
         Args:
@@ -457,12 +1177,28 @@ class Package:
             resource_path (pathlib.Path): Path to the root resource path.
                 This is used to convert resources links within the generated
                 HTML post
+            versioned (bool): if True, the version of resources is appended
+                to their URLs, so that they can be cached forever.
         """
         if self.post_slug is None:
             raise ValueError('Post slug is None')
         parser.treeprocessors['resource_path'].root_path = urljoin(
             resource_path, self.post_slug) + '/'
-        self._html_content = parser.convert(self.markdown_content)
+        if not versioned:
+            self._html_content = parser.convert(self.markdown_content)
+            return
+
+        if 'resource_version' not in parser.treeprocessors:
+            # right after the resource_path processor, of priority 0
+            parser.treeprocessors.register(
+                ResourceVersionTreeprocessor(parser), 'resource_version', -1)
+        processor = parser.treeprocessors['resource_version']
+        processor.versions = {
+            resource.path: resource.version() for resource in self.resources}
+        try:
+            self._html_content = parser.convert(self.markdown_content)
+        finally:
+            processor.versions = None
 
     @property
     def html_content(self):
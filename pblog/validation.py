@@ -0,0 +1,121 @@
+"""Shared validation schemas.
+
+Building a ``cerberus.Validator`` compiles its schema, which is costly
+compared to validating a small document. Schemas defined here are compiled
+once per thread and reused for every validation.
+
+    >>> post_meta_schema.validate({'title': 'A title'})
+    (None, {'topic': ['required field']})
+"""
+
+import datetime
+import threading
+
+import cerberus
+
+
+__all__ = [
+    'Schema',
+    'package_meta_schema',
+    'post_meta_schema',
+    'post_response_schema',
+]
+
+
+class Schema:
+    """A validation schema compiled once and shared between callers.
+
+    A cerberus validator keeps the state of its last validation, so each
+    thread gets its own validator.
+    """
+    def __init__(self, schema):
+        """
+        Args:
+            schema (dict): a cerberus schema definition
+        """
+        self.schema = schema
+        self._local = threading.local()
+
+    @property
+    def validator(self):
+        """cerberus.Validator: the validator of the current thread"""
+        validator = getattr(self._local, 'validator', None)
+        if validator is None:
+            validator = self._local.validator = cerberus.Validator(self.schema)
+        return validator
+
+    def validate(self, document):
+        """Validates and normalizes a document in a single pass.
+
+        Args:
+            document (dict): the document to validate
+
+        Returns:
+            tuple: a ``(normalized document, None)`` tuple if the document
+                is valid, ``(None, errors)`` otherwise, where ``errors``
+                maps field names to a list of errors.
+        """
+        validator = self.validator
+        if not validator.validate(document):
+            return None, validator.errors
+        return validator.document, None
+
+
+# package.yml content
+package_meta_schema = Schema({
+    'post': {
+        'type': 'string',
+        'required': True,
+    },
+    'encoding': {
+        'type': 'string',
+        'required': True,
+    },
+})
+
+# post markdown metadata
+post_meta_schema = Schema({
+    'id': {
+        'type': 'dict',
+        'required': False,
+        # a default setter is used to prevent the default value from
+        # being shared between documents
+        'default_setter': lambda document: {},
+        'keyschema': {'type': 'string'},
+        'valueschema': {'type': 'integer', 'default': None, 'nullable': True},
+    },
+    'title': {
+        'type': 'string',
+        'required': True,
+    },
+    'slug': {
+        'type': 'string',
+        'nullable': True,
+        'required': False,
+        'default': None,
+        'regex': '^[A-Za-z0-9_-]+$',
+    },
+    'topic': {
+        'type': 'string',
+        'required': True,
+    },
+    'published_date': {
+        'type': 'date',
+        'nullable': True,
+        'default': None,
+    },
+})
+
+# post returned by the API
+post_response_schema = Schema({
+    'id': {'type': 'integer'},
+    'title': {'type': 'string'},
+    'slug': {'type': 'string'},
+    'topic': {'type': 'dict', 'schema': {
+        'id': {'type': 'integer'},
+        'name': {'type': 'string'},
+    }},
+    'published_date': {
+        'type': 'date',
+        'coerce': lambda s: datetime.datetime.strptime(s, '%Y-%m-%d').date()},
+})
@@ -1,17 +1,27 @@
+from contextlib import contextmanager
 from datetime import date
 from io import BytesIO
+import sys
 import tarfile
 
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from markdown import Markdown
 import pytest
+from slugify import slugify
+from sqlalchemy import event
 
+from pblog.package import Package
 from flask_pblog.models import Base, Post, Topic
+from flask_pblog.search import SQLiteSearchIndex
 from flask_pblog.storage import Storage
 from flask_pblog import PBlog
 
 
+# async and await need Python 3.5
+collect_ignore = ['test_asyncstorage.py'] if sys.version_info < (3, 5) else []
+
+
 @pytest.fixture(scope='function')
 def app():
     app = Flask(__name__)
@@ -41,6 +51,59 @@ def storage(app):
     return app.extensions['pblog'].storage
 
 
+@pytest.fixture(scope='function')
+def search_index(storage):
+    """This fixture gives the storage a SQLite search index."""
+    search_index = SQLiteSearchIndex()
+    search_index.create(storage.session.get_bind())
+    storage.search_index = search_index
+    return search_index
+
+
+@pytest.fixture(scope='function')
+def count_queries(storage):
+    """This fixture provides a context manager recording the SQL statements
+    executed within it.
+    """
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        engine = storage.session.get_bind()
+        event.listen(engine, 'before_cursor_execute', record)
+
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    return counter
+
+
+@pytest.fixture(scope='function')
+def create_posts(storage):
+    """This fixture provides a function creating a given number of posts,
+    each one in its own topic.
+    """
+    def create(count):
+        start = storage.session.query(Post).count()
+        for index in range(start, start + count):
+            storage.session.add(Post(
+                title='Post %d' % index,
+                slug='post-%d' % index,
+                summary='',
+                published_date=date(2010, 1, 1),
+                topic=Topic(name='Topic %d' % index, slug='topic-%d' % index),
+                md_content='markdown', html_content='<p>markdown</p>'))
+        storage.commit_posts()
+        # make sure nothing is served from the session identity map
+        storage.session.expunge_all()
+
+    return create
+
+
 @pytest.fixture(scope='function')
 def post(storage):
     post = Post(
@@ -56,6 +119,26 @@ def post(storage):
     return post
 
 
+@pytest.fixture(scope='function')
+def build_post_package():
+    """This fixture provides a function building a post package whose HTML
+    content is already built. Its slug and contents are derived from its
+    title, and other package values can be given as keyword arguments.
+    """
+    def build(title='Title', **values):
+        values.setdefault('post_slug', slugify(title))
+        values.setdefault('summary', 'summary')
+        values.setdefault('published_date', date(2017, 3, 12))
+        values.setdefault('topic_name', 'Topic')
+        values.setdefault('markdown_content', 'markdown of %s' % title)
+        html_content = values.pop('html_content', '<p>html of %s</p>' % title)
+        post_package = Package(post_title=title, **values)
+        post_package._html_content = html_content
+        return post_package
+
+    return build
+
+
 @pytest.fixture(scope='function')
 def post_package():
     """This fixture provides a packaged post
@@ -0,0 +1,72 @@
+import asyncio
+import pathlib
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from pblog.package import ResourceHandler
+from flask_pblog import models
+from flask_pblog.asyncstorage import AsyncStorage
+from flask_pblog.storage import Storage
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_async_storage(temp_dir, build_post_package):
+    engine = create_engine('sqlite:///%s' % (temp_dir / 'db.sqlite'))
+    models.Base.metadata.create_all(engine)
+    storage = AsyncStorage(Storage(scoped_session(sessionmaker(bind=engine))))
+    post_package = build_post_package()
+    post_package.resources = [ResourceHandler(b'content', pathlib.Path('res.txt'))]
+    (temp_dir / 'resources').mkdir()
+
+    async def publish_and_read():
+        post = await storage.create_post(post_package)
+        await storage.save_resources(temp_dir / 'resources', post_package)
+        post_package.post_title = 'New title'
+        await storage.update_post(post, post_package)
+        return await asyncio.gather(
+            storage.get_post(post.id), storage.get_all_posts(),
+            storage.get_topics_summary())
+
+    fetched, posts, topics = run(publish_and_read())
+
+    # returned posts are detached and usable outside of storage threads
+    assert fetched.title == 'New title'
+    assert fetched.topic.name == 'Topic'
+    assert fetched.html_content == '<p>html of Title</p>'
+    assert [(p.title, p.topic.name) for p in posts] == [('New title', 'Topic')]
+    assert [t.name for t in topics] == ['Topic']
+    assert (temp_dir / 'resources/title/res.txt').read_bytes() == b'content'
+    assert storage.executor._max_workers > 1
+    storage.shutdown()
+    engine.dispose()
+
+
+def test_async_storage_with_plain_sessions(temp_dir, build_post_package):
+    sessions = []
+    for name in ('primary', 'replica'):
+        engine = create_engine('sqlite:///%s' % (temp_dir / (name + '.sqlite')))
+        models.Base.metadata.create_all(engine)
+        sessions.append(sessionmaker(bind=engine)())
+    primary, replica = sessions
+    storage = AsyncStorage(Storage(primary, read_session=replica))
+
+    async def publish_and_read():
+        await storage.create_post(build_post_package('Written'))
+        return await storage.get_all_posts()
+
+    # plain sessions are used by a single thread
+    assert storage.executor._max_workers == 1
+    # reads following the write are back on the replica, which is never
+    # replicated to
+    assert run(publish_and_read()) == []
+    storage.shutdown()
+    for session in sessions:
+        session.get_bind().dispose()
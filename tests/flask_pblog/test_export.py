@@ -0,0 +1,168 @@
+import json
+import os
+import pathlib
+import sys
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+from flask_pblog import PBlog
+from flask_pblog.export import export_site, url_to_path, MANIFEST_NAME
+from flask_pblog.models import Base
+from flask_pblog.storage import Storage
+
+
+def create_app(directory):
+    """Builds a blog application using a database file, which can be shared
+    with export worker processes.
+    """
+    app = Flask(__name__, static_folder=str(directory / 'static'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///%s' % (directory / 'db.sqlite')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['PBLOG_RESOURCES_PATH'] = str(directory / 'resources')
+    db = SQLAlchemy(app)
+    PBlog(app, storage=Storage(db.session))
+    return app
+
+
+# application imported by export worker processes
+pool_app = None
+if 'PBLOG_EXPORT_TEST_DIR' in os.environ:
+    pool_app = create_app(pathlib.Path(os.environ['PBLOG_EXPORT_TEST_DIR']))
+
+
+def read_file(path, mode='r'):
+    with path.open(mode) as f:
+        return f.read()
+
+
+def write_file(path, content, mode='w'):
+    with path.open(mode) as f:
+        f.write(content)
+
+
+def test_url_to_path():
+    assert str(url_to_path('/')) == 'index.html'
+    assert str(url_to_path('/post/1/slug')) == 'post/1/slug/index.html'
+    assert str(url_to_path('/post/1/slug.md')) == 'post/1/slug.md'
+
+
+def test_exports_pages(app, storage, temp_dir, build_post_package):
+    app.extensions['pblog'].posts_per_page = 1
+    storage.create_post(build_post_package('First'))
+    storage.create_post(build_post_package('Second'))
+    resource_dir = temp_dir / 'resources' / 'first'
+    resource_dir.mkdir(parents=True)
+    write_file(resource_dir / 'image.png', b'image', 'wb')
+    app.extensions['pblog'].post_resource_path = temp_dir / 'resources'
+    output = temp_dir / 'output'
+
+    report = export_site(app, output)
+
+    assert report.succeeded
+    assert report.skipped == 0
+    assert len(report.rendered) == 6
+    index = read_file(output / 'index.html')
+    # list pages are not paginated
+    assert 'First' in index and 'Second' in index
+    assert 'html of First' in read_file(output / 'post/1/first/index.html')
+    assert read_file(output / 'post/1/first.md') == 'markdown of First'
+    assert (output / 'topic/1/topic/index.html').is_file()
+    assert read_file(output / 'resources/first/image.png', 'rb') == b'image'
+    assert '/post/1/first' in json.loads(read_file(output / MANIFEST_NAME))['pages']
+    assert app.extensions['pblog'].posts_per_page == 1
+
+
+def test_exports_changed_pages_only(app, storage, temp_dir, build_post_package):
+    post = storage.create_post(build_post_package('First'))
+    storage.create_post(build_post_package('Second'))
+    output = temp_dir / 'output'
+    export_site(app, output)
+
+    assert export_site(app, output).rendered == []
+
+    post_package = build_post_package('First')
+    post_package.markdown_content = 'new markdown'
+    # exporting ended the session the post was loaded with
+    storage.update_post(storage.get_post(post.id, primary=True), post_package)
+    report = export_site(app, output)
+
+    assert sorted(report.rendered) == [
+        '/', '/post/1/first', '/post/1/first.md', '/topic/1/topic']
+    assert read_file(output / 'post/1/first.md') == 'new markdown'
+
+    assert len(export_site(app, output, full=True).rendered) == 6
+
+
+def test_new_topic_renders_all_pages(app, storage, temp_dir, build_post_package):
+    storage.create_post(build_post_package('First'))
+    output = temp_dir / 'output'
+    export_site(app, output)
+
+    storage.create_post(build_post_package('Second', topic_name='Other topic'))
+    report = export_site(app, output)
+
+    # the topics sidebar changed on every page
+    assert report.skipped == 0
+
+
+def test_removes_gone_pages(app, storage, temp_dir, build_post_package):
+    post = storage.create_post(build_post_package('First'))
+    output = temp_dir / 'output'
+    export_site(app, output)
+
+    post_package = build_post_package('First')
+    post_package.post_slug = 'renamed'
+    storage.update_post(storage.get_post(post.id, primary=True), post_package)
+    export_site(app, output)
+
+    assert not (output / 'post/1/first.md').exists()
+    assert (output / 'post/1/renamed.md').is_file()
+
+
+def test_exports_with_worker_processes(temp_dir, monkeypatch, build_post_package):
+    monkeypatch.setenv('PBLOG_EXPORT_TEST_DIR', str(temp_dir))
+    app = create_app(temp_dir)
+    monkeypatch.setattr(sys.modules[__name__], 'pool_app', app)
+    storage = app.extensions['pblog'].storage
+    with app.app_context():
+        Base.metadata.create_all(storage.session.get_bind())
+        for title in ('First', 'Second', 'Third'):
+            storage.create_post(build_post_package(title))
+        engine = storage.session.get_bind()
+    output = temp_dir / 'output'
+    disposed = []
+    event.listen(engine, 'engine_disposed', disposed.append)
+
+    report = export_site(
+        app, output, app_module=__name__ + '.pool_app', workers=2, chunk_size=2)
+
+    # connections are not inherited by the workers
+    assert disposed == [engine]
+    assert report.succeeded
+    assert len(report.rendered) == 8
+    assert 'html of Third' in read_file(output / 'post/3/third/index.html')
+    assert 'Second' in read_file(output / 'topic/1/topic/index.html')
+
+
+def test_copies_modified_static_files_only(temp_dir):
+    app = create_app(temp_dir)
+    (temp_dir / 'static').mkdir()
+    style = temp_dir / 'static/style.css'
+    write_file(style, 'body {}')
+    output = temp_dir / 'output'
+    with app.app_context():
+        Base.metadata.create_all(app.extensions['pblog'].storage.session.get_bind())
+    export_site(app, output)
+    assert read_file(output / 'static/style.css') == 'body {}'
+
+    # a copy which is not modified is left as is
+    write_file(output / 'static/style.css', 'changed')
+    export_site(app, output)
+    assert read_file(output / 'static/style.css') == 'changed'
+
+    write_file(style, 'body { color: red; }')
+    os.utime(str(style), (0, 0))
+    export_site(app, output)
+    assert read_file(output / 'static/style.css') == 'body { color: red; }'
@@ -0,0 +1,87 @@
+from datetime import date
+
+import pytest
+from sqlalchemy.orm.exc import NoResultFound
+
+from flask_pblog import models
+from flask_pblog.readmodel import ReadModel
+
+
+def test_matches_storage(storage, build_post_package):
+    for index in range(6):
+        storage.create_post(build_post_package(
+            'Post %d' % index, published_date=date(2017, 3, 1 + index // 2),
+            topic_name='Topic' if index % 3 else 'Other'))
+    read_model = ReadModel(storage)
+
+    def ids(posts):
+        return [post.id for post in posts]
+
+    topic = storage.session.query(models.Topic).filter_by(name='Topic').one()
+    first_page = read_model.get_posts_page(4)
+    last = first_page[-1]
+    assert ids(first_page) == ids(storage.get_posts_page(4))
+    assert ids(read_model.get_posts_page(4, before=(last.published_date, last.id))) \
+        == ids(storage.get_posts_page(4, before=(last.published_date, last.id)))
+    assert ids(read_model.get_posts_page(10, topic_id=topic.id)) \
+        == ids(storage.get_posts_page(10, topic_id=topic.id))
+    assert read_model.get_topics_summary() == storage.get_topics_summary()
+    assert read_model.get_topic(topic.id) == (topic.id, topic.name, topic.slug)
+    assert read_model.get_post(last.id).title == last.title
+    assert sorted(ids(read_model.get_posts_in_topic(topic.id))) \
+        == sorted(ids(storage.get_posts_in_topic(topic.id)))
+
+
+def test_reads_without_queries(storage, create_posts, count_queries):
+    create_posts(3)
+    read_model = ReadModel(storage, check_interval=3600)
+    read_model.load()
+
+    with count_queries() as queries:
+        read_model.get_posts_page(20)
+        read_model.get_topics_summary()
+        read_model.get_post(1)
+
+    assert queries == []
+
+
+def test_missing_records(storage, create_posts):
+    create_posts(1)
+    read_model = ReadModel(storage)
+
+    with pytest.raises(NoResultFound):
+        read_model.get_post(42)
+    with pytest.raises(NoResultFound):
+        read_model.get_post('foo')
+    with pytest.raises(NoResultFound):
+        read_model.get_topic(42)
+
+
+def test_updates_written_posts(storage, count_queries, build_post_package):
+    read_model = ReadModel(storage, check_interval=3600)
+    post = storage.create_post(build_post_package('Post 0'))
+    read_model.load()
+
+    storage.create_post(build_post_package('Post 1'))
+    post_package = build_post_package('New title', topic_name='New topic')
+    storage.update_post(post, post_package)
+
+    with count_queries() as queries:
+        posts = read_model.get_posts_page(20)
+    assert queries == []
+    assert [(p.title, p.topic.name) for p in posts] == [
+        ('Post 1', 'Topic'), ('New title', 'New topic')]
+    assert [t.name for t in read_model.get_topics_summary()] == ['New topic', 'Topic']
+
+
+def test_reloads_on_external_write(storage, create_posts):
+    read_model = ReadModel(storage, check_interval=0)
+    create_posts(1)
+    assert len(read_model.get_all_posts()) == 1
+
+    # create_posts writes posts the way another process would, without
+    # notifying the read model
+    storage.write_listeners.remove(read_model.posts_written)
+    create_posts(1)
+
+    assert len(read_model.get_all_posts()) == 2
@@ -3,7 +3,7 @@ from unittest.mock import patch, Mock
 
 import itsdangerous
 
-from flask_pblog import resources
+from flask_pblog import models, resources
 
 
 @patch('flask_pblog.resources.reqparse.RequestParser')
@@ -67,6 +67,22 @@ class TestPostListResource:
         json_response = json.loads(response.data.decode())
         assert storage.get_post(json_response['id']).title == 'A title'
 
+    @patch('flask_pblog.security.validate_token')
+    def test_stores_precompressed_variants(
+            self, validate_token, app, client, storage, post_package):
+        app.extensions['pblog'].precompressed_encodings = ['gzip']
+
+        response = client.post(
+            '/api/posts',
+            headers={'X-Pblog-Token': 'ham'},
+            data={
+                'post': (post_package, 'post.tar.gz'),
+            })
+
+        post_id = json.loads(response.data.decode())['id']
+        assert storage.session.query(models.PostVariant) \
+            .filter_by(post_id=post_id, encoding='gzip').count() == 2
+
 
 class TestPostResource:
     @patch('flask_pblog.security.validate_token')
@@ -82,3 +98,54 @@ class TestPostResource:
         json_response = json.loads(response.data.decode())
         assert json_response['id'] == post.id
         assert storage.get_post(post.id).title == 'A title'
+
+
+class TestSearchResource:
+    def test_searches_posts(self, app, client, storage, search_index, create_posts):
+        app.extensions['pblog'].posts_per_page = 2
+        create_posts(3)
+        storage.reindex_posts()
+
+        response = client.get('/api/search?q=post')
+
+        assert response.status_code == 200
+        json_response = json.loads(response.data.decode())
+        assert [p['title'] for p in json_response['posts']] == ['Post 0', 'Post 1']
+        assert json_response['next_page'] == 2
+
+    def test_invalid_page(self, client, search_index):
+        assert client.get('/api/search?q=post&page=0').status_code == 400
+
+
+class TestPostRevisionResources:
+    @patch('flask_pblog.security.validate_token')
+    def test_lists_and_fetches_revisions(
+            self, validate_token, client, storage, post, post_package):
+        client.post(
+            '/api/posts/%d' % post.id,
+            headers={'X-Pblog-Token': 'ham'},
+            data={'post': (post_package, 'post.md')})
+
+        response = client.get(
+            '/api/posts/%d/revisions' % post.id, headers={'X-Pblog-Token': 'ham'})
+        assert response.status_code == 200
+        revisions = json.loads(response.data.decode())
+        assert [(r['number'], r['title']) for r in revisions] == [(1, 'A post')]
+
+        response = client.get(
+            '/api/posts/%d/revisions/1' % post.id, headers={'X-Pblog-Token': 'ham'})
+        assert response.status_code == 200
+        assert json.loads(response.data.decode())['md_content'] == 'markdown'
+
+    @patch('flask_pblog.security.validate_token')
+    def test_missing_revision(self, validate_token, client, post):
+        response = client.get(
+            '/api/posts/%d/revisions/1' % post.id, headers={'X-Pblog-Token': 'ham'})
+
+        assert response.status_code == 404
+
+    @patch('flask_pblog.security.validate_token')
+    def test_missing_post(self, validate_token, client):
+        response = client.get('/api/posts/42/revisions', headers={'X-Pblog-Token': 'ham'})
+
+        assert response.status_code == 404
@@ -0,0 +1,26 @@
+import pytest
+
+from flask_pblog.revisions import apply_delta, compress, decompress, make_delta
+
+
+@pytest.mark.parametrize('base, content', [
+    ('', ''),
+    ('a\nb\nc\n', 'a\nb\nc\n'),
+    ('a\nb\nc\n', 'a\nx\nc'),
+    ('a\nb\nc\n', ''),
+    ('', 'new\ncontent\n'),
+    ('line\n' * 100, 'line\n' * 50 + 'changed\n' + 'line\n' * 49),
+])
+def test_delta_rebuilds_content(base, content):
+    assert apply_delta(base, make_delta(base, content)) == content
+
+
+def test_delta_of_similar_contents_is_small():
+    base = ''.join('paragraph %d\n' % index for index in range(1000))
+    content = base.replace('paragraph 500\n', 'changed paragraph\n')
+
+    assert len(make_delta(base, content)) < len(compress(content)) / 10
+
+
+def test_compress():
+    assert decompress(compress('content')) == 'content'
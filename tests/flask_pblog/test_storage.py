@@ -1,20 +1,125 @@
 from datetime import date
+import threading
 
 import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
 from sqlalchemy.orm.exc import NoResultFound
 
 from pblog.package import Package
 from flask_pblog import models
+from flask_pblog.revisions import SNAPSHOT_INTERVAL
+from flask_pblog.search import SearchIndex
+from flask_pblog.storage import POSTS_STAMP, Storage
 
 
 def test_create_topic_if_not_existing(storage):
     topic = storage.get_or_create_topic("Topic")
 
-    assert topic.id is None
+    assert topic.id is not None
     assert topic.name == 'Topic'
     assert topic.slug == 'topic'
 
 
+def test_resolve_topics_is_cached(storage, count_queries):
+    storage.resolve_topics(['A', 'B'])
+    storage.commit_posts()
+
+    with count_queries() as queries:
+        topic_ids = storage.resolve_topics(['A', 'B'])
+
+    assert set(topic_ids) == {'A', 'B'}
+    assert queries == []
+
+
+def test_rolled_back_topic_ids_are_not_cached(storage, build_post_package):
+    storage.resolve_topic_id('New')
+    storage.session.rollback()
+
+    post = storage.create_post(build_post_package(topic_name='New'))
+
+    topic = storage.session.query(models.Topic).filter_by(name='New').one()
+    assert post.topic_id == topic.id
+    assert post.topic is topic
+    assert storage.resolve_topic_id('New') == topic.id
+
+
+def test_shared_storage_concurrent_publish(temp_dir, build_post_package):
+    engine = create_engine(
+        'sqlite:///%s' % (temp_dir / 'db.sqlite'),
+        connect_args={'timeout': 30})
+    models.Base.metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    storage = Storage(session)
+    workers = 8
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def publish(i):
+        post_package = build_post_package('Post %d' % i, topic_name='Topic %d' % (i % 2))
+        barrier.wait()
+        try:
+            # half of the workers resolve a topic they never commit
+            if i % 2:
+                storage.resolve_topic_id('Rolled back %d' % i)
+                session.rollback()
+            storage.create_post(post_package)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            session.remove()
+
+    threads = [threading.Thread(target=publish, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    topics = dict(session.query(models.Topic.name, models.Topic.id))
+    assert set(topics) == {'Topic 0', 'Topic 1'}
+    assert storage._topic_ids == topics
+    for post in session.query(models.Post):
+        assert post.topic is not None
+    session.remove()
+    engine.dispose()
+
+
+def test_concurrent_publish_same_topic(temp_dir, build_post_package):
+    engine = create_engine(
+        'sqlite:///%s' % (temp_dir / 'db.sqlite'),
+        connect_args={'timeout': 30})
+    models.Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    workers = 8
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def publish(i):
+        storage = Storage(Session())
+        post_package = build_post_package('Post %d' % i, topic_name='Shared topic')
+        barrier.wait()
+        try:
+            storage.create_post(post_package)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            storage.session.close()
+
+    threads = [threading.Thread(target=publish, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    session = Session()
+    assert errors == []
+    assert session.query(models.Topic).count() == 1
+    assert session.query(models.Post).count() == workers
+    session.close()
+    engine.dispose()
+
+
 def test_create_post(storage):
     post_definition = Package(
         post_title='Title', post_slug='slug', summary='summary',
@@ -33,6 +138,27 @@ def test_create_post(storage):
     assert post.html_content == 'html'
 
 
+def test_create_post_writes_before_commit_in_transaction(storage, build_post_package):
+    post_definition = build_post_package()
+
+    def store_variants(post):
+        storage.set_post_variants(post.id, 'page', 'key', {'gzip': b'data'})
+        raise RuntimeError()
+
+    with pytest.raises(RuntimeError):
+        storage.create_post(post_definition, before_commit=store_variants)
+    storage.session.rollback()
+    assert storage.session.query(models.Post).count() == 0
+    assert storage.session.query(models.PostVariant).count() == 0
+
+    post = storage.create_post(
+        post_definition, before_commit=lambda post: storage.set_post_variants(
+            post.id, 'page', 'key', {'gzip': b'data'}))
+    storage.session.rollback()
+
+    assert storage.get_post_variant(post.id, 'page', 'key', ['gzip']).data == b'data'
+
+
 def test_update_post(storage):
     post_definition = Package(
         post_id=2, post_title='Title', post_slug='slug', summary='summary',
@@ -123,3 +249,309 @@ def test_topic_without_posts(storage):
 
 def test_get_topic(storage, post):
     assert storage.get_topic(post.topic.id) == post.topic
+
+
+def test_listing_loads_topics_without_contents(storage, create_posts, count_queries):
+    create_posts(3)
+
+    with count_queries() as queries:
+        posts = storage.get_all_posts()
+        topics = [post.topic.name for post in posts]
+
+    assert len(queries) == 1
+    assert 'md_content' not in queries[0]
+    assert 'html_content' not in queries[0]
+    assert sorted(topics) == ['Topic 0', 'Topic 1', 'Topic 2']
+
+
+def test_get_posts_page(storage):
+    topic = models.Topic(name='Topic', slug='topic')
+    other_topic = models.Topic(name='Other topic', slug='ot')
+    posts = [
+        models.Post(
+            title='Post %d' % index, slug='post-%d' % index, summary='',
+            md_content='m', html_content='h',
+            published_date=date(2017, 3, 1 + index // 2),
+            topic=topic if index % 3 else other_topic)
+        for index in range(6)]
+    storage.session.add_all(posts)
+    storage.session.commit()
+    ordered = sorted(posts, key=lambda p: (p.published_date, p.id), reverse=True)
+
+    first_page = storage.get_posts_page(4)
+    assert first_page == ordered[:4]
+    last = first_page[-1]
+    assert storage.get_posts_page(4, before=(last.published_date, last.id)) == ordered[4:]
+    assert storage.get_posts_page(10, topic_id=topic.id) == [
+        p for p in ordered if p.topic is topic]
+
+
+def test_get_topics_summary(storage, create_posts):
+    create_posts(2)
+    topic = storage.session.query(models.Topic).filter_by(name='Topic 0').one()
+    storage.session.add(models.Post(
+        title='Title', slug='slug', topic=topic, summary='', md_content='m',
+        html_content='h', published_date=date(2017, 3, 13)))
+    storage.session.add(models.Topic(name='No post', slug='no-post'))
+    storage.commit_posts()
+
+    assert storage.get_topics_summary() == [
+        (topic.id, 'Topic 0', 'topic-0', 2),
+        (topic.id + 1, 'Topic 1', 'topic-1', 1),
+    ]
+
+
+def test_topics_summary_is_cached(storage, create_posts, count_queries):
+    create_posts(2)
+    topics = storage.get_topics_summary()
+
+    with count_queries() as queries:
+        assert storage.get_topics_summary() == topics
+
+    # only the version is checked
+    assert len(queries) == 1
+
+
+def test_topics_summary_cache_is_invalidated_by_writes(
+        storage, create_posts, build_post_package):
+    create_posts(1)
+    storage.get_topics_summary()
+
+    storage.create_post(build_post_package(topic_name='New topic'))
+
+    assert [t.name for t in storage.get_topics_summary()] == ['New topic', 'Topic 0']
+
+
+def test_bump_posts_version(storage):
+    assert storage.get_posts_stamp() == (0, None)
+
+    storage.bump_posts_version()
+    storage.session.commit()
+    stamp = storage.get_posts_stamp()
+    assert stamp.version == 1
+    assert stamp.updated_at is not None
+
+    # inserting the stamp again, as a concurrent first write does, is ignored
+    storage.insert_ignore(models.Stamp.__table__, ['name'], name=POSTS_STAMP, version=0)
+    storage.bump_posts_version()
+    storage.session.commit()
+    assert storage.get_posts_version() == 2
+
+
+def test_topics_summary_cache_is_invalidated_by_other_processes(storage, create_posts):
+    create_posts(1)
+    storage.get_topics_summary()
+
+    # another process writes a post
+    storage.session.add(models.Post(
+        title='Title', slug='slug', topic=models.Topic(name='New topic', slug='nt'),
+        summary='', md_content='m', html_content='h',
+        published_date=date(2017, 3, 13)))
+    storage.bump_posts_version()
+    storage.session.commit()
+
+    assert [t.name for t in storage.get_topics_summary()] == ['New topic', 'Topic 0']
+
+
+def test_create_post_with_compressed_contents(storage, build_post_package):
+    storage.compress_contents = True
+
+    post = storage.create_post(
+        build_post_package(markdown_content='markdown', html_content='html'))
+    storage.session.expire_all()
+
+    assert post.inline_md_content == ''
+    assert post.inline_html_content == ''
+    assert post.content is not None
+    assert post.md_content == 'markdown'
+    assert post.html_content == 'html'
+
+
+def test_migrate_contents(storage, create_posts):
+    create_posts(3)
+
+    storage.compress_contents = True
+    assert storage.migrate_contents(batch_size=2) == 3
+    assert storage.session.query(models.PostContent).count() == 3
+    for post in storage.session.query(models.Post):
+        assert post.inline_md_content == ''
+        assert post.md_content == 'markdown'
+
+    storage.compress_contents = False
+    assert storage.migrate_contents(batch_size=2) == 3
+    assert storage.session.query(models.PostContent).count() == 0
+    for post in storage.session.query(models.Post):
+        assert post.inline_md_content == 'markdown'
+        assert post.html_content == '<p>markdown</p>'
+
+
+def build_post_packages(build_post_package, count, topics):
+    for index in range(count):
+        yield build_post_package('Post %d' % index, topic_name=topics[index % len(topics)])
+
+
+def test_bulk_create_posts(storage, count_queries, build_post_package):
+    storage.session.add(models.Topic(name='Existing', slug='existing'))
+    storage.session.commit()
+    batches = []
+
+    with count_queries() as queries:
+        created = storage.bulk_create_posts(
+            build_post_packages(build_post_package, 5, ['Existing', 'New']), batch_size=3,
+            on_batch=batches.append)
+
+    assert created == 5
+    assert [len(batch) for batch in batches] == [3, 2]
+    assert len([q for q in queries if q.startswith('INSERT INTO pblog_posts')]) == 2
+    # topics are resolved by the first batch only: once before creating the
+    # missing topic, once after
+    assert len([q for q in queries if 'FROM pblog_topics' in q]) == 2
+    posts = storage.session.query(models.Post).order_by(models.Post.id).all()
+    assert [p.title for p in posts] == ['Post %d' % i for i in range(5)]
+    assert [p.topic.name for p in posts] == ['Existing', 'New', 'Existing', 'New', 'Existing']
+    assert posts[0].md_content == 'markdown of Post 0'
+    assert posts[0].html_content == '<p>html of Post 0</p>'
+
+
+def test_bulk_create_posts_with_compressed_contents(storage, build_post_package):
+    storage.compress_contents = True
+
+    storage.bulk_create_posts(build_post_packages(build_post_package, 3, ['Topic']), batch_size=2)
+
+    posts = storage.session.query(models.Post).all()
+    assert len(posts) == 3
+    for post in posts:
+        assert post.inline_md_content == ''
+        assert post.md_content == 'markdown of %s' % post.title
+        assert post.html_content == '<p>html of %s</p>' % post.title
+
+
+@pytest.fixture(scope='function')
+def replicated_storage(temp_dir):
+    """A storage using a primary database and a distinct replica database,
+    which is never replicated to, so that reads show which one was used.
+    """
+    sessions = []
+    for name in ('primary', 'replica'):
+        engine = create_engine('sqlite:///%s' % (temp_dir / (name + '.sqlite')))
+        models.Base.metadata.create_all(engine)
+        sessions.append(sessionmaker(bind=engine)())
+    primary, replica = sessions
+
+    replica.add(models.Post(
+        title='Replicated', slug='replicated', published_date=date(2017, 3, 12),
+        summary='summary', inline_md_content='markdown', inline_html_content='html',
+        topic=models.Topic(name='Topic', slug='topic')))
+    replica.commit()
+
+    yield Storage(primary, read_session=replica)
+
+    for session in sessions:
+        session.close()
+        session.get_bind().dispose()
+
+
+def test_reads_use_read_session(replicated_storage):
+    assert [p.title for p in replicated_storage.get_all_posts()] == ['Replicated']
+    assert [t.name for t in replicated_storage.get_all_topics()] == ['Topic']
+    assert [t.name for t in replicated_storage.get_topics_summary()] == ['Topic']
+    post_id = replicated_storage.get_all_posts()[0].id
+    assert replicated_storage.get_post(post_id).title == 'Replicated'
+    with pytest.raises(NoResultFound):
+        replicated_storage.get_post(post_id, primary=True)
+
+
+def test_reads_after_write_use_primary_session(replicated_storage, build_post_package):
+    post = replicated_storage.create_post(
+        build_post_package('Written', topic_name='Other topic'))
+
+    assert [p.title for p in replicated_storage.get_all_posts()] == ['Written']
+    assert [t.name for t in replicated_storage.get_topics_summary()] == ['Other topic']
+    assert replicated_storage.get_post(post.id) is post
+
+
+def test_incomplete_search_index_cannot_be_created():
+    class NoSearchIndex(SearchIndex):
+        def create(self, bind):
+            pass
+
+    with pytest.raises(TypeError):
+        NoSearchIndex()
+
+
+def test_search_posts(storage, search_index, build_post_package):
+    for title, summary, content in [
+            ('Python packaging', 'About wheels', 'setup.py and pyproject'),
+            ('Cooking', 'About python recipes', 'not the snake'),
+            ('Gardening', 'About plants', 'no match here')]:
+        storage.create_post(
+            build_post_package(title, summary=summary, markdown_content=content))
+
+    # title matches rank first
+    assert [p.title for p in storage.search_posts('python', 10)] == ['Python packaging', 'Cooking']
+    assert [p.title for p in storage.search_posts('python', 1, offset=1)] == ['Cooking']
+    assert [p.title for p in storage.search_posts('snake', 10)] == ['Cooking']
+    # FTS5 syntax is searched as plain words
+    assert storage.search_posts('"snake OR', 10) == []
+    assert storage.search_posts('', 10) == []
+
+
+def test_search_updated_post(storage, search_index, build_post_package):
+    post_package = build_post_package(markdown_content='old content')
+    post = storage.create_post(post_package)
+    post_package.markdown_content = 'new content'
+
+    storage.update_post(post, post_package)
+
+    assert storage.search_posts('old', 10) == []
+    assert [p.id for p in storage.search_posts('new', 10)] == [post.id]
+
+
+def test_search_bulk_created_posts(storage, search_index, build_post_package):
+    storage.bulk_create_posts(build_post_packages(build_post_package, 3, ['Topic']), batch_size=2)
+
+    assert [p.title for p in storage.search_posts('"Post 1"', 10)] == ['Post 1']
+
+
+def test_reindex_posts(storage, search_index, create_posts):
+    create_posts(3)
+
+    assert storage.reindex_posts(batch_size=2) == 3
+    assert [p.title for p in storage.search_posts('post', 10)] == ['Post 0', 'Post 1', 'Post 2']
+
+
+def test_post_revisions(storage, count_queries, build_post_package):
+    post_package = build_post_package(
+        'Title 0', markdown_content='version 0\ncommon line\n')
+    post = storage.create_post(post_package)
+    versions = 2 * SNAPSHOT_INTERVAL + 3
+    for version in range(1, versions + 1):
+        post_package.post_title = 'Title %d' % version
+        post_package.markdown_content = 'version %d\ncommon line\n' % version
+        storage.update_post(post, post_package)
+    # updates keeping the content add no revision
+    storage.update_post(post, post_package)
+
+    revisions = storage.get_post_revisions(post.id)
+    assert [r.number for r in revisions] == list(range(versions, 0, -1))
+    assert [r.title for r in revisions] == ['Title %d' % v for v in range(versions - 1, -1, -1)]
+    for number in range(1, versions + 1):
+        storage.session.expire_all()
+        with count_queries() as queries:
+            revision, content = storage.get_post_revision(post.id, number)
+        assert revision.number == number
+        assert content == 'version %d\ncommon line\n' % (number - 1)
+        # snapshot and revisions queries, then at most the post and its
+        # contents, whatever the revision
+        assert len(queries) <= 5
+    with pytest.raises(NoResultFound):
+        storage.get_post_revision(post.id, versions + 1)
+
+
+def test_listing_does_not_load_revisions(storage, create_posts, count_queries):
+    create_posts(1)
+
+    with count_queries() as queries:
+        storage.get_posts_page(20)
+
+    assert not any('pblog_post_revisions' in query for query in queries)
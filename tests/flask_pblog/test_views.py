@@ -1,9 +1,17 @@
 from contextlib import contextmanager
+import gzip
 import pathlib
 from unittest.mock import patch
 from urllib.parse import urlparse
 
 from flask import template_rendered
+import pytest
+
+from pblog.blobstore import BlobStore
+from pblog.package import FileResourceHandler, ResourceHandler
+from flask_pblog import models, precompress
+from flask_pblog.readmodel import ReadModel
+from flask_pblog.views import store_post_variants
 
 
 @contextmanager
@@ -29,6 +37,78 @@ class TestPostsList:
             assert len(templates) >= 1
             assert templates[0][0].name == 'pblog/posts-list.html'
 
+    def test_query_count_does_not_depend_on_post_count(
+            self, client, create_posts, count_queries):
+        create_posts(2)
+        with count_queries() as few_posts_queries:
+            client.get('/')
+
+        create_posts(10)
+        with count_queries() as many_posts_queries:
+            client.get('/')
+
+        assert len(many_posts_queries) == len(few_posts_queries)
+
+    def test_query_count(self, client, create_posts, count_queries):
+        create_posts(3)
+        # caches the topics summary
+        client.get('/')
+
+        with count_queries() as queries:
+            response = client.get('/')
+
+        # posts stamp, then posts page
+        assert response.status_code == 200
+        assert len(queries) == 2
+
+    def test_not_modified_query_count(self, client, create_posts, count_queries):
+        create_posts(3)
+        etag = client.get('/').headers['ETag']
+
+        with count_queries() as queries:
+            response = client.get('/', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert len(queries) == 1
+
+    def test_read_model_serves_without_queries(
+            self, app, client, storage, create_posts, count_queries):
+        app.extensions['pblog'].read_model = ReadModel(storage, check_interval=3600)
+        create_posts(3)
+        client.get('/')
+
+        with count_queries() as queries:
+            response = client.get('/')
+            topic_response = client.get('/topic/1/topic-0')
+            redirect_response = client.get('/post/1/wrong-slug')
+
+        assert queries == []
+        assert b'Post 2' in response.data
+        assert b'Post 0' in topic_response.data
+        assert redirect_response.status_code == 301
+
+    def test_paginates(self, app, client, create_posts):
+        app.extensions['pblog'].posts_per_page = 2
+        create_posts(3)
+
+        with capture_template(app) as templates:
+            response = client.get('/')
+            first_page = templates[0][1]
+        assert len(first_page['posts']) == 2
+        assert first_page['next_cursor'] is not None
+        assert ('/?before=%s' % first_page['next_cursor']).encode() in response.data
+
+        with capture_template(app) as templates:
+            client.get('/?before=%s' % first_page['next_cursor'])
+            last_page = templates[0][1]
+        assert len(last_page['posts']) == 1
+        assert last_page['next_cursor'] is None
+
+    def test_invalid_cursor(self, client):
+        response = client.get('/?before=foo')
+
+        assert response.status_code == 400
+
 
 class TestShowPost:
     def test_template_rendered(self, post, app, client):
@@ -51,6 +131,37 @@ class TestShowPost:
         assert response.status_code == 301
         assert urlparse(response.location).path == '/post/%d/%s.md' % (post.id, post.slug)
 
+    def test_query_count(self, client, create_posts, count_queries):
+        create_posts(3)
+        client.get('/')
+
+        with count_queries() as queries:
+            response = client.get('/post/1/post-0')
+        # post with its topic and contents, then posts stamp
+        assert response.status_code == 200
+        assert len(queries) == 2
+
+        with count_queries() as queries:
+            response = client.get('/post/1/post-0.md')
+        assert response.status_code == 200
+        assert len(queries) == 1
+
+        with count_queries() as queries:
+            response = client.get('/post/1/wrong-slug')
+        assert response.status_code == 301
+        assert len(queries) == 1
+
+    def test_404_query_count(self, client, create_posts, count_queries):
+        create_posts(3)
+        client.get('/')
+
+        with count_queries() as queries:
+            response = client.get('/post/42/foo')
+
+        # post, then posts stamp for the sidebar of the 404 page
+        assert response.status_code == 404
+        assert len(queries) == 2
+
     def test_raises_404(self, client):
         response = client.get('/post/1/foo')
 
@@ -68,6 +179,16 @@ class TestShowPost:
         assert response.status_code == 200
         assert response.headers['Content-Type'].startswith('text/plain') is True
 
+    def test_shows_compressed_contents(self, post, storage, client):
+        storage.compress_contents = True
+        storage.migrate_contents()
+
+        response = client.get('/post/%d/%s' % (post.id, post.slug))
+        assert b'<h1>markdown</h1' in response.data
+
+        response = client.get('/post/%d/%s.md' % (post.id, post.slug))
+        assert response.data == b'markdown'
+
 
 class TestShowPostsInTopic:
     def test_template_rendered(self, post, app, client):
@@ -87,6 +208,27 @@ class TestShowPostsInTopic:
         location = urlparse(response.location).path
         assert location == '/topic/%s/%s' % (post.topic.id, post.topic.slug)
 
+    def test_query_count(self, client, create_posts, count_queries):
+        create_posts(3)
+        client.get('/')
+
+        with count_queries() as queries:
+            response = client.get('/topic/1/topic-0')
+        # posts stamp, then posts page. The topic is found in the topics
+        # summary.
+        assert response.status_code == 200
+        assert len(queries) == 2
+
+        with count_queries() as queries:
+            response = client.get('/topic/1/wrong-slug')
+        assert response.status_code == 301
+        assert len(queries) == 1
+
+        with count_queries() as queries:
+            response = client.get('/topic/42/foo')
+        assert response.status_code == 404
+        assert len(queries) == 1
+
     def test_raises_404(self, app, client):
         response = client.get('/topic/1/foo')
 
@@ -106,6 +248,82 @@ def test_serves_resource_file(patch_send_from_directory, app, client):
     patch_send_from_directory.assert_called_once_with(resource_path, 'some-file.txt')
 
 
+class TestServeResourceFile:
+    @pytest.fixture
+    def resource(self, app, temp_dir):
+        app.extensions['pblog'].post_resource_path = temp_dir
+        (temp_dir / 'a-post').mkdir()
+        resource = FileResourceHandler(temp_dir / 'a-post/cat.png', pathlib.Path('cat.png'))
+        with resource.file_path.open('wb') as f:
+            f.write(b'a cat')
+        return resource
+
+    def test_versioned_url_is_immutable(self, client, resource):
+        response = client.get('/resources/a-post/cat.png?v=%s' % resource.version())
+
+        assert response.status_code == 200
+        assert response.data == b'a cat'
+        assert response.cache_control.immutable is True
+        assert response.cache_control.max_age == 365 * 24 * 3600
+
+    @pytest.mark.parametrize('link_mode', BlobStore.LINK_MODES)
+    def test_stored_resource_is_not_hashed(self, app, client, temp_dir, link_mode):
+        store = BlobStore(temp_dir / '.blobs', link_mode)
+        app.extensions['pblog'].post_resource_path = temp_dir
+        app.extensions['pblog'].resource_store = store
+        app.extensions['pblog'].resource_offload = 'x-sendfile'
+        resource = ResourceHandler(b'a dog', pathlib.Path('dog.png'))
+        resource.save(temp_dir, 'a-post', store)
+
+        with patch('flask_pblog.views.file_version') as file_version:
+            response = client.get('/resources/a-post/dog.png?v=%s' % resource.version())
+
+        assert response.cache_control.immutable is True
+        assert not file_version.called
+
+    def test_outdated_version_is_not_immutable(self, client, resource):
+        response = client.get('/resources/a-post/cat.png?v=0123456789abcdef')
+
+        assert response.status_code == 200
+        assert response.data == b'a cat'
+        assert not response.cache_control.immutable
+
+    def test_x_sendfile(self, app, client, resource):
+        app.extensions['pblog'].resource_offload = 'x-sendfile'
+
+        response = client.get('/resources/a-post/cat.png?v=%s' % resource.version())
+
+        assert response.data == b''
+        assert response.headers['X-Sendfile'] == str(resource.file_path)
+        assert response.mimetype == 'image/png'
+        assert response.cache_control.immutable is True
+
+    def test_x_accel_redirect(self, app, client, resource):
+        app.extensions['pblog'].resource_offload = 'x-accel-redirect'
+
+        response = client.get('/resources/a-post/cat.png')
+
+        assert response.data == b''
+        assert response.headers['X-Accel-Redirect'] == '/pblog-resources/a-post/cat.png'
+        assert not response.cache_control.immutable
+
+    def test_offloaded_missing_file(self, app, client, resource):
+        app.extensions['pblog'].resource_offload = 'x-accel-redirect'
+
+        response = client.get('/resources/a-post/dog.png')
+
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize('offload', [None, 'x-sendfile', 'x-accel-redirect'])
+    def test_hidden_files_are_not_served(self, app, client, resource, offload):
+        app.extensions['pblog'].resource_offload = offload
+        blob_path = BlobStore(resource.file_path.parent.parent / '.blobs').add(resource)
+
+        response = client.get('/resources/.blobs/%s/%s' % blob_path.parts[-2:])
+
+        assert response.status_code == 404
+
+
 class TestShow404:
     def test_renders_template(self, app, client):
         with capture_template(app) as templates:
@@ -114,3 +332,198 @@ class TestShow404:
             assert response.status_code == 404
             assert len(templates) >= 1
             assert templates[0][0].name == 'pblog/404.html'
+
+    def test_query_count(self, client, create_posts, count_queries):
+        create_posts(3)
+        client.get('/')
+
+        with count_queries() as queries:
+            response = client.get('/unexisting')
+
+        assert response.status_code == 404
+        assert len(queries) == 1
+
+    def test_fetches_topics_summary_once(self, client, create_posts, count_queries):
+        create_posts(3)
+
+        with count_queries() as queries:
+            response = client.get('/topic/42/foo')
+
+        # the topics summary of the topic lookup is reused by the 404 page
+        assert response.status_code == 404
+        assert len(queries) == 2
+
+
+class TestSearchPosts:
+    def test_renders_template(self, app, client, storage, search_index, create_posts):
+        app.extensions['pblog'].posts_per_page = 2
+        create_posts(3)
+        storage.reindex_posts()
+
+        with capture_template(app) as templates:
+            response = client.get('/search?q=post')
+
+            assert response.status_code == 200
+            assert templates[0][0].name == 'pblog/search.html'
+            assert templates[0][1]['query'] == 'post'
+            assert len(templates[0][1]['posts']) == 2
+            assert templates[0][1]['next_page'] == 2
+
+        with capture_template(app) as templates:
+            client.get('/search?q=post&page=2')
+
+            assert len(templates[0][1]['posts']) == 1
+            assert templates[0][1]['next_page'] is None
+
+    def test_invalid_page(self, client, search_index):
+        assert client.get('/search?q=post&page=0').status_code == 400
+        assert client.get('/search?q=post&page=foo').status_code == 400
+
+    def test_raises_404_without_search_index(self, client):
+        assert client.get('/search?q=post').status_code == 404
+
+
+class TestConditionalGet:
+    def test_posts_list_not_modified(self, app, client, create_posts):
+        create_posts(1)
+        response = client.get('/')
+        etag = response.headers['ETag']
+        last_modified = response.headers['Last-Modified']
+
+        with capture_template(app) as templates:
+            response = client.get('/', headers={'If-None-Match': etag})
+
+            assert response.status_code == 304
+            assert templates == []
+
+        response = client.get('/', headers={'If-Modified-Since': last_modified})
+        assert response.status_code == 304
+
+    def test_posts_list_modified(self, client, create_posts):
+        create_posts(1)
+        etag = client.get('/').headers['ETag']
+
+        create_posts(1)
+
+        response = client.get('/', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_weak_etag_not_modified(self, client, create_posts):
+        create_posts(1)
+        etag = client.get('/').headers['ETag']
+
+        response = client.get('/', headers={'If-None-Match': 'W/' + etag})
+
+        assert response.status_code == 304
+
+    def test_topic_not_modified(self, client, create_posts):
+        create_posts(1)
+        etag = client.get('/topic/1/topic-0').headers['ETag']
+
+        response = client.get('/topic/1/topic-0', headers={'If-None-Match': etag})
+
+        assert response.status_code == 304
+
+    def test_post_not_modified(self, client, post):
+        for url in ('/post/%d/a-post' % post.id, '/post/%d/a-post.md' % post.id):
+            etag = client.get(url).headers['ETag']
+
+            response = client.get(url, headers={'If-None-Match': etag})
+
+            assert response.status_code == 304
+
+    def test_markdown_post_modified(self, client, storage, post, build_post_package):
+        url = '/post/%d/a-post.md' % post.id
+        etag = client.get(url).headers['ETag']
+
+        post_package = build_post_package(
+            post.title, post_slug=post.slug, summary=post.summary,
+            published_date=post.published_date, topic_name=post.topic.name,
+            markdown_content='new markdown')
+        storage.update_post(post, post_package)
+
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.data == b'new markdown'
+
+
+class TestPrecompressedPost:
+    def test_serves_stored_variants(self, app, client, post):
+        app.extensions['pblog'].precompressed_encodings = ['gzip']
+        with app.test_request_context():
+            store_post_variants(post)
+
+        for url in ('/post/%d/a-post' % post.id, '/post/%d/a-post.md' % post.id):
+            plain = client.get(url)
+            response = client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+
+            assert plain.headers.get('Content-Encoding') is None
+            assert response.headers['Content-Encoding'] == 'gzip'
+            assert 'Accept-Encoding' in response.headers['Vary']
+            assert gzip.decompress(response.data) == plain.data
+            assert response.headers['ETag'] != plain.headers['ETag']
+
+    def test_serves_variants_with_read_model(self, app, client, storage, create_posts):
+        app.extensions['pblog'].precompressed_encodings = ['gzip']
+        app.extensions['pblog'].read_model = ReadModel(storage, check_interval=3600)
+        create_posts(3)
+        post = storage.get_post(2, primary=True)
+        with app.test_request_context():
+            store_post_variants(post)
+        storage.session.commit()
+
+        response = client.get('/post/2/post-1', headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert b'Topic 2' in gzip.decompress(response.data)
+
+    def test_variant_key_ignores_topics_order(self, storage, create_posts):
+        create_posts(3)
+        post = storage.get_post(1)
+        topics = storage.get_topics_summary()
+
+        assert precompress.variant_key(post, topics) == \
+            precompress.variant_key(post, list(reversed(topics)))
+
+    def test_ignores_outdated_variants(self, app, client, storage, post):
+        app.extensions['pblog'].precompressed_encodings = ['gzip']
+        with app.test_request_context():
+            store_post_variants(post)
+        # a new topic changes the page
+        storage.get_or_create_topic('New topic')
+        storage.session.add(models.Post(
+            title='Other', slug='other', published_date=post.published_date,
+            topic_id=storage.resolve_topic_id('New topic')))
+        storage.commit_posts()
+
+        response = client.get(
+            '/post/%d/a-post' % post.id, headers={'Accept-Encoding': 'gzip'})
+
+        assert response.headers.get('Content-Encoding') is None
+        assert b'New topic' in response.data
+
+    def test_not_accepted_encoding(self, app, client, post):
+        app.extensions['pblog'].precompressed_encodings = ['gzip']
+        with app.test_request_context():
+            store_post_variants(post)
+
+        response = client.get(
+            '/post/%d/a-post' % post.id, headers={'Accept-Encoding': 'gzip;q=0'})
+
+        assert response.headers.get('Content-Encoding') is None
+
+    def test_not_modified_does_not_read_variant(self, app, client, count_queries, post):
+        app.extensions['pblog'].precompressed_encodings = ['gzip']
+        with app.test_request_context():
+            store_post_variants(post)
+        url = '/post/%d/a-post' % post.id
+        etag = client.get(url, headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+
+        with count_queries() as statements:
+            response = client.get(
+                url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+
+        assert response.status_code == 304
+        assert not any('data' in statement for statement in statements
+                       if 'pblog_post_variants' in statement)
@@ -0,0 +1,83 @@
+import os
+import pathlib
+
+import pytest
+
+from pblog.blobstore import BlobStore
+from pblog.package import ResourceHandler
+
+
+PNG_HEADER = b'\x89\x50\x4e\x47\x0d\x0a\x1a\x0a'
+
+
+@pytest.fixture(params=BlobStore.LINK_MODES)
+def store(request, temp_dir):
+    return BlobStore(temp_dir / '.blobs', request.param)
+
+
+def test_unknown_link_mode(temp_dir):
+    with pytest.raises(ValueError):
+        BlobStore(temp_dir, 'copy')
+
+
+def test_stores_content_once(store, temp_dir):
+    (temp_dir / 'ham').mkdir()
+    (temp_dir / 'spam').mkdir()
+    res_hdl = ResourceHandler(PNG_HEADER, pathlib.Path('img.png'))
+
+    res_hdl.save(temp_dir, 'ham', store)
+    res_hdl.save(temp_dir, 'spam', store)
+
+    blobs = [p for p in store.root_path.glob('*/*')]
+    assert blobs == [store.blob_path(res_hdl.digest())]
+    for directory in ('ham', 'spam'):
+        res_path = temp_dir / directory / 'img.png'
+        assert os.path.samefile(str(res_path), str(blobs[0]))
+        with res_path.open('rb') as f:
+            assert f.read() == PNG_HEADER
+
+
+def test_unchanged_resources_are_not_written(store, temp_dir):
+    res_hdl = ResourceHandler(PNG_HEADER, pathlib.Path('img.png'))
+
+    assert store.store(res_hdl, temp_dir / 'img.png') is True
+    assert store.store(res_hdl, temp_dir / 'img.png') is False
+
+
+def test_replaces_changed_resources(store, temp_dir):
+    with (temp_dir / 'img.png').open('wb') as f:
+        f.write(b'old content')
+    res_hdl = ResourceHandler(PNG_HEADER, pathlib.Path('img.png'))
+
+    assert store.store(res_hdl, temp_dir / 'img.png') is True
+
+    with (temp_dir / 'img.png').open('rb') as f:
+        assert f.read() == PNG_HEADER
+
+
+def test_collects_unlinked_blobs(temp_dir):
+    store = BlobStore(temp_dir / '.blobs')
+    store.store(ResourceHandler(b'old', pathlib.Path('img.png')), temp_dir / 'img.png')
+    store.store(ResourceHandler(b'new', pathlib.Path('img.png')), temp_dir / 'img.png')
+
+    removed = store.collect_garbage()
+
+    assert removed == [store.blob_path(ResourceHandler(b'old', pathlib.Path('a')).digest())]
+    assert len(list(store.root_path.glob('*/*'))) == 1
+
+
+def test_linked_digest(store, temp_dir):
+    res_hdl = ResourceHandler(PNG_HEADER, pathlib.Path('img.png'))
+    res_hdl.save(temp_dir, 'ham', store)
+    digest = res_hdl.digest()
+    other_path = temp_dir / 'other.png'
+    with other_path.open('wb') as f:
+        f.write(PNG_HEADER)
+
+    assert store.linked_digest(temp_dir / 'ham/img.png', digest[:16]) == digest
+    assert store.linked_digest(other_path, digest[:16]) is None
+    # symbolic links give their blob whatever the expected digest, hardlinks
+    # are only looked for among the blobs matching it
+    expected = digest if store.link_mode == 'symlink' else None
+    assert store.linked_digest(temp_dir / 'ham/img.png', '0' * 16) == expected
+    assert store.linked_digest(temp_dir / 'ham/img.png', '../') == expected
@@ -0,0 +1,103 @@
+import pathlib
+from unittest.mock import patch
+
+import pytest
+
+from pblog import package
+from pblog.cache import BuildCache
+
+
+SAMPLE_MARKDOWN = """---
+title: This is a title
+topic: A topic
+published_date: 2017-03-30
+---
+
+[summary]
+Let's have a summary
+
+![img](img.png)
+"""
+
+
+@pytest.fixture
+def post_path(temp_dir):
+    post_path = temp_dir / 'post.md'
+    with post_path.open('w') as f:
+        f.write(SAMPLE_MARKDOWN)
+    with (temp_dir / 'img.png').open('wb') as f:
+        f.write(b'img-content')
+    return post_path
+
+
+@pytest.fixture
+def cache(temp_dir):
+    return BuildCache(temp_dir / '.pblog-cache')
+
+
+def build(post_path, cache, encoding='utf-8', level=None):
+    return package.build_package(
+        post_path, post_path.parent / 'post.tar.gz', encoding=encoding, cache=cache,
+        level=level)
+
+
+def test_reuses_unchanged_package(post_path, cache):
+    built_package = build(post_path, cache)
+
+    with patch('pblog.package.tarfile.open') as tarfile_open:
+        cached_package = build(post_path, cache)
+
+    assert tarfile_open.called is False
+    for attr in ('post_title', 'topic_name', 'summary', 'post_id', 'post_slug',
+                 'published_date', 'markdown_content', 'post_encoding'):
+        assert getattr(cached_package, attr) == getattr(built_package, attr)
+    assert [r.path for r in cached_package.resources] == [pathlib.Path('img.png')]
+    assert cached_package.resources[0].content == b'img-content'
+
+
+def test_changed_post_is_rebuilt(post_path, cache):
+    build(post_path, cache)
+    with post_path.open('w') as f:
+        f.write(SAMPLE_MARKDOWN.replace('This is a title', 'New title'))
+
+    assert build(post_path, cache).post_title == 'New title'
+
+
+def test_changed_resource_is_rebuilt(post_path, cache):
+    build(post_path, cache)
+    with (post_path.parent / 'img.png').open('wb') as f:
+        f.write(b'new-content')
+
+    with patch('pblog.package.tarfile.open') as tarfile_open:
+        build(post_path, cache)
+
+    assert tarfile_open.called is True
+
+
+def test_changed_encoding_is_rebuilt(post_path, cache):
+    build(post_path, cache)
+
+    with patch('pblog.package.tarfile.open') as tarfile_open:
+        build(post_path, cache, encoding='iso-8859-1')
+
+    assert tarfile_open.called is True
+
+
+def test_changed_compression_is_rebuilt(post_path, cache):
+    build(post_path, cache)
+
+    with patch('pblog.package.tarfile.open') as tarfile_open:
+        build(post_path, cache, level=1)
+
+    assert tarfile_open.called is True
+
+
+def test_modified_package_is_rebuilt(post_path, cache):
+    build(post_path, cache)
+    with (post_path.parent / 'post.tar.gz').open('ab') as f:
+        f.write(b'garbage')
+
+    with patch('pblog.package.tarfile.open') as tarfile_open:
+        build(post_path, cache)
+
+    assert tarfile_open.called is True
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from io import BytesIO
 import pathlib
@@ -137,6 +138,57 @@ class TestExtractPackageResource:
         assert resource.content == PNG_HEADER
         assert resource.path == pathlib.Path('imgs/ham.png')
 
+    def test_big_resources_are_spooled_to_disk(self):
+        content = PNG_HEADER * 64
+        pack = build_tar_file([
+            ('resources/ham.png', content),
+        ])
+
+        with tarfile.open(fileobj=pack) as tar:
+            resources = package.extract_package_resources(
+                tar, (pathlib.Path('ham.png'),), buffer_size=len(content) - 1)
+
+        resource = resources[0]
+        assert not isinstance(resource._spool, BytesIO)
+        assert resource.content == content
+
+    def test_memory_is_shared_by_resources(self):
+        pack = build_tar_file([
+            ('resources/ham.png', PNG_HEADER * 4),
+            ('resources/spam.png', PNG_HEADER * 4),
+        ])
+
+        with tarfile.open(fileobj=pack) as tar:
+            ham, spam = package.extract_package_resources(
+                tar, (pathlib.Path('ham.png'), pathlib.Path('spam.png')),
+                buffer_size=len(PNG_HEADER) * 6)
+
+        # each resource is smaller than the buffer, but not both
+        assert isinstance(ham._spool, BytesIO)
+        assert not isinstance(spam._spool, BytesIO)
+        assert spam.content == PNG_HEADER * 4
+        ham.close()
+        spam.close()
+        assert ham._budget.available == len(PNG_HEADER) * 6
+
+
+class TestMemoryBudget:
+    def test_spools_to_disk_once_used_up(self):
+        budget = package.MemoryBudget(10)
+
+        in_memory = budget.spool(BytesIO(b'a' * 8), buffer_size=4)
+        on_disk = budget.spool(BytesIO(b'b' * 8), buffer_size=4)
+
+        assert isinstance(in_memory, BytesIO)
+        assert not isinstance(on_disk, BytesIO)
+        assert on_disk.read() == b'b' * 8
+        assert budget.available == 2
+
+        budget.release(in_memory)
+        budget.release(on_disk)
+        assert budget.available == 10
+        assert in_memory.closed and on_disk.closed
+
 
 class TestReadingPackage:
     def test_read_package(self, temp_dir):
@@ -174,6 +226,165 @@ class TestReadingPackage:
 
         assert package_info.post_title == "This is a title"
 
+    def test_read_package_from_non_seekable_stream(self):
+        class Stream:
+            def __init__(self, content):
+                self.content = content
+
+            def read(self, size=-1):
+                return self.content.read(size)
+
+        pack = build_tar_file([
+            ('package.yml', b"encoding: utf-8\npost: post.md"),
+            ('post.md', (SAMPLE_MARKDOWN + "![img](img.png)").encode()),
+            ('resources/img.png', PNG_HEADER),
+        ])
+
+        package_info = package.read_package(Stream(pack))
+
+        assert package_info.post_title == "This is a title"
+        assert package_info.resources[0].content == PNG_HEADER
+
+    def test_read_package_in_any_member_order(self):
+        pack = build_tar_file([
+            ('resources/unused.png', b'unused'),
+            ('resources/img.png', PNG_HEADER),
+            ('post.md', (SAMPLE_MARKDOWN + "![img](img.png)").encode()),
+            ('package.yml', b"encoding: utf-8\npost: post.md"),
+        ])
+
+        package_info = package.read_package(pack)
+
+        assert package_info.post_title == "This is a title"
+        assert [r.path for r in package_info.resources] == [pathlib.Path('img.png')]
+        assert package_info.resources[0].content == PNG_HEADER
+
+    def test_read_package_without_post(self):
+        pack = build_tar_file([
+            ('package.yml', b"encoding: utf-8\npost: post.md"),
+        ])
+
+        with pytest.raises(package.PackageException):
+            package.read_package(pack)
+
+    def test_read_package_without_meta(self):
+        pack = build_tar_file([
+            ('post.md', SAMPLE_MARKDOWN.encode()),
+        ])
+
+        with pytest.raises(package.PackageException):
+            package.read_package(pack)
+
+    def test_read_package_with_missing_resources(self):
+        pack = build_tar_file([
+            ('package.yml', b"encoding: utf-8\npost: post.md"),
+            ('post.md', (SAMPLE_MARKDOWN + "![img](img.png)").encode()),
+        ])
+
+        with pytest.raises(package.ResourcesNotFound) as excinfo:
+            package.read_package(pack)
+
+        assert excinfo.value.resources == ['img.png']
+
+    def test_concurrent_reads_do_not_share_metadata(self):
+        def read(index):
+            post = "---\ntitle: Title {0}\ntopic: Topic {0}\n---\n\n" \
+                "Summary {0}\n\n![img](img-{0}.png)\n".format(index)
+            package_file = build_tar_file([
+                ('package.yml', b"encoding: utf-8\npost: post.md"),
+                ('post.md', post.encode()),
+                ('resources/img-%d.png' % index, PNG_HEADER),
+            ])
+            return index, package.read_package(package_file)
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(read, range(300)))
+
+        for index, package_info in results:
+            assert package_info.post_title == 'Title %d' % index
+            assert package_info.topic_name == 'Topic %d' % index
+            assert package_info.summary == 'Summary %d' % index
+            assert [r.path for r in package_info.resources] == [
+                pathlib.Path('img-%d.png' % index)]
+
+
+class TestMarkdownParserPool:
+    def test_reuses_returned_parsers(self):
+        pool = package.MarkdownParserPool()
+
+        with pool.parser() as parser:
+            pass
+        with pool.parser() as other_parser:
+            assert other_parser is parser
+
+    def test_checked_out_parsers_are_not_shared(self):
+        pool = package.MarkdownParserPool()
+
+        parser = pool.checkout()
+        assert pool.checkout() is not parser
+
+    def test_resets_returned_parsers(self):
+        pool = package.MarkdownParserPool()
+
+        with pool.parser() as parser:
+            parser.convert(SAMPLE_MARKDOWN)
+
+        assert parser.meta is None
+        assert parser.summary is None
+        assert parser.resource_path == []
+
+
+class TestReadingMeta:
+    def test_read_post_meta(self, temp_dir):
+        post_path = temp_dir / 'post.md'
+        with post_path.open('w', encoding='iso-8859-1') as f:
+            f.write(SAMPLE_MARKDOWN)
+
+        assert package.read_post_meta(post_path, encoding='iso-8859-1') == {
+            'id': {},
+            'title': 'This is a title',
+            'slug': None,
+            'topic': 'A topic',
+            'published_date': None,
+        }
+
+    def test_read_post_meta_validates(self, temp_dir):
+        post_path = temp_dir / 'post.md'
+        with post_path.open('w') as f:
+            f.write("No header here\n")
+
+        with pytest.raises(package.PackageValidationError) as excinfo:
+            package.read_post_meta(post_path)
+
+        assert 'title' in excinfo.value.errors
+
+    def test_read_package_meta(self):
+        pack = build_tar_file([
+            ('package.yml', b"encoding: iso-8859-1\npost: post.md"),
+            ('post.md', (SAMPLE_MARKDOWN + "![img](img.png)").encode('iso-8859-1')),
+        ])
+
+        meta = package.read_package_meta(pack)
+
+        assert meta['title'] == 'This is a title'
+        assert meta['topic'] == 'A topic'
+
+    def test_read_package_meta_with_post_first(self):
+        pack = build_tar_file([
+            ('post.md', SAMPLE_MARKDOWN.encode()),
+            ('package.yml', b"encoding: utf-8\npost: post.md"),
+        ])
+
+        assert package.read_package_meta(pack)['title'] == 'This is a title'
+
+    def test_read_package_meta_without_post(self):
+        pack = build_tar_file([
+            ('package.yml', b"encoding: utf-8\npost: post.md"),
+        ])
+
+        with pytest.raises(package.PackageException):
+            package.read_package_meta(pack)
+
 
 class TestBuildingPackage:
     def test_build_package(self, temp_dir):
@@ -203,6 +414,7 @@ class TestBuildingPackage:
         assert built_package.markdown_content == sample_markdown
         assert len(built_package.resources) == 1
         resource = built_package.resources[0]
+        assert isinstance(resource, package.FileResourceHandler)
         assert resource.content == b'img-content'
         assert resource.path == pathlib.Path('imgs/img.png')
 
@@ -221,6 +433,25 @@ class TestBuildingPackage:
         except tarfile.ReadError:
             pytest.fail("built package is not a valid tar file")
 
+    @pytest.mark.parametrize('codec', sorted(package.CODECS))
+    def test_codecs_are_read_back(self, temp_dir, codec):
+        post_path = temp_dir / "post.md"
+        with post_path.open('w', encoding='utf-8') as post_file:
+            post_file.write(SAMPLE_MARKDOWN + "![img](img.png)")
+        with (temp_dir / 'img.png').open('wb') as f:
+            f.write(PNG_HEADER)
+        package_path = temp_dir / ('post' + package.CODECS[codec])
+
+        package.build_package(post_path, package_path, codec=codec, level=1)
+        package_info = package.read_package(package_path)
+
+        assert package_info.post_title == "This is a title"
+        assert package_info.resources[0].content == PNG_HEADER
+
+    def test_unknown_codec(self, temp_dir):
+        with pytest.raises(ValueError):
+            package.build_package(temp_dir / 'post.md', BytesIO(), codec='zip')
+
     def test_invalid_post_meta_will_not_package(self, temp_dir):
         post_path = temp_dir / "post.md"
         with post_path.open('w') as f:
@@ -249,6 +480,67 @@ foo: bar
         assert excinfo.value.resources == ['unexisting.png']
 
 
+class TestBuildingPackages:
+    def test_builds_packages(self, temp_dir):
+        (temp_dir / 'out').mkdir()
+        for name in ('first', 'second'):
+            with (temp_dir / (name + '.md')).open('w') as f:
+                f.write(SAMPLE_MARKDOWN)
+
+        report = package.build_packages(
+            [temp_dir / 'first.md', temp_dir / 'second.md'], temp_dir / 'out',
+            workers=2)
+
+        assert [r.package_path for r in report.results] == [
+            temp_dir / 'out/first.tar.gz', temp_dir / 'out/second.tar.gz']
+        assert len(report.succeeded) == 2
+        for result in report.results:
+            assert result.package.post_title == 'This is a title'
+            assert result.size == result.package_path.stat().st_size
+        assert report.total_size > 0
+        assert report.posts_per_second > 0
+        assert report.bytes_per_second > 0
+
+    def test_collects_errors(self, temp_dir):
+        with (temp_dir / 'invalid.md').open('w') as f:
+            f.write("---\nfoo: bar\n---\n")
+        with (temp_dir / 'missing.md').open('w') as f:
+            f.write(SAMPLE_MARKDOWN + "![img](missing.png)")
+        with (temp_dir / 'valid.md').open('w') as f:
+            f.write(SAMPLE_MARKDOWN)
+
+        report = package.build_packages(
+            [temp_dir / 'invalid.md', temp_dir / 'missing.md', temp_dir / 'valid.md'],
+            temp_dir, workers=2)
+
+        assert [r.post_path for r in report.succeeded] == [temp_dir / 'valid.md']
+        invalid, missing = report.failed
+        assert isinstance(invalid.error, package.PackageValidationError)
+        assert 'title' in invalid.error.errors
+        assert isinstance(missing.error, package.ResourcesNotFound)
+        assert missing.error.resources == ['missing.png']
+
+    def test_collects_read_errors(self, temp_dir):
+        with (temp_dir / 'valid.md').open('w') as f:
+            f.write(SAMPLE_MARKDOWN)
+        with (temp_dir / 'latin1.md').open('wb') as f:
+            f.write(SAMPLE_MARKDOWN.encode('latin-1'))
+
+        report = package.build_packages(
+            [temp_dir / 'valid.md', temp_dir / 'latin1.md', temp_dir / 'missing.md'],
+            temp_dir, workers=2)
+
+        assert [r.post_path for r in report.succeeded] == [temp_dir / 'valid.md']
+        latin1, missing = report.failed
+        assert isinstance(latin1.error, UnicodeDecodeError)
+        assert isinstance(missing.error, FileNotFoundError)
+
+    def test_package_paths_must_be_unique(self, temp_dir):
+        with pytest.raises(ValueError):
+            package.build_packages(
+                [temp_dir / 'a/post.md', temp_dir / 'b/post.md'], temp_dir)
+
+
 class TestPackage:
     @patch('pblog.package.date')
     def test_package_sets_default_values(self, patch_date):
@@ -274,11 +566,11 @@ class TestPackage:
         assert pack.published_date == date(2017, 3, 30)
         assert pack.post_id == {'foo': 12}
 
-        parser = package.markdown_parser
-        package.markdown_parser.convert(pack.markdown_content)
-        assert parser.meta['slug'] == 'a-title'
-        assert parser.meta['published_date'] == date(2017, 3, 30)
-        assert parser.meta['id'] == {'foo': 12}
+        with package.parser_pool.parser() as parser:
+            parser.convert(pack.markdown_content)
+            assert parser.meta['slug'] == 'a-title'
+            assert parser.meta['published_date'] == date(2017, 3, 30)
+            assert parser.meta['id'] == {'foo': 12}
 
     def test_package_warns_if_no_meta_to_update(self):
         pack = package.Package(
@@ -290,6 +582,24 @@ class TestPackage:
             post_id={'foo': 12},
             post_slug='slug', published_date=date(2017, 3, 30)) is False
 
+    def test_builds_versioned_resource_urls(self):
+        resource = package.ResourceHandler(PNG_HEADER, pathlib.Path('img/cat.png'))
+        pack = package.Package(
+            post_title="A title", topic_name="A topic", summary="Foo",
+            markdown_content="![cat](img/cat.png) [other](other.txt)",
+            post_slug="slug", resources=[resource])
+
+        with package.parser_pool.parser() as parser:
+            pack.build_html_content(parser, '/resources/', versioned=True)
+        assert 'src="/resources/slug/img/cat.png?v={}"'.format(
+            resource.version()) in pack.html_content
+        assert resource.version() == resource.digest()[:package.RESOURCE_VERSION_LENGTH]
+        assert 'href="/resources/slug/other.txt"' in pack.html_content
+
+        with package.parser_pool.parser() as parser:
+            pack.build_html_content(parser, '/resources/')
+        assert 'src="/resources/slug/img/cat.png"' in pack.html_content
+
 
 class TestResourceHandler:
     def test_only_accepts_relative_path(self):
@@ -340,3 +650,26 @@ class TestResourceHandler:
         assert (temp_dir / 'res').is_dir()
         with (temp_dir / 'res/img.png').open('rb') as f:
             assert f.read() == PNG_HEADER
+
+    def test_streams_content_by_chunks(self, temp_dir):
+        content = PNG_HEADER * 16
+        res_hdl = package.SpooledResourceHandler(
+            BytesIO(content), pathlib.Path('img.png'), buffer_size=len(PNG_HEADER))
+
+        res_hdl.save(temp_dir)
+
+        with (temp_dir / 'img.png').open('rb') as f:
+            assert f.read() == content
+
+    def test_writes_file_content(self, temp_dir):
+        (temp_dir / 'src').mkdir()
+        (temp_dir / 'dst').mkdir()
+        with (temp_dir / 'src/img.png').open('wb') as f:
+            f.write(PNG_HEADER)
+        res_hdl = package.FileResourceHandler(
+            temp_dir / 'src/img.png', pathlib.Path('img.png'))
+
+        res_hdl.save(temp_dir / 'dst')
+
+        with (temp_dir / 'dst/img.png').open('rb') as f:
+            assert f.read() == PNG_HEADER
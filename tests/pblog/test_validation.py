@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from pblog import validation
+
+
+def test_validates_and_normalizes():
+    schema = validation.Schema({
+        'name': {'type': 'string', 'required': True},
+        'tag': {'type': 'string', 'default': 'none'},
+    })
+
+    assert schema.validate({'name': 'ham'}) == ({'name': 'ham', 'tag': 'none'}, None)
+
+
+def test_returns_errors():
+    schema = validation.Schema({
+        'name': {'type': 'string', 'required': True},
+    })
+
+    assert schema.validate({}) == (None, {'name': ['required field']})
+
+
+def test_reuses_validator():
+    schema = validation.Schema({'name': {'type': 'string'}})
+
+    assert schema.validator is schema.validator
+
+
+def test_validators_are_not_shared_between_threads():
+    schema = validation.Schema({'name': {'type': 'string'}})
+
+    # the barrier makes both calls run in distinct threads
+    barrier = threading.Barrier(2)
+
+    def get_validator(_):
+        barrier.wait()
+        return schema.validator
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        validators = list(executor.map(get_validator, range(2)))
+
+    assert validators[0] is not validators[1]
+    assert all(validator is not schema.validator for validator in validators)
+
+
+def test_post_meta_default_id_is_not_shared():
+    first, _ = validation.post_meta_schema.validate({'title': 'A', 'topic': 'B'})
+    first['id']['env'] = 1
+    second, _ = validation.post_meta_schema.validate({'title': 'A', 'topic': 'B'})
+
+    assert second['id'] == {}